@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from etl.data_upload import TABLE_COLUMNS, get_data_versions, pooled_connection, shared_connection
+from etl.landing_zone import LANDING_DIR, arrow_schema, to_arrow
+from etl.trends import (
+    SHIFT_DAYS_QUERY, STAFF_QUERY, TIMEKEEPING_QUERY, TRENDS_TABLE, rolling_trends, weekly_activity
+)
+
+
+PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise ImportError("duckdb is required for the in-process metrics backend (pip install duckdb)")
+
+
+class PostgresBackend:
+    # The default: every query on a pooled psycopg2 connection
+
+    name = "postgres"
+    poll_versions = True
+
+    def run_query(self, query, params=None):
+        with pooled_connection() as conn:
+            return pd.read_sql(query, conn, params=params)
+
+    def shared_connection(self):
+        return shared_connection()
+
+    def stream(self, query, params, chunk_size):
+        # DataFrame chunks from a server-side (named) cursor, so a large
+        # export is never held in memory whole
+        with pooled_connection() as conn:
+            cursor = conn.cursor(name=f"export_{uuid.uuid4().hex[:8]}")
+            cursor.itersize = chunk_size
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield pd.DataFrame(rows, columns=[col.name for col in cursor.description])
+            finally:
+                cursor.close()
+
+    def data_versions(self):
+        return get_data_versions()
+
+
+def to_duckdb(query, params):
+    # The metrics SQL is written for Postgres and runs on DuckDB unchanged
+    # apart from the placeholders: %(name)s becomes DuckDB's named $name
+    params = params or {}
+    names = set(PARAM_PATTERN.findall(query))
+    query = PARAM_PATTERN.sub(r"$\1", query).replace("%%", "%")
+    return query, {name: params[name] for name in names}
+
+
+class DuckDBBackend:
+    # In-process backend: the same metrics SQL executed by DuckDB over
+    # cleansed DataFrames or the Parquet landing zone, with no server round
+    # trips. Tables get the schema.sql column types, so results match the
+    # Postgres ones. One DuckDB connection serves every thread through a
+    # per-thread cursor.
+
+    poll_versions = False
+
+    def __init__(self, database=":memory:"):
+        _require_duckdb()
+        self.name = f"duckdb-{uuid.uuid4().hex[:8]}"
+        self.conn = duckdb.connect(database)
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @classmethod
+    def from_frames(cls, frames, database=":memory:"):
+        # frames: {table: cleansed DataFrame}, e.g. straight from the cleansers.
+        # The trends are built from them unless frames has them already.
+        backend = cls(database)
+        for table, df in frames.items():
+            backend.register_frame(table, df)
+        if TRENDS_TABLE not in frames:
+            backend.refresh_trends()
+        return backend
+
+    @classmethod
+    def from_landing(cls, root=LANDING_DIR, tables=None, database=":memory:"):
+        backend = cls(database)
+        for table in tables or TABLE_COLUMNS:
+            backend.register_parquet(table, root)
+        backend.refresh_trends()
+        return backend
+
+    def refresh_trends(self):
+        # staff_week_trends rebuilt from the registered tables; it is
+        # derived, so it is neither in the landing zone nor in TABLE_COLUMNS
+        params = {"start": None, "end": None}
+        weekly = weekly_activity(
+            self.run_query(STAFF_QUERY),
+            self.run_query(TIMEKEEPING_QUERY, params),
+            self.run_query(SHIFT_DAYS_QUERY, params),
+        )
+        trends = rolling_trends(weekly)
+        self.register_frame(TRENDS_TABLE, trends.assign(week_start=trends["week_start"].dt.date))
+
+    def register_frame(self, table, df):
+        # Copied into a DuckDB table, so later changes to df are not seen.
+        # Tables outside TABLE_COLUMNS keep the frame's own types.
+        arrow_table = to_arrow(df, table) if table in TABLE_COLUMNS else df
+        with self.lock:
+            self.conn.register("_incoming", arrow_table)
+            try:
+                self.conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM _incoming")
+            finally:
+                self.conn.unregister("_incoming")
+            self.versions[table] = self.versions.get(table, 0) + 1
+
+    def register_parquet(self, table, root=LANDING_DIR):
+        # A view over the table's landing files: nothing is loaded up front,
+        # and DuckDB only scans the columns and row groups a query needs.
+        # Partition columns are read back as text and cast to the schema type.
+        path = os.path.join(root, table)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No landing data for {table} in {root}")
+        columns = ", ".join(
+            f"CAST({field.name} AS {_DUCKDB_TYPES[str(field.type)]}) AS {field.name}"
+            for field in arrow_schema(table)
+        )
+        pattern = os.path.join(path, "**", "*.parquet").replace("'", "''")
+        with self.lock:
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW {table} AS SELECT {columns} "
+                f"FROM read_parquet('{pattern}', hive_partitioning = true, hive_types_autocast = false)"
+            )
+            self.versions[table] = self.versions.get(table, 0) + 1
+
+    def _cursor(self):
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.local.cursor = self.conn.cursor()
+        return cursor
+
+    def run_query(self, query, params=None):
+        query, params = to_duckdb(query, params)
+        return self._cursor().execute(query, params).df()
+
+    @contextmanager
+    def shared_connection(self):
+        yield self._cursor()
+
+    def stream(self, query, params, chunk_size):
+        query, params = to_duckdb(query, params)
+        cursor = self._cursor().execute(query, params)
+        while True:
+            df = cursor.fetch_df_chunk(max(chunk_size // 2048, 1))
+            if df.empty:
+                break
+            yield df
+
+    def data_versions(self):
+        return dict(self.versions)
+
+    def close(self):
+        self.conn.close()
+
+
+# Arrow types of landing_zone.arrow_schema as DuckDB types
+_DUCKDB_TYPES = {
+    "string": "VARCHAR",
+    "int32": "INTEGER",
+    "date32[day]": "DATE",
+    "timestamp[us]": "TIMESTAMP",
+}
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = PostgresBackend()
+    return _backend
+
+
+def set_backend(backend):
+    # None switches back to Postgres
+    global _backend
+    _backend = backend
+    return backend
@@ -0,0 +1,204 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from analytics.backends import get_backend
+from etl.instrumentation import stage
+
+
+# Set CACHE_ENABLED = False to always hit the database
+CACHE_ENABLED = True
+
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 600
+
+# data_versions is re-read at most this often, so a load committed by another
+# process is picked up within this many seconds
+VERSION_POLL_SECONDS = 5
+
+# Directory for the optional on-disk copy of cached results (None = memory only)
+CACHE_DIR = None
+
+
+def _copy(value):
+    # Callers get their own frames, so mutating a result cannot corrupt the cache
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value.copy() if hasattr(value, "copy") else value
+
+
+class ResultCache:
+    # LRU of metric results with a TTL. An entry records the data_versions of
+    # the tables its function reads; when a load bumps one of them, only the
+    # entries reading that table are dropped. Keys include the backend, so
+    # results of different backends are never mixed up.
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS,
+                 cache_dir=CACHE_DIR, version_poll=VERSION_POLL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.version_poll = version_poll
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.versions_backend = None
+        self.versions_read_at = None
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def data_versions(self):
+        # An in-process backend knows its versions for free and is read every
+        # time; a database is polled
+        backend = get_backend()
+        now = time.monotonic()
+        fresh = self.versions_read_at is not None and now - self.versions_read_at < self.version_poll
+        if fresh and backend.poll_versions and backend.name == self.versions_backend:
+            return self.versions
+        versions = backend.data_versions()
+        with self.lock:
+            changed = {
+                table for table in set(versions) | set(self.versions)
+                if versions.get(table) != self.versions.get(table)
+            }
+            self.versions = versions
+            self.versions_backend = backend.name
+            self.versions_read_at = now
+        if changed:
+            self.invalidate(changed)
+        return versions
+
+    def invalidate(self, tables=None):
+        # Drop the entries reading any of tables (every entry by default)
+        with self.lock:
+            stale = [
+                key for key, (_, entry_tables, _, _) in self.entries.items()
+                if tables is None or set(entry_tables) & set(tables)
+            ]
+            for key in stale:
+                del self.entries[key]
+            self.stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def get(self, name, tables, params, compute):
+        versions = self.data_versions()
+        entry_versions = tuple(versions.get(table, 0) for table in tables)
+        key = hashlib.sha1(pickle.dumps((get_backend().name, name, params))).hexdigest()
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, _, cached_versions, value = entry
+                if expires_at > now and cached_versions == entry_versions:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return _copy(value)
+                del self.entries[key]
+
+        value = self._read_disk(key, entry_versions)
+        if value is not None:
+            with self.lock:
+                self.stats["disk_hits"] += 1
+        else:
+            with self.lock:
+                self.stats["misses"] += 1
+            value = compute()
+            self._write_disk(key, entry_versions, value)
+
+        with self.lock:
+            self.entries[key] = (now + self.ttl, tables, entry_versions, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return _copy(value)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _read_disk(self, key, entry_versions):
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                cached_versions, value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return value if cached_versions == entry_versions else None
+
+    def _write_disk(self, key, entry_versions, value):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees half a file
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((entry_versions, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._disk_path(key))
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_DIR, VERSION_POLL_SECONDS)
+    return _cache
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+    return cache
+
+
+def cached(*tables):
+    # Decorator for a metrics function reading the given tables. The original
+    # function stays reachable as fn.__wrapped__. Each call is a "metric"
+    # instrumentation stage; a cache hit shows as one with no DB round trips.
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage("metric", metric=fn.__name__) as s:
+                if not CACHE_ENABLED:
+                    result = fn(*args, **kwargs)
+                else:
+                    # Keyed on the bound arguments, so f(1) and f(x=1) share an entry
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    params = tuple(bound.arguments.items())
+                    result = get_cache().get(name, tables, params, lambda: fn(*args, **kwargs))
+                s.rows_out = len(result) if hasattr(result, "columns") else None
+            return result
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return get_cache().get_stats()
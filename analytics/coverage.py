@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+# Step of the coverage timeline; any pandas offset alias that divides a day
+# evenly ("1h", "30min", "15min", "1min")
+DEFAULT_RESOLUTION = "1h"
+
+
+def day_grid(unit_dates, resolution=DEFAULT_RESOLUTION):
+    # Expand (unit, date) rows into one row per resolution step of each day,
+    # keeping any other columns (e.g. census total_patients) on every step
+    step = pd.Timedelta(resolution)
+    periods, remainder = divmod(pd.Timedelta("1D"), step)
+    if remainder or periods == 0:
+        raise ValueError(f"Resolution {resolution} does not divide a day evenly")
+
+    grid = unit_dates.loc[unit_dates.index.repeat(periods)].reset_index(drop=True)
+    offsets = np.tile(np.arange(periods), len(unit_dates)) * step
+    grid.insert(1, "time", pd.to_datetime(grid["date"]).to_numpy("datetime64[ns]") + offsets)
+    return grid
+
+
+def span_grid(shifts, resolution=DEFAULT_RESOLUTION):
+    # One row per resolution step from each unit's first shift start to its
+    # last shift end
+    spans = shifts.groupby("unit").agg(first=("shift_start", "min"), last=("shift_end", "max"))
+    first = spans["first"].dt.floor(resolution)
+    last = spans["last"].dt.ceil(resolution)
+    step = pd.Timedelta(resolution)
+    periods = ((last - first) // step + 1).to_numpy("int64")
+
+    starts = np.repeat(first.to_numpy("datetime64[ns]"), periods)
+    offsets = np.arange(periods.sum()) - np.repeat(np.cumsum(periods) - periods, periods)
+    return pd.DataFrame({
+        "unit": np.repeat(spans.index.to_numpy(), periods),
+        "time": starts + offsets * step,
+    })
+
+
+def sweep_headcount(shifts, grid):
+    # Staff on duty in each grid row's unit at its time. Every shift becomes a
+    # +1 event at shift_start and a -1 event at shift_end; the grid points are
+    # 0 events sorted after the shift events at the same instant (a shift
+    # ending at 19:00 is off, one starting at 19:00 is on). After one lexsort
+    # by (unit, time), a single cumsum is the headcount: each unit's events
+    # net to zero, so the previous units never leak into the next one.
+    shifts = shifts.dropna(subset=["unit", "shift_start", "shift_end"])
+    n_shifts, n_grid = len(shifts), len(grid)
+
+    unit_codes, _ = pd.factorize(np.concatenate([
+        shifts["unit"].to_numpy(), shifts["unit"].to_numpy(), grid["unit"].to_numpy()
+    ]))
+    time = np.concatenate([
+        shifts["shift_start"].to_numpy("datetime64[ns]").astype("int64"),
+        shifts["shift_end"].to_numpy("datetime64[ns]").astype("int64"),
+        grid["time"].to_numpy("datetime64[ns]").astype("int64"),
+    ])
+    delta = np.concatenate([
+        np.ones(n_shifts, dtype="int64"),
+        -np.ones(n_shifts, dtype="int64"),
+        np.zeros(n_grid, dtype="int64"),
+    ])
+    is_grid = np.concatenate([np.zeros(2 * n_shifts, dtype="int8"), np.ones(n_grid, dtype="int8")])
+
+    order = np.lexsort((is_grid, time, unit_codes))
+    headcount = np.empty(len(order), dtype="int64")
+    headcount[order] = np.cumsum(delta[order])
+    return headcount[2 * n_shifts:]
+
+
+def coverage_timeline(shifts, resolution=DEFAULT_RESOLUTION, grid=None):
+    # Headcount step function per unit: unit, time, staff_on_duty
+    if grid is None:
+        grid = span_grid(shifts.dropna(subset=["unit", "shift_start", "shift_end"]), resolution)
+    return grid.assign(staff_on_duty=sweep_headcount(shifts, grid))
+
+
+def patient_to_staff_by_period(shifts, census, resolution=DEFAULT_RESOLUTION):
+    # Daily census joined with the on-duty headcount at every resolution step.
+    # Unlike get_patient_to_staff_ratio, day and night shifts are not counted
+    # as simultaneous coverage. The ratio is NaN when nobody is on duty.
+    grid = day_grid(census[["unit", "date", "total_patients"]].reset_index(drop=True), resolution)
+    df = coverage_timeline(shifts, grid=grid)
+    df["patient_to_staff_ratio"] = (
+        df["total_patients"] / df["staff_on_duty"].where(df["staff_on_duty"] > 0)
+    ).round(2)
+    return df.sort_values(["unit", "time"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from analytics.coverage import day_grid, sweep_headcount
+
+
+# Days projected past the last census date
+HORIZON_DAYS = 14
+
+# Patients per on-duty staff member above which a unit/date is flagged.
+# forecast_staffing_gaps also takes a {unit: ratio} dict.
+TARGET_RATIO = 5.0
+
+# Smoothing factor of the "ewm" model and window of the "rolling" model
+# for the daily net flow (admissions - discharges)
+SMOOTHING_ALPHA = 0.3
+ROLLING_DAYS = 7
+
+
+def census_matrix(census):
+    # (dates x units) frames of total_patients and net flow over a gap-free
+    # daily index, so every unit is fitted by the same column-wise operations
+    df = census.assign(
+        date=pd.to_datetime(census["date"]),
+        net_flow=census["admissions"] - census["discharges"]
+    )
+    totals = df.pivot_table(index="date", columns="unit", values="total_patients", aggfunc="last")
+    net_flow = df.pivot_table(index="date", columns="unit", values="net_flow", aggfunc="last")
+    days = pd.date_range(totals.index.min(), totals.index.max(), freq="D")
+    return totals.reindex(days), net_flow.reindex(days)
+
+
+def project_census(census, horizon_days=HORIZON_DAYS, model="ewm",
+                   alpha=SMOOTHING_ALPHA, window=ROLLING_DAYS):
+    # Project total_patients for every unit in one pass: the last observed
+    # total plus h days of the smoothed daily net flow. model="ewm" smooths
+    # the net flow exponentially, model="rolling" takes its trailing mean.
+    totals, net_flow = census_matrix(census)
+    if model == "ewm":
+        trend = net_flow.ewm(alpha=alpha, ignore_na=True).mean().iloc[-1]
+    elif model == "rolling":
+        trend = net_flow.rolling(window, min_periods=1).mean().iloc[-1]
+    else:
+        raise ValueError(f"Unknown forecast model: {model}")
+
+    base = totals.ffill().iloc[-1]
+    steps = np.arange(1, horizon_days + 1)
+    projected = np.clip(
+        base.to_numpy()[None, :] + steps[:, None] * trend.fillna(0).to_numpy()[None, :],
+        0,
+        None
+    )
+    dates = pd.date_range(totals.index[-1] + pd.Timedelta("1D"), periods=horizon_days, freq="D")
+    projected = pd.DataFrame(projected, index=dates, columns=totals.columns).rename_axis(index="date")
+    return (
+        projected.reset_index()
+        .melt(id_vars="date", var_name="unit", value_name="projected_patients")
+        [["unit", "date", "projected_patients"]]
+        .sort_values(["unit", "date"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def forecast_staffing_gaps(census, shifts, target_ratio=TARGET_RATIO, horizon_days=HORIZON_DAYS,
+                           model="ewm", resolution="1h"):
+    # Projected census against the scheduled shifts. A unit/date is judged by
+    # its thinnest step of the day (coverage.py), so a fully staffed day
+    # shift does not hide an empty night.
+    projection = project_census(census, horizon_days, model)
+    grid = day_grid(projection, resolution)
+    grid["staff_on_duty"] = sweep_headcount(shifts, grid)
+    df = projection.merge(
+        grid.groupby(["unit", "date"], as_index=False)["staff_on_duty"].min()
+        .rename(columns={"staff_on_duty": "min_staff_on_duty"}),
+        on=["unit", "date"],
+        how="left"
+    )
+
+    if isinstance(target_ratio, dict):
+        df["target_ratio"] = df["unit"].map(target_ratio).fillna(TARGET_RATIO)
+    else:
+        df["target_ratio"] = float(target_ratio)
+    df["projected_ratio"] = (
+        df["projected_patients"] / df["min_staff_on_duty"].where(df["min_staff_on_duty"] > 0)
+    ).round(2)
+    df["staff_needed"] = (
+        np.ceil(df["projected_patients"] / df["target_ratio"]).astype("int64") - df["min_staff_on_duty"]
+    ).clip(lower=0)
+    df["below_target"] = df["staff_needed"] > 0
+    return df
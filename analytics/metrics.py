@@ -1,9 +1,83 @@
+import datetime
+import decimal
+
+import numpy as np
 import pandas as pd
-from etl.data_upload import get_connection
+from analytics.backends import PostgresBackend, get_backend, set_backend
+from analytics.cache import cached
+from analytics.coverage import DEFAULT_RESOLUTION, patient_to_staff_by_period
+from analytics.forecast import HORIZON_DAYS, TARGET_RATIO, forecast_staffing_gaps
+from analytics.reassignment import DEFAULT_ROLE, plan_reassignments
+from analytics.risk_scoring import DEFAULT_WEIGHTS, DEFAULT_THRESHOLDS, DEFAULT_LEVEL, score_risk
+from analytics.shift_overlap import MIN_REST_HOURS, fatigue_by_staff
+from etl.instrumentation import stage
 
-def get_overtime_by_staff():
-    query = """
-    SELECT 
+
+# Read the get_* metrics from the materialized views created by
+# migrations/R__metric_views.sql instead of aggregating the base tables
+USE_MATERIALIZED_VIEWS = False
+
+
+def run_query(query, params=None):
+    # On the active backend (analytics/backends.py): Postgres unless
+    # set_backend() picked another one
+    with stage("query") as s:
+        df = get_backend().run_query(query, params)
+        s.rows_out = len(df)
+    return df
+
+
+def shared_connection():
+    return get_backend().shared_connection()
+
+
+def filter_conditions(unit=None, date=None, role=None, staff=None, via_staff=False):
+    # SQL conditions binding the metric filters to a query's columns; each is
+    # true when its parameter is None. via_staff applies the role and unit
+    # filters through staff (role, home_unit) for tables keyed by staff_id only.
+    conditions = []
+    if via_staff:
+        conditions.append(
+            f"(%(roles)s IS NULL OR {staff} IN (SELECT staff_id FROM staff WHERE role = ANY(%(roles)s)))"
+        )
+        conditions.append(
+            f"(%(units)s IS NULL OR {staff} IN (SELECT staff_id FROM staff WHERE home_unit = ANY(%(units)s)))"
+        )
+    else:
+        if unit:
+            conditions.append(f"(%(units)s IS NULL OR {unit} = ANY(%(units)s))")
+        if role:
+            conditions.append(f"(%(roles)s IS NULL OR {role} = ANY(%(roles)s))")
+    if staff:
+        conditions.append(f"(%(staff_ids)s IS NULL OR {staff} = ANY(%(staff_ids)s))")
+    if date:
+        conditions.append(f"(%(start_date)s IS NULL OR {date} >= %(start_date)s)")
+        conditions.append(f"(%(end_date)s IS NULL OR {date} <= %(end_date)s)")
+    return "\n        AND ".join(conditions)
+
+
+def filter_params(units=None, start_date=None, end_date=None, roles=None, staff_ids=None):
+    # Bind parameters for filter_conditions. A single value is accepted for
+    # the list filters; dates are inclusive.
+    def as_list(values):
+        if values is None:
+            return None
+        return [values] if isinstance(values, str) else list(values)
+
+    def as_date(value):
+        return None if value is None else pd.Timestamp(value).date()
+
+    return {
+        "units": as_list(units),
+        "roles": as_list(roles),
+        "staff_ids": as_list(staff_ids),
+        "start_date": as_date(start_date),
+        "end_date": as_date(end_date),
+    }
+
+
+OVERTIME_BY_STAFF_QUERY = f"""
+    SELECT
         staff_id,
         SUM(hours_worked) AS total_hours_worked,
         SUM(overtime_hours) AS total_overtime_hours,
@@ -12,17 +86,11 @@ def get_overtime_by_staff():
             2
         ) AS overtime_percentage
     FROM timekeeping
+    WHERE {filter_conditions(date="week_start", staff="staff_id", via_staff=True)}
     GROUP BY staff_id
-    ORDER BY overtime_percentage DESC;
-    """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
+"""
 
-def get_patient_to_staff_ratio():
-    query = """
+PATIENT_TO_STAFF_RATIO_QUERY = f"""
     SELECT
         c.unit,
         c.date AS shift_date,
@@ -38,20 +106,15 @@ def get_patient_to_staff_ratio():
         ON c.unit = s.unit
         AND c.date = s.shift_date
         AND s.status = 'scheduled'
+        AND {filter_conditions(role="s.role", staff="s.staff_id")}
+    WHERE {filter_conditions(unit="c.unit", date="c.date")}
     GROUP BY
         c.unit,
         c.date,
         c.total_patients
-    ORDER BY patient_to_staff_ratio DESC;
-    """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+"""
 
-
-def get_weekly_capacity_utilization():
-    query = """
+WEEKLY_CAPACITY_UTILIZATION_QUERY = f"""
     SELECT
         t.staff_id,
         s.first_name,
@@ -66,22 +129,16 @@ def get_weekly_capacity_utilization():
     FROM timekeeping t
     JOIN staff s
         ON t.staff_id = s.staff_id
+    WHERE {filter_conditions(unit="s.home_unit", date="t.week_start", role="s.role", staff="t.staff_id")}
     GROUP BY
         t.staff_id,
         s.first_name,
         s.last_name,
         t.week_start,
         s.max_hours_per_week
-    ORDER BY percent_of_allowed_capacity DESC;
-    """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
+"""
 
-def get_cancellation_rate_by_unit():
-    query = """
+CANCELLATION_RATE_BY_UNIT_QUERY = f"""
     SELECT
         unit,
         COUNT(*) FILTER (WHERE status = 'Cancelled') AS cancelled_shifts,
@@ -92,17 +149,11 @@ def get_cancellation_rate_by_unit():
             2
         ) AS cancellation_rate_percent
     FROM shifts
+    WHERE {filter_conditions(unit="unit", date="shift_date", role="role", staff="staff_id")}
     GROUP BY unit
-    ORDER BY cancellation_rate_percent DESC;
-    """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
-
+"""
 
-def get_average_shift_duration():
-    query = """
+AVERAGE_SHIFT_DURATION_QUERY = f"""
     SELECT
         staff_id,
         ROUND(
@@ -111,63 +162,619 @@ def get_average_shift_duration():
         ) AS avg_shift_duration_hours
     FROM shifts
     WHERE shift_end IS NOT NULL
+        AND {filter_conditions(unit="unit", date="shift_date", role="role", staff="staff_id")}
     GROUP BY staff_id
-    ORDER BY avg_shift_duration_hours DESC;
+"""
+
+TOTAL_DAYS_WORKED_QUERY = f"""
+    SELECT
+        staff_id,
+        COUNT(DISTINCT shift_date) AS total_days_worked
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND {filter_conditions(unit="unit", date="shift_date", role="role", staff="staff_id")}
+    GROUP BY staff_id
+"""
+
+# Maintained incrementally by data_upload.refresh_staff_trends, so the table
+# itself stands in for a materialized view
+STAFF_TRENDS_QUERY = f"""
+    SELECT *
+    FROM staff_week_trends
+    WHERE {filter_conditions(date="week_start", staff="staff_id", via_staff=True)}
+"""
+
+# name: (query, materialized view, sort column, key columns). Results are
+# ordered by the sort column (highest first, NULLs last) and then the key
+# columns, which together are unique and make up the keyset page key.
+METRICS = {
+    "overtime_by_staff": (
+        OVERTIME_BY_STAFF_QUERY, "mv_overtime_by_staff", "overtime_percentage", ["staff_id"]
+    ),
+    "patient_to_staff_ratio": (
+        PATIENT_TO_STAFF_RATIO_QUERY, "mv_patient_to_staff_ratio", "patient_to_staff_ratio",
+        ["unit", "shift_date"]
+    ),
+    "weekly_capacity_utilization": (
+        WEEKLY_CAPACITY_UTILIZATION_QUERY, "mv_weekly_capacity_utilization", "percent_of_allowed_capacity",
+        ["staff_id", "week_start"]
+    ),
+    "cancellation_rate_by_unit": (
+        CANCELLATION_RATE_BY_UNIT_QUERY, "mv_cancellation_rate_by_unit", "cancellation_rate_percent", ["unit"]
+    ),
+    "average_shift_duration": (
+        AVERAGE_SHIFT_DURATION_QUERY, "mv_average_shift_duration", "avg_shift_duration_hours", ["staff_id"]
+    ),
+    "total_days_worked": (
+        TOTAL_DAYS_WORKED_QUERY, "mv_total_days_worked", "total_days_worked", ["staff_id"]
+    ),
+    "staff_trends": (
+        STAFF_TRENDS_QUERY, "staff_week_trends", "overtime_pct_4w", ["staff_id", "week_start"]
+    ),
+}
+
+# Rows per fetch when streaming a metric from a server-side cursor
+STREAM_CHUNK_ROWS = 50000
+
+
+def metric_query(metric, limit=None, after=None, **filters):
+    # The metric's query with filters, keyset pagination and LIMIT, all as
+    # bind parameters. The materialized view is only read unfiltered.
+    query, view, sort_column, key_columns = METRICS[metric]
+    params = filter_params(**filters)
+    if USE_MATERIALIZED_VIEWS and all(value is None for value in params.values()):
+        query = f"SELECT * FROM {view}"
+
+    # Every metric value is >= 0, so -1 puts NULLs after all of them
+    columns = [f"COALESCE(m.{sort_column}, -1)"] + [f"m.{col}" for col in key_columns]
+    after = list(after) if after is not None else [None] * len(columns)
+    if len(after) != len(columns):
+        raise ValueError(f"Page key for {metric} needs {len(columns)} values: {sort_column}, {key_columns}")
+    for i, value in enumerate(after):
+        params[f"after_{i}"] = value
+    params["limit"] = limit
+
+    query = f"""
+    SELECT m.*
+    FROM ({query}) AS m
+    WHERE %(after_0)s IS NULL
+        OR ({", ".join(columns)}) < ({", ".join(f"%(after_{i})s" for i in range(len(columns)))})
+    ORDER BY {", ".join(f"{col} DESC" for col in columns)}
+    LIMIT %(limit)s
     """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    return query, params
+
+
+def next_page_key(df, metric, limit):
+    # after= value for the page following df, or None if df was the last page
+    if limit is None or len(df) < limit:
+        return None
+    _, _, sort_column, key_columns = METRICS[metric]
+    last = df.iloc[-1]
+    sort_value = -1 if pd.isna(last[sort_column]) else float(last[sort_column])
+    return tuple([sort_value] + [last[col] for col in key_columns])
+
+
+def run_metric(metric, limit=None, after=None, **filters):
+    return run_query(*metric_query(metric, limit, after, **filters))
+
+
+def stream_metric(metric, chunk_size=STREAM_CHUNK_ROWS, limit=None, after=None, **filters):
+    # Yield a metric as DataFrame chunks (from a server-side cursor on
+    # Postgres), so a large export is never held in memory whole
+    query, params = metric_query(metric, limit, after, **filters)
+    yield from get_backend().stream(query, params, chunk_size)
+
+
+# The get_* metrics take limit (top-N), after (the keyset page key from
+# next_page_key) and the filters of filter_params: units, start_date,
+# end_date, roles, staff_ids.
+
+@cached("staff", "timekeeping")
+def get_overtime_by_staff(limit=None, after=None, **filters):
+    return run_metric("overtime_by_staff", limit, after, **filters)
+
+
+@cached("census", "shifts")
+def get_patient_to_staff_ratio(limit=None, after=None, **filters):
+    return run_metric("patient_to_staff_ratio", limit, after, **filters)
+
+
+@cached("census", "shifts")
+def get_patient_to_staff_ratio_by_period(resolution=DEFAULT_RESOLUTION):
+    # Census against the staff actually on duty at each resolution step
+    # (analytics/coverage.py), instead of everyone scheduled that day
+    shifts_query = """
+    SELECT
+        unit,
+        shift_start,
+        shift_end
+    FROM shifts
+    WHERE status = 'scheduled';
+    """
+    census_query = """
+    SELECT
+        unit,
+        date,
+        total_patients
+    FROM census;
+    """
+    with shared_connection():
+        shifts_df = run_query(shifts_query)
+        census_df = run_query(census_query)
+    return patient_to_staff_by_period(shifts_df, census_df, resolution)
+
+
+@cached("census", "shifts")
+def get_staffing_gaps(target_ratio=TARGET_RATIO, horizon_days=HORIZON_DAYS, model="ewm"):
+    # Projected census (analytics/forecast.py) against the shifts already
+    # scheduled after the last census date; only the flagged unit/dates
+    census_query = """
+    SELECT
+        unit,
+        date,
+        total_patients,
+        admissions,
+        discharges
+    FROM census;
+    """
+    shifts_query = """
+    SELECT
+        unit,
+        shift_start,
+        shift_end
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND shift_end > %(forecast_start)s;
+    """
+    with shared_connection():
+        census_df = run_query(census_query)
+        forecast_start = pd.to_datetime(census_df["date"]).max() + pd.Timedelta("1D")
+        shifts_df = run_query(shifts_query, {"forecast_start": forecast_start.to_pydatetime()})
+    df = forecast_staffing_gaps(census_df, shifts_df, target_ratio, horizon_days, model)
+    return df[df["below_target"]].reset_index(drop=True)
+
+
+@cached("census", "shifts", "staff", "timekeeping")
+def get_reassignment_plan(target_ratio=TARGET_RATIO, horizon_days=HORIZON_DAYS, role=DEFAULT_ROLE,
+                          qualifying_home_units=None):
+    # Float-pool suggestions (analytics/reassignment.py) for the projected
+    # staffing gaps; returns (plan, unfilled)
+    staff_query = """
+    SELECT
+        staff_id,
+        role,
+        home_unit,
+        max_hours_per_week
+    FROM staff;
+    """
+    timekeeping_query = """
+    SELECT
+        staff_id,
+        week_start,
+        hours_worked
+    FROM timekeeping
+    WHERE week_start >= %(first_week)s;
+    """
+    shifts_query = """
+    SELECT
+        staff_id,
+        shift_date,
+        shift_start,
+        shift_end,
+        status
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND shift_date >= %(first_week)s;
+    """
+    gaps = get_staffing_gaps(target_ratio, horizon_days)
+    if gaps.empty:
+        return plan_reassignments(gaps, None, None)
+    first_date = gaps["date"].min()
+    first_week = first_date - pd.Timedelta(days=first_date.weekday())
+    with shared_connection():
+        staff_df = run_query(staff_query)
+        timekeeping_df = run_query(timekeeping_query, {"first_week": first_week.date()})
+        shifts_df = run_query(shifts_query, {"first_week": first_week.date()})
+    return plan_reassignments(gaps, staff_df, timekeeping_df, shifts_df,
+                              qualifying_home_units=qualifying_home_units, role=role)
 
 
-def get_total_days_worked():
+@cached("staff", "timekeeping")
+def get_weekly_capacity_utilization(limit=None, after=None, **filters):
+    return run_metric("weekly_capacity_utilization", limit, after, **filters)
+
+
+@cached("shifts")
+def get_cancellation_rate_by_unit(limit=None, after=None, **filters):
+    return run_metric("cancellation_rate_by_unit", limit, after, **filters)
+
+
+@cached("shifts")
+def get_average_shift_duration(limit=None, after=None, **filters):
+    return run_metric("average_shift_duration", limit, after, **filters)
+
+
+@cached("shifts")
+def get_total_days_worked(limit=None, after=None, **filters):
+    return run_metric("total_days_worked", limit, after, **filters)
+
+
+@cached("staff", "staff_week_trends")
+def get_staff_trends(limit=None, after=None, **filters):
+    # Rolling 2/4/8-week trends per staff-week (etl/trends.py), highest
+    # 4-week overtime first
+    return run_metric("staff_trends", limit, after, **filters)
+
+
+@cached("shifts")
+def get_shift_fatigue(min_rest_hours=MIN_REST_HOURS):
+    # Overlapping and short-rest scheduled shifts per staff, from a sorted
+    # sweep over each staff member's shift intervals
     query = """
+    SELECT
+        shift_id,
+        staff_id,
+        shift_start,
+        shift_end,
+        status
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND shift_start IS NOT NULL
+        AND shift_end IS NOT NULL;
+    """
+    return fatigue_by_staff(run_query(query), min_rest_hours)
+
+# Whole risk profile in one statement: the metric aggregates as CTEs,
+# normalized with MAX() OVER () and scored/classified in the database.
+# Shift gaps use the same sweep as analytics/shift_overlap.py: the latest end
+# of each staff member's earlier shifts via a running MAX() window.
+# Values are cast to float8 so scores match the pandas path. The score and
+# level expressions are filled in from the weights/thresholds config. The
+# filters only pick rows of the finished profile, so the scores are the
+# same as in the unfiltered profile.
+RISK_PROFILE_QUERY = """
+WITH overtime AS (
+    SELECT
+        staff_id,
+        SUM(overtime_hours) AS total_overtime_hours,
+        ROUND(
+            (SUM(overtime_hours)::numeric / NULLIF(SUM(hours_worked), 0)) * 100,
+            2
+        ) AS overtime_percentage
+    FROM timekeeping
+    GROUP BY staff_id
+),
+capacity AS (
+    SELECT
+        t.staff_id,
+        s.first_name,
+        s.last_name,
+        t.week_start,
+        SUM(t.hours_worked) AS total_hours_worked,
+        s.max_hours_per_week,
+        ROUND(
+            (SUM(t.hours_worked)::numeric / NULLIF(s.max_hours_per_week, 0)) * 100,
+            2
+        ) AS percent_of_allowed_capacity
+    FROM timekeeping t
+    JOIN staff s
+        ON t.staff_id = s.staff_id
+    GROUP BY
+        t.staff_id,
+        s.first_name,
+        s.last_name,
+        t.week_start,
+        s.max_hours_per_week
+),
+days AS (
     SELECT
         staff_id,
         COUNT(DISTINCT shift_date) AS total_days_worked
     FROM shifts
     WHERE status = 'scheduled'
     GROUP BY staff_id
-    ORDER BY total_days_worked DESC;
-    """
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+),
+duration AS (
+    SELECT
+        staff_id,
+        ROUND(
+            AVG(EXTRACT(EPOCH FROM (shift_end - shift_start)) / 3600),
+            2
+        ) AS avg_shift_duration_hours
+    FROM shifts
+    WHERE shift_end IS NOT NULL
+    GROUP BY staff_id
+),
+gaps AS (
+    SELECT
+        staff_id,
+        shift_id,
+        EXTRACT(EPOCH FROM (
+            shift_start - MAX(shift_end) OVER (
+                PARTITION BY staff_id
+                ORDER BY shift_start, shift_id
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            )
+        )) / 3600 AS gap_hours
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND shift_start IS NOT NULL
+        AND shift_end IS NOT NULL
+),
+fatigue AS (
+    SELECT
+        staff_id,
+        COUNT(*) FILTER (WHERE gap_hours < 0) AS overlapping_shifts,
+        COUNT(*) FILTER (WHERE gap_hours >= 0 AND gap_hours < %(min_rest_hours)s::float8) AS short_rest_shifts,
+        COUNT(*) AS scheduled_shifts
+    FROM gaps
+    GROUP BY staff_id
+),
+normalized AS (
+    SELECT
+        c.*,
+        o.total_overtime_hours,
+        o.overtime_percentage,
+        d.total_days_worked,
+        u.avg_shift_duration_hours,
+        COALESCE(f.overlapping_shifts, 0) AS overlapping_shifts,
+        COALESCE(f.short_rest_shifts, 0) AS short_rest_shifts,
+        tr.overtime_pct_4w,
+        tr.overtime_pct_4w_delta,
+        tr.sick_hours_4w,
+        tr.consecutive_days_4w,
+        o.overtime_percentage::float8 / 100 AS overtime_norm,
+        c.percent_of_allowed_capacity::float8 / 100 AS capacity_norm,
+        d.total_days_worked::float8 / MAX(d.total_days_worked) OVER () AS days_norm,
+        u.avg_shift_duration_hours::float8 / MAX(u.avg_shift_duration_hours) OVER () AS shift_norm,
+        COALESCE((f.overlapping_shifts + f.short_rest_shifts)::float8 / f.scheduled_shifts, 0) AS fatigue_norm,
+        COALESCE(tr.overtime_pct_4w / 100, 0) AS recent_overtime_norm,
+        COALESCE(GREATEST(tr.overtime_pct_4w_delta, 0) / 100, 0) AS overtime_trend_norm,
+        COALESCE(tr.sick_hours_4w::float8 / NULLIF(MAX(tr.sick_hours_4w) OVER (), 0), 0) AS sick_norm,
+        COALESCE(tr.consecutive_days_4w::float8 / NULLIF(MAX(tr.consecutive_days_4w) OVER (), 0), 0) AS streak_norm
+    FROM capacity c
+    JOIN overtime o ON c.staff_id = o.staff_id
+    JOIN days d ON c.staff_id = d.staff_id
+    JOIN duration u ON c.staff_id = u.staff_id
+    LEFT JOIN fatigue f ON c.staff_id = f.staff_id
+    LEFT JOIN staff_week_trends tr ON c.staff_id = tr.staff_id AND c.week_start = tr.week_start
+),
+scored AS (
+    SELECT
+        *,
+        {score_expr} AS risk_score
+    FROM normalized
+)
+SELECT
+    *,
+    CASE
+        {level_expr}
+        ELSE %(default_level)s
+    END AS risk_level
+FROM scored
+WHERE {filter_expr}
+ORDER BY risk_score DESC NULLS LAST
+LIMIT %(top_n)s;
+"""
 
-def classify_risk(score):
-    if score >= 0.75:
-        return "High"
-    elif score >= 0.5:
-        return "Moderate"
-    else:
-        return "Low"
 
-def build_staff_risk_profile():
-    overtime_df = get_overtime_by_staff()
-    capacity_df = get_weekly_capacity_utilization()
-    days_df = get_total_days_worked()
-    duration_df = get_average_shift_duration()  
+SQL_RISK_FEATURES = [
+    "overtime_norm", "capacity_norm", "days_norm", "shift_norm", "fatigue_norm",
+    "recent_overtime_norm", "overtime_trend_norm", "sick_norm", "streak_norm",
+]
+
+# Columns of staff_week_trends the risk profile scores, all over 4 weeks
+RISK_TREND_COLUMNS = ["overtime_pct_4w", "overtime_pct_4w_delta", "sick_hours_4w", "consecutive_days_4w"]
+
+
+RISK_PROFILE_FILTERS = filter_conditions(date="week_start", staff="staff_id", via_staff=True)
+
+
+def build_risk_profile_query(weights=None, thresholds=None, min_rest_hours=MIN_REST_HOURS, **filters):
+    weights = weights or DEFAULT_WEIGHTS
+    thresholds = sorted(thresholds or DEFAULT_THRESHOLDS, key=lambda t: t[1], reverse=True)
+    unknown = [f for f in weights if f not in SQL_RISK_FEATURES]
+    if unknown:
+        raise ValueError(f"Features not available in SQL mode: {unknown}")
+
+    params = {"default_level": DEFAULT_LEVEL, "min_rest_hours": min_rest_hours, **filter_params(**filters)}
+    terms = []
+    for i, feature in enumerate(weights):
+        params[f"weight_{i}"] = weights[feature]
+        terms.append(f"%(weight_{i})s::float8 * {feature}")
+    levels = []
+    for i, (level, cutoff) in enumerate(thresholds):
+        params[f"level_{i}"] = level
+        params[f"cutoff_{i}"] = cutoff
+        levels.append(f"WHEN risk_score >= %(cutoff_{i})s THEN %(level_{i})s")
+
+    query = RISK_PROFILE_QUERY.format(
+        score_expr=" +\n        ".join(terms),
+        level_expr="\n        ".join(levels),
+        filter_expr=RISK_PROFILE_FILTERS
+    )
+    return query, params
+
+
+@cached("staff", "shifts", "timekeeping", "staff_week_trends")
+def build_staff_risk_profile(mode="pandas", top_n=None, weights=None, thresholds=None,
+                             min_rest_hours=MIN_REST_HOURS, **filters):
+    # mode="sql" computes the profile in one round trip and only ships the
+    # final (optionally top-N) rows back; mode="pandas" is the original path.
+    # filters (see filter_params) pick staff-weeks; role and unit are the
+    # staff member's role and home_unit.
+    if mode == "sql":
+        query, params = build_risk_profile_query(weights, thresholds, min_rest_hours, **filters)
+        params["top_n"] = top_n
+        return run_query(query, params=params)
+    if mode != "pandas":
+        raise ValueError(f"Unknown risk profile mode: {mode}")
+
+    # All the queries share one borrowed connection
+    with shared_connection():
+        overtime_df = get_overtime_by_staff()
+        capacity_df = get_weekly_capacity_utilization()
+        days_df = get_total_days_worked()
+        duration_df = get_average_shift_duration()
+        fatigue_df = get_shift_fatigue(min_rest_hours)
+        trends_df = get_staff_trends()
     df = capacity_df.merge(overtime_df, on="staff_id", how="inner")
     df = df.merge(days_df, on="staff_id", how="inner")
     df = df.merge(duration_df, on="staff_id", how="inner")
+    df = df.merge(
+        fatigue_df[["staff_id", "overlapping_shifts", "short_rest_shifts", "fatigue_norm"]],
+        on="staff_id",
+        how="left"
+    )
+    df = df.merge(trends_df[["staff_id", "week_start"] + RISK_TREND_COLUMNS], on=["staff_id", "week_start"], how="left")
     df = df.drop(columns=["total_hours_worked_y"])
     df = df.rename(columns={"total_hours_worked_x": "total_hours_worked"})
     df["overtime_norm"] = df["overtime_percentage"] / 100
     df["capacity_norm"] = df["percent_of_allowed_capacity"] / 100
     df["days_norm"] = df["total_days_worked"] / df["total_days_worked"].max()
     df["shift_norm"] = df["avg_shift_duration_hours"] / df["avg_shift_duration_hours"].max()
+    df["fatigue_norm"] = df.pop("fatigue_norm").fillna(0.0)
+    df["recent_overtime_norm"] = (df["overtime_pct_4w"] / 100).fillna(0.0)
+    df["overtime_trend_norm"] = (df["overtime_pct_4w_delta"].clip(lower=0) / 100).fillna(0.0)
+    df["sick_norm"] = (df["sick_hours_4w"] / df["sick_hours_4w"].max()).fillna(0.0)
+    df["streak_norm"] = (df["consecutive_days_4w"] / df["consecutive_days_4w"].max()).fillna(0.0)
+    df[["overlapping_shifts", "short_rest_shifts"]] = df[["overlapping_shifts", "short_rest_shifts"]].fillna(0).astype("int64")
 
-    df["risk_score"] = (
-    0.35 * df["overtime_norm"] +
-    0.30 * df["capacity_norm"] +
-    0.10 * df["days_norm"] +
-    0.05 * df["shift_norm"]
-    )
-    df["risk_level"] = df["risk_score"].apply(classify_risk)
+    df = score_risk(df, weights, thresholds)
+    params = filter_params(**filters)
+    if any(value is not None for value in params.values()):
+        selected = run_query(
+            f"SELECT DISTINCT staff_id, week_start FROM timekeeping WHERE {RISK_PROFILE_FILTERS}",
+            params
+        )
+        df = df.merge(selected, on=["staff_id", "week_start"], how="inner")
     df = df.sort_values("risk_score", ascending=False)
+    if top_n is not None:
+        df = df.head(top_n)
     return(df)
 
+
+def check_risk_profile_parity(tolerance=1e-9):
+    # Parity check between the pandas and single-query risk profiles
+    key = ["staff_id", "week_start"]
+    pandas_df = build_staff_risk_profile(mode="pandas").sort_values(key).reset_index(drop=True)
+    sql_df = build_staff_risk_profile(mode="sql").sort_values(key).reset_index(drop=True)
+
+    if list(pandas_df.columns) != list(sql_df.columns):
+        raise ValueError(f"Column mismatch: {list(pandas_df.columns)} vs {list(sql_df.columns)}")
+    if len(pandas_df) != len(sql_df) or not pandas_df[key].equals(sql_df[key]):
+        raise ValueError("Risk profiles contain different staff-week rows.")
+
+    score_diff = (pandas_df["risk_score"] - sql_df["risk_score"]).abs().max()
+    if score_diff > tolerance:
+        raise ValueError(f"Risk scores differ by up to {score_diff}")
+    if not pandas_df["risk_level"].equals(sql_df["risk_level"]):
+        raise ValueError("Risk levels differ between pandas and SQL profiles.")
+    return score_diff
+
+
+# (name, fn, ordered) run on both backends by check_backend_parity. ordered
+# results must also come back in the same order; the others are compared
+# as sets of rows.
+PARITY_CASES = [
+    ("get_overtime_by_staff", lambda: get_overtime_by_staff(), True),
+    ("get_overtime_by_staff[page]", lambda: get_overtime_by_staff(limit=5, after=(50.0, "S9999")), True),
+    ("get_patient_to_staff_ratio", lambda: get_patient_to_staff_ratio(), True),
+    ("get_weekly_capacity_utilization", lambda: get_weekly_capacity_utilization(), True),
+    ("get_weekly_capacity_utilization[RN]", lambda: get_weekly_capacity_utilization(roles=["RN"]), True),
+    ("get_cancellation_rate_by_unit", lambda: get_cancellation_rate_by_unit(), True),
+    ("get_average_shift_duration", lambda: get_average_shift_duration(), True),
+    ("get_total_days_worked", lambda: get_total_days_worked(limit=10), True),
+    ("get_shift_fatigue", lambda: get_shift_fatigue(), False),
+    ("get_staff_trends", lambda: get_staff_trends(), True),
+    ("get_patient_to_staff_ratio_by_period", lambda: get_patient_to_staff_ratio_by_period(), False),
+    ("get_staffing_gaps", lambda: get_staffing_gaps(), False),
+    ("get_reassignment_plan", lambda: get_reassignment_plan(), False),
+    ("build_staff_risk_profile[sql]", lambda: build_staff_risk_profile(mode="sql"), False),
+    ("build_staff_risk_profile[pandas]", lambda: build_staff_risk_profile(mode="pandas"), False),
+    ("build_staff_risk_profile[RN]", lambda: build_staff_risk_profile(mode="sql", roles=["RN"]), False),
+]
+
+
+def _comparable(df):
+    # Dates as datetime64 and numbers as float64 on both sides: psycopg2
+    # returns date objects and bigint sums, DuckDB datetime64 and int128 sums
+    # as float
+    df = df.reset_index(drop=True).copy()
+    for col in df.columns:
+        values = df[col]
+        first = values.dropna().iloc[0] if values.notna().any() else None
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        if pd.api.types.is_datetime64_any_dtype(values) or isinstance(first, datetime.date):
+            df[col] = pd.to_datetime(values).astype("datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(values) or isinstance(first, decimal.Decimal):
+            df[col] = values.astype("float64")
+        else:
+            df[col] = values.astype(object).where(values.notna(), None)
+    return df
+
+
+def compare_frames(expected, actual, ordered=True, tolerance=1e-9):
+    # Returns (None, max numeric difference) when the frames match, else
+    # (reason, None)
+    expected, actual = _comparable(expected), _comparable(actual)
+    if list(expected.columns) != list(actual.columns):
+        return f"columns {list(expected.columns)} vs {list(actual.columns)}", None
+    if len(expected) != len(actual):
+        return f"{len(expected)} vs {len(actual)} rows", None
+    if not ordered and len(expected):
+        columns = list(expected.columns)
+        expected = expected.sort_values(columns, kind="stable").reset_index(drop=True)
+        actual = actual.sort_values(columns, kind="stable").reset_index(drop=True)
+
+    max_diff = 0.0
+    for col in expected.columns:
+        if pd.api.types.is_float_dtype(expected[col]) and pd.api.types.is_float_dtype(actual[col]):
+            a, b = expected[col].to_numpy(), actual[col].to_numpy()
+            if not np.array_equal(np.isnan(a), np.isnan(b)):
+                return f"NULLs differ in {col}", None
+            diff = np.nanmax(np.abs(a - b)) if len(a) and not np.isnan(a).all() else 0.0
+            if diff > tolerance:
+                return f"{col} differs by up to {diff}", None
+            max_diff = max(max_diff, diff)
+        elif not expected[col].equals(actual[col]):
+            return f"values differ in {col}", None
+    return None, max_diff
+
+
+def check_backend_parity(backend, reference=None, tolerance=1e-9):
+    # Runs every PARITY_CASES metric on backend and on reference (Postgres
+    # by default) and raises ValueError listing the ones that differ.
+    # Returns {case: max numeric difference}.
+    reference = reference or PostgresBackend()
+    previous = get_backend()
+    diffs = {}
+    mismatches = []
+    try:
+        for name, fn, ordered in PARITY_CASES:
+            set_backend(reference)
+            expected = fn()
+            set_backend(backend)
+            actual = fn()
+            if not isinstance(expected, tuple):
+                expected, actual = (expected,), (actual,)
+            case_diff = 0.0
+            for expected_df, actual_df in zip(expected, actual):
+                reason, diff = compare_frames(expected_df, actual_df, ordered, tolerance)
+                if reason is not None:
+                    mismatches.append(f"{name}: {reason}")
+                    break
+                case_diff = max(case_diff, diff)
+            else:
+                diffs[name] = case_diff
+    finally:
+        set_backend(previous)
+    if mismatches:
+        raise ValueError(f"{backend.name} differs from {reference.name}:\n" + "\n".join(mismatches))
+    return diffs
+
 if __name__ == "__main__":
     # print("Testing queries...\n")
 
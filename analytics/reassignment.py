@@ -0,0 +1,189 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+# Hours a reassigned shift takes out of the staff member's weekly headroom
+SHIFT_HOURS = 12
+
+# Role filled when the gap frame has no role column
+DEFAULT_ROLE = "RN"
+
+# {unit: [home units whose staff may float there]}. Units not listed accept
+# staff from any home unit; staff from the unit itself always qualify.
+QUALIFYING_HOME_UNITS = {}
+
+
+def week_of(dates):
+    dates = pd.to_datetime(dates)
+    return (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+
+
+def _scheduled(shifts):
+    if shifts is None:
+        return None
+    return shifts[shifts["status"] == "scheduled"] if "status" in shifts.columns else shifts
+
+
+def scheduled_hours(shifts, shift_hours=SHIFT_HOURS):
+    # Hours of the scheduled shifts per staff-week; a shift without start and
+    # end times counts as shift_hours
+    if {"shift_start", "shift_end"} <= set(shifts.columns):
+        hours = (pd.to_datetime(shifts["shift_end"]) - pd.to_datetime(shifts["shift_start"])).dt.total_seconds() / 3600
+        hours = hours.fillna(shift_hours)
+    else:
+        hours = pd.Series(float(shift_hours), index=shifts.index)
+    return (
+        pd.DataFrame({"staff_id": shifts["staff_id"], "week": week_of(shifts["shift_date"]), "scheduled_hours": hours})
+        .groupby(["staff_id", "week"], as_index=False)["scheduled_hours"].sum()
+    )
+
+
+def weekly_headroom(staff, timekeeping, weeks, shifts=None, shift_hours=SHIFT_HOURS):
+    # max_hours_per_week minus the hours already booked, for every staff
+    # member and every week a gap falls in. Booked is the larger of the
+    # hours worked in timekeeping and the hours of scheduled shifts: gap
+    # weeks are mostly in the future, with no timekeeping yet, and in past
+    # weeks the two record the same shifts.
+    booked = (
+        timekeeping.assign(week=week_of(timekeeping["week_start"]))
+        .groupby(["staff_id", "week"], as_index=False)["hours_worked"].sum()
+    )
+    scheduled = _scheduled(shifts)
+    if scheduled is not None:
+        booked = booked.merge(scheduled_hours(scheduled, shift_hours), on=["staff_id", "week"], how="outer")
+        booked["hours_worked"] = booked[["hours_worked", "scheduled_hours"]].max(axis=1)
+        booked = booked.drop(columns=["scheduled_hours"])
+    df = staff[["staff_id", "role", "home_unit", "max_hours_per_week"]].merge(
+        pd.DataFrame({"week": pd.to_datetime(pd.Series(weeks).unique())}), how="cross"
+    )
+    df = df.merge(booked, on=["staff_id", "week"], how="left")
+    df["headroom"] = df["max_hours_per_week"] - df["hours_worked"].fillna(0)
+    return df.drop(columns=["hours_worked"])
+
+
+def _heap_index(df, key_columns):
+    # Sorting once makes every key's slice an already valid heap, so building
+    # the index costs one sort rather than a heappush per candidate
+    df = df.sort_values(
+        key_columns + ["headroom", "staff_id"],
+        ascending=[True] * len(key_columns) + [False, True],
+        kind="stable"
+    )
+    changed = np.zeros(max(len(df) - 1, 0), dtype=bool)
+    for col in key_columns:
+        values = df[col].to_numpy()
+        changed |= values[1:] != values[:-1]
+    bounds = np.flatnonzero(np.r_[True, changed, True])
+    keys = list(zip(*(df[col].iloc[bounds[:-1]].tolist() for col in key_columns)))
+    entries = list(zip((-df["headroom"]).tolist(), df["staff_id"].tolist()))
+    return {key: entries[start:end] for key, start, end in zip(keys, bounds[:-1], bounds[1:])}
+
+
+def build_candidate_index(headroom, gap_dates, shifts=None, shift_hours=SHIFT_HOURS):
+    # Heaps of (-headroom, staff_id) over the staff free on each gap date (no
+    # scheduled shift that day) with room for one more shift that week:
+    # (role, home_unit, date) -> heap, plus (role, date) -> heap pooling all
+    # home units for units without float restrictions
+    dates = pd.DataFrame({"date": pd.Series(gap_dates).drop_duplicates()})
+    dates["week"] = week_of(dates["date"])
+    df = headroom[headroom["headroom"] >= shift_hours].merge(dates, on="week")
+    scheduled = _scheduled(shifts)
+    if scheduled is not None:
+        scheduled = pd.DataFrame({
+            "staff_id": scheduled["staff_id"],
+            "date": pd.to_datetime(scheduled["shift_date"]).dt.normalize(),
+        }).drop_duplicates()
+        df = df.merge(scheduled, on=["staff_id", "date"], how="left", indicator=True)
+        df = df[df["_merge"] == "left_only"]
+    if df.empty:
+        return {}, {}
+    return _heap_index(df, ["role", "home_unit", "date"]), _heap_index(df, ["role", "date"])
+
+
+def _pop_candidate(heap, week, remaining, assigned, date, shift_hours):
+    # Lazy deletion: staff already placed that day (through another heap) or
+    # out of headroom are dropped, and an entry whose weekly headroom shrank
+    # since it was pushed is re-keyed rather than updating every date's heap
+    while heap:
+        neg_room, staff_id = heapq.heappop(heap)
+        if (staff_id, date) in assigned:
+            continue
+        room = remaining[(staff_id, week)]
+        if room < shift_hours:
+            continue
+        if room != -neg_room:
+            heapq.heappush(heap, (-room, staff_id))
+            continue
+        return staff_id, room
+    return None
+
+
+def plan_reassignments(gaps, staff, timekeeping, shifts=None, shift_hours=SHIFT_HOURS,
+                       qualifying_home_units=None, role=DEFAULT_ROLE):
+    # Greedy float-pool plan. Gaps are (unit, date, staff_needed[, role]),
+    # e.g. forecast_staffing_gaps output. The gap with the largest remaining
+    # shortfall is served first, one staff member at a time, from a gap heap.
+    # Each slot takes the staff member with the most headroom from the unit's
+    # own (role, unit, date) heap, and only floats someone in from the
+    # qualifying home units (or the pooled heap) when that is empty.
+    # Returns (plan, unfilled): plan ranked in assignment order, unfilled the
+    # gaps with staff still missing.
+    qualifying_home_units = QUALIFYING_HOME_UNITS if qualifying_home_units is None else qualifying_home_units
+    plan_columns = ["unit", "date", "role", "staff_id", "home_unit", "floated", "headroom_after"]
+    unfilled_columns = ["unit", "date", "role", "staff_needed"]
+    gaps = gaps[gaps["staff_needed"] > 0]
+    if gaps.empty:
+        return pd.DataFrame(columns=["rank"] + plan_columns), pd.DataFrame(columns=unfilled_columns)
+    if "role" not in gaps.columns:
+        gaps = gaps.assign(role=role)
+    gaps = gaps.assign(date=pd.to_datetime(gaps["date"]).dt.normalize()).reset_index(drop=True)
+    gaps["week"] = week_of(gaps["date"])
+
+    headroom = weekly_headroom(staff, timekeeping, gaps["week"], shifts, shift_hours)
+    by_unit, pooled = build_candidate_index(headroom, gaps["date"], shifts, shift_hours)
+    remaining = dict(zip(zip(headroom["staff_id"], headroom["week"]), headroom["headroom"].tolist()))
+    home_units = dict(zip(headroom["staff_id"], headroom["home_unit"]))
+    assigned = set()
+
+    gap_heap = list(zip(
+        (-gaps["staff_needed"].astype(int)).tolist(),
+        gaps["date"].tolist(),
+        gaps["unit"].tolist(),
+        gaps["role"].tolist(),
+        gaps["week"].tolist()
+    ))
+    heapq.heapify(gap_heap)
+    plan = []
+    unfilled = []
+
+    while gap_heap:
+        neg_need, date, unit, gap_role, week = heapq.heappop(gap_heap)
+        if unit in qualifying_home_units:
+            float_heaps = [by_unit.get((gap_role, home, date)) for home in qualifying_home_units[unit]]
+        else:
+            float_heaps = [pooled.get((gap_role, date))]
+
+        choice = None
+        for heap in [by_unit.get((gap_role, unit, date))] + float_heaps:
+            choice = _pop_candidate(heap or [], week, remaining, assigned, date, shift_hours)
+            if choice is not None:
+                break
+        if choice is None:
+            unfilled.append((unit, date, gap_role, -neg_need))
+            continue
+
+        # Not pushed back: one shift per staff member per day
+        staff_id, room = choice
+        remaining[(staff_id, week)] = room - shift_hours
+        assigned.add((staff_id, date))
+        plan.append((unit, date, gap_role, staff_id, home_units[staff_id], home_units[staff_id] != unit,
+                     room - shift_hours))
+        if neg_need + 1 < 0:
+            heapq.heappush(gap_heap, (neg_need + 1, date, unit, gap_role, week))
+
+    plan = pd.DataFrame(plan, columns=plan_columns)
+    plan.insert(0, "rank", np.arange(1, len(plan) + 1))
+    unfilled = pd.DataFrame(unfilled, columns=unfilled_columns)
+    return plan, unfilled
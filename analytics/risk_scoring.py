@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+# Weight of each normalized feature column in the risk score
+DEFAULT_WEIGHTS = {
+    "overtime_norm": 0.35,
+    "capacity_norm": 0.30,
+    "days_norm": 0.10,
+    "shift_norm": 0.05,
+    # Share of shifts double-booked or after a short rest (shift_overlap.py)
+    "fatigue_norm": 0.20,
+}
+
+# Opt-in weights (weights=TREND_WEIGHTS) that also score the 4-week trends
+# of the staff-week (etl/trends.py): overtime share, its week-over-week
+# rise, sick hours and longest run of days worked. The baseline features
+# weigh less to make room, so levels differ from DEFAULT_WEIGHTS.
+TREND_WEIGHTS = {
+    "overtime_norm": 0.25,
+    "capacity_norm": 0.20,
+    "days_norm": 0.05,
+    "shift_norm": 0.05,
+    "fatigue_norm": 0.15,
+    "recent_overtime_norm": 0.10,
+    "overtime_trend_norm": 0.05,
+    "sick_norm": 0.05,
+    "streak_norm": 0.10,
+}
+
+# (risk_level, minimum score) from the highest level down; anything below
+# the last threshold gets DEFAULT_LEVEL
+DEFAULT_THRESHOLDS = [
+    ("High", 0.75),
+    ("Moderate", 0.5),
+]
+
+DEFAULT_LEVEL = "Low"
+
+
+def feature_matrix(df, features):
+    missing = [col for col in features if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    return df[list(features)].to_numpy(dtype="float64")
+
+
+def score(df, weights=None):
+    # Weighted sum of the feature columns as one matrix-vector product.
+    # A NaN feature gives a NaN score, same as the column arithmetic it replaces.
+    weights = weights or DEFAULT_WEIGHTS
+    features = list(weights)
+    return feature_matrix(df, features) @ np.array([weights[f] for f in features], dtype="float64")
+
+
+def classify(scores, thresholds=None, default=DEFAULT_LEVEL):
+    # Bucket a score array of any shape; NaN scores fall through to the default
+    thresholds = sorted(thresholds or DEFAULT_THRESHOLDS, key=lambda t: t[1], reverse=True)
+    scores = np.asarray(scores, dtype="float64")
+    return np.select(
+        [scores >= cutoff for _, cutoff in thresholds],
+        [level for level, _ in thresholds],
+        default=default
+    )
+
+
+def score_risk(df, weights=None, thresholds=None):
+    df = df.copy()
+    df["risk_score"] = score(df, weights)
+    df["risk_level"] = classify(df["risk_score"].to_numpy(), thresholds)
+    return df
+
+
+def score_scenarios(df, scenarios):
+    # Score many weight configurations over the same feature matrix at once:
+    # (rows x features) @ (features x scenarios). scenarios maps a scenario
+    # name to a weights dict; features a scenario leaves out weigh 0.
+    features = list(dict.fromkeys(f for weights in scenarios.values() for f in weights))
+    weight_matrix = np.array(
+        [[weights.get(f, 0.0) for weights in scenarios.values()] for f in features],
+        dtype="float64"
+    )
+    scores = feature_matrix(df, features) @ weight_matrix
+    return pd.DataFrame(scores, index=df.index, columns=list(scenarios))
+
+
+def classify_scenarios(scores_df, thresholds=None):
+    levels = classify(scores_df.to_numpy(), thresholds)
+    return pd.DataFrame(levels, index=scores_df.index, columns=scores_df.columns)
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import datetime
+import decimal
+import json
+import re
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    import asyncpg
+    from aiohttp import web
+except ImportError:
+    asyncpg = None
+    web = None
+
+from analytics.metrics import METRICS, build_risk_profile_query, metric_query, next_page_key
+from etl.data_upload import DB_CONFIG, POOL_MAX_SIZE, POOL_MIN_SIZE
+
+
+# Request latencies kept per route for the p50/p99 in /stats
+LATENCY_SAMPLES = 10000
+
+# Query string parameters passed on to the metrics filters
+LIST_FILTERS = ("units", "roles", "staff_ids")
+DATE_FILTERS = ("start_date", "end_date")
+
+# Page key columns holding dates; the other key columns are text
+DATE_KEYS = ("shift_date", "week_start")
+
+# Response header with the after= value of the next page
+NEXT_PAGE_HEADER = "X-Next-After"
+
+PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+
+def _require_service_deps():
+    if asyncpg is None or web is None:
+        raise ImportError("asyncpg and aiohttp are required for the metrics service (pip install asyncpg aiohttp)")
+
+
+def to_asyncpg(query, params):
+    # The metrics SQL uses psycopg2's %(name)s placeholders; asyncpg takes
+    # positional $n ones. A name used twice maps to the same $n.
+    names = []
+
+    def number(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    query = PARAM_PATTERN.sub(number, query).replace("%%", "%")
+    return query, [params[name] for name in names]
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def request_filters(request):
+    # ?units=ICU,ER&roles=RN&start_date=2026-02-23&limit=10
+    filters = {}
+    for name in LIST_FILTERS:
+        if request.query.get(name):
+            filters[name] = [value.strip() for value in request.query[name].split(",") if value.strip()]
+    for name in DATE_FILTERS:
+        if request.query.get(name):
+            try:
+                filters[name] = datetime.date.fromisoformat(request.query[name])
+            except ValueError:
+                raise web.HTTPBadRequest(text=f"{name} must be a YYYY-MM-DD date")
+    return filters
+
+
+def request_limit(request, name="limit"):
+    value = request.query.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise web.HTTPBadRequest(text=f"{name} must be a non-negative integer")
+    return int(value)
+
+
+def request_after(request, metric):
+    # ?after=[71.43,"S1004"]: the page key from the previous page's
+    # X-Next-After header, the sort value and then the key columns
+    value = request.query.get("after")
+    if value is None:
+        return None
+    _, _, sort_column, key_columns = METRICS[metric]
+    try:
+        after = json.loads(value)
+        if not isinstance(after, list) or len(after) != len(key_columns) + 1:
+            raise ValueError
+        return [float(after[0])] + [
+            datetime.date.fromisoformat(key) if column in DATE_KEYS else str(key)
+            for column, key in zip(key_columns, after[1:])
+        ]
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(
+            text=f"after must be a JSON array of {sort_column}, {', '.join(key_columns)}"
+        )
+
+
+async def fetch(pool, query, params):
+    query, args = to_asyncpg(query, params)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, *args)
+    return [dict(row) for row in rows]
+
+
+async def fetch_metric(pool, metric, limit=None, after=None, **filters):
+    return await fetch(pool, *metric_query(metric, limit, after, **filters))
+
+
+async def fetch_risk_profile(pool, top_n=None, **filters):
+    query, params = build_risk_profile_query(**filters)
+    params["top_n"] = top_n
+    return await fetch(pool, query, params)
+
+
+def json_response(data, headers=None):
+    return web.json_response(data, headers=headers, dumps=lambda obj: json.dumps(obj, default=_json_default))
+
+
+async def metric_page(request, metric):
+    # One page of a metric; a full page carries the next page's key
+    limit = request_limit(request)
+    rows = await fetch_metric(
+        request.app["pool"], metric, limit, request_after(request, metric), **request_filters(request)
+    )
+    key = next_page_key(pd.DataFrame(rows), metric, limit) if rows else None
+    headers = {NEXT_PAGE_HEADER: json.dumps(key, default=_json_default)} if key is not None else None
+    return json_response(rows, headers)
+
+
+async def risk_profile(request):
+    filters = request_filters(request)
+    return json_response(await fetch_risk_profile(request.app["pool"], request_limit(request, "top_n"), **filters))
+
+
+async def patient_to_staff_ratio(request):
+    return await metric_page(request, "patient_to_staff_ratio")
+
+
+async def cancellation_rates(request):
+    return await metric_page(request, "cancellation_rate_by_unit")
+
+
+async def capacity_utilization(request):
+    return await metric_page(request, "weekly_capacity_utilization")
+
+
+async def dashboard(request):
+    # The four independent queries run concurrently on separate pool
+    # connections, so the response takes as long as the slowest one
+    pool = request.app["pool"]
+    filters = request_filters(request)
+    limit = request_limit(request)
+    risk, ratios, cancellations, capacity = await asyncio.gather(
+        fetch_risk_profile(pool, limit, **filters),
+        fetch_metric(pool, "patient_to_staff_ratio", limit, **filters),
+        fetch_metric(pool, "cancellation_rate_by_unit", limit, **filters),
+        fetch_metric(pool, "weekly_capacity_utilization", limit, **filters),
+    )
+    return json_response({
+        "risk_profile": risk,
+        "patient_to_staff_ratio": ratios,
+        "cancellation_rates": cancellations,
+        "capacity_utilization": capacity,
+    })
+
+
+def latency_summary(samples):
+    summary = {}
+    for route, latencies in samples.items():
+        values = np.array(latencies) * 1000
+        summary[route] = {
+            "requests": len(values),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "max_ms": round(float(values.max()), 2),
+        }
+    return summary
+
+
+async def stats(request):
+    pool = request.app["pool"]
+    return json_response({
+        "latency": latency_summary(request.app["latencies"]),
+        "pool": {"size": pool.get_size(), "idle": pool.get_idle_size()},
+    })
+
+
+async def record_latency(request, handler):
+    start = time.perf_counter()
+    try:
+        return await handler(request)
+    finally:
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else request.path
+        samples = request.app["latencies"].setdefault(name, deque(maxlen=LATENCY_SAMPLES))
+        samples.append(time.perf_counter() - start)
+
+
+async def open_pool(app):
+    app["pool"] = await asyncpg.create_pool(
+        host=DB_CONFIG["host"],
+        port=DB_CONFIG["port"],
+        database=DB_CONFIG["database"],
+        user=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        min_size=app["pool_min_size"],
+        max_size=app["pool_max_size"],
+    )
+
+
+async def close_pool(app):
+    await app["pool"].close()
+
+
+def create_app(pool_min_size=POOL_MIN_SIZE, pool_max_size=POOL_MAX_SIZE, pool=None):
+    # pool: an open asyncpg-style pool to serve from instead of connecting
+    # to DB_CONFIG at startup
+    _require_service_deps()
+    app = web.Application(middlewares=[web.middleware(record_latency)])
+    app["pool_min_size"] = pool_min_size
+    app["pool_max_size"] = pool_max_size
+    app["latencies"] = {}
+    if pool is None:
+        app.on_startup.append(open_pool)
+        app.on_cleanup.append(close_pool)
+    else:
+        app["pool"] = pool
+    app.router.add_get("/risk-profile", risk_profile)
+    app.router.add_get("/patient-to-staff-ratio", patient_to_staff_ratio)
+    app.router.add_get("/cancellation-rates", cancellation_rates)
+    app.router.add_get("/capacity-utilization", capacity_utilization)
+    app.router.add_get("/dashboard", dashboard)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the risk and coverage metrics as JSON")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pool-size", type=int, default=POOL_MAX_SIZE,
+                        help="Maximum Postgres connections held by the service")
+    args = parser.parse_args()
+
+    web.run_app(create_app(pool_max_size=args.pool_size), host=args.host, port=args.port)
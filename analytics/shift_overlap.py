@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+
+# Minimum rest between the end of one shift and the start of the next
+MIN_REST_HOURS = 8
+
+
+def sweep_shift_gaps(shifts):
+    # One sorted sweep per staff member: each shift is compared with the
+    # latest end of all the staff member's earlier shifts (a grouped cummax),
+    # so overlaps with any earlier shift are caught in O(n log n) overall.
+    # Returns the sorted shifts with previous_shift_id, previous_end and
+    # gap_hours (negative when the shift overlaps an earlier one).
+    df = shifts.dropna(subset=["staff_id", "shift_start", "shift_end"])
+    df = df.sort_values(["staff_id", "shift_start", "shift_id"], kind="stable").reset_index(drop=True)
+
+    start = df["shift_start"].to_numpy("datetime64[ns]").astype("int64")
+    end = df["shift_end"].to_numpy("datetime64[ns]").astype("int64")
+    staff = df["staff_id"].to_numpy()
+    first_of_staff = np.ones(len(df), dtype=bool)
+    first_of_staff[1:] = staff[1:] != staff[:-1]
+
+    running_end = pd.Series(end).groupby(staff).cummax().to_numpy()
+    previous_end = np.empty(len(df), dtype="int64")
+    if len(df):
+        previous_end[1:] = running_end[:-1]
+        previous_end[first_of_staff] = start[first_of_staff]
+
+    gap_hours = (start - previous_end) / 3.6e12
+    gap_hours[first_of_staff] = np.nan
+
+    return df.assign(
+        previous_shift_id=df["shift_id"].shift(1).where(~first_of_staff),
+        previous_end=pd.Series(pd.to_datetime(previous_end)).where(~first_of_staff),
+        gap_hours=gap_hours
+    )
+
+
+def find_shift_conflicts(shifts, min_rest_hours=MIN_REST_HOURS, statuses=("scheduled",)):
+    # Double bookings (a shift starting before an earlier one has ended) and
+    # short rests (less than min_rest_hours since the latest earlier end)
+    if statuses is not None:
+        shifts = shifts[shifts["status"].isin(statuses)]
+    df = sweep_shift_gaps(shifts)
+    conflict_type = np.select(
+        [df["gap_hours"] < 0, df["gap_hours"] < min_rest_hours],
+        ["overlap", "short_rest"],
+        default=""
+    )
+    df = df.assign(conflict_type=conflict_type)
+    return df.loc[df["conflict_type"] != "", [
+        "staff_id", "shift_id", "previous_shift_id", "shift_start",
+        "previous_end", "gap_hours", "conflict_type"
+    ]].reset_index(drop=True)
+
+
+def fatigue_by_staff(shifts, min_rest_hours=MIN_REST_HOURS, statuses=("scheduled",)):
+    # Per staff: overlapping and short-rest shift counts, and fatigue_norm,
+    # the share of the staff member's shifts that start one of either (0-1)
+    if statuses is not None:
+        shifts = shifts[shifts["status"].isin(statuses)]
+    df = sweep_shift_gaps(shifts)
+    df = df.assign(
+        overlapping=df["gap_hours"] < 0,
+        short_rest=(df["gap_hours"] >= 0) & (df["gap_hours"] < min_rest_hours)
+    )
+    fatigue = df.groupby("staff_id").agg(
+        overlapping_shifts=("overlapping", "sum"),
+        short_rest_shifts=("short_rest", "sum"),
+        scheduled_shifts=("shift_id", "size")
+    ).reset_index()
+    fatigue["fatigue_norm"] = (
+        (fatigue["overlapping_shifts"] + fatigue["short_rest_shifts"]) / fatigue["scheduled_shifts"]
+    )
+    return fatigue
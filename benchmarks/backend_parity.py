@@ -0,0 +1,80 @@
+import argparse
+import contextlib
+import io
+import time
+
+import analytics.cache as cache
+import analytics.metrics as metrics
+from analytics.backends import DuckDBBackend, PostgresBackend, set_backend
+from etl.compact import concat_frames
+from etl.data_cleanser import (
+    cleanse_census_data, cleanse_shift_schedule, cleanse_staff_master, cleanse_time_keeping, find_files, read_file
+)
+from etl.landing_zone import LANDING_DIR
+from etl.reject_sink import RejectSink, set_reject_sink
+
+
+SOURCES = [
+    ('staff_master*.csv', 'staff', cleanse_staff_master),
+    ('shift_schedule_week_*.csv', 'shifts', cleanse_shift_schedule),
+    ('census_daily_week_*.csv', 'census', cleanse_census_data),
+    ('timekeeping_week_*.csv', 'timekeeping', cleanse_time_keeping),
+]
+
+
+def cleansed_frames():
+    # The files in data/ through the cleansers, as the loaders would see them
+    frames = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for pattern, table, cleanse_fn in SOURCES:
+            frames[table] = concat_frames(
+                [cleanse_fn(read_file(path)) for path in find_files(pattern)], ignore_index=True
+            )
+    return frames
+
+
+def time_cases(backend, repeat):
+    # Best of repeat runs of every parity case, in ms
+    set_backend(backend)
+    timings = {}
+    for name, fn, _ in metrics.PARITY_CASES:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best * 1000
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the DuckDB metrics backend against Postgres and compare their latency"
+    )
+    parser.add_argument("--landing", nargs="?", const=LANDING_DIR,
+                        help="Run DuckDB over the Parquet landing zone instead of the cleansed data/ files")
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Rejects from re-cleansing data/ are not written anywhere
+    set_reject_sink(RejectSink(flush_rows=None))
+    # Timings should be of the queries, not of cache hits
+    cache.CACHE_ENABLED = False
+
+    duckdb_backend = DuckDBBackend.from_landing(args.landing) if args.landing else \
+        DuckDBBackend.from_frames(cleansed_frames())
+    postgres = PostgresBackend()
+
+    diffs = metrics.check_backend_parity(duckdb_backend, postgres, args.tolerance)
+    print(f"All {len(diffs)} metrics match (max difference {max(diffs.values()):.2e}).")
+
+    postgres_ms = time_cases(postgres, args.repeat)
+    duckdb_ms = time_cases(duckdb_backend, args.repeat)
+    set_backend(None)
+
+    print(f"{'metric':<40} {'postgres ms':>12} {'duckdb ms':>10} {'speedup':>8}")
+    for name, _, _ in metrics.PARITY_CASES:
+        print(f"{name:<40} {postgres_ms[name]:>12.1f} {duckdb_ms[name]:>10.1f} "
+              f"{postgres_ms[name] / duckdb_ms[name]:>7.1f}x")
@@ -0,0 +1,85 @@
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from benchmarks.scale_benchmark import CLEANSERS, SCALES
+from benchmarks.synthetic import generate, write_dataset
+import etl.compact as compact
+from etl.compact import concat_frames
+from etl.data_cleanser import read_file
+from etl.reject_sink import RejectSink, set_reject_sink
+
+
+# The joins build_staff_risk_profile and the coverage metrics make, over the
+# cleansed frames: (name, fn(frames) -> DataFrame)
+MERGES = [
+    ("timekeeping x staff", lambda f: f["timekeeping"].merge(f["staff"], on="staff_id")),
+    ("shifts x staff", lambda f: f["shifts"].merge(f["staff"], on="staff_id", suffixes=("", "_staff"))),
+    ("shifts x census", lambda f: f["shifts"].merge(
+        f["census"], left_on=["unit", "shift_date"], right_on=["unit", "date"]
+    )),
+    ("staff-week x staff aggregates", lambda f: (
+        f["timekeeping"].groupby(["staff_id", "week_start"], observed=True, as_index=False)["hours_worked"].sum()
+        .merge(
+            f["shifts"][f["shifts"]["status"] == "scheduled"]
+            .groupby("staff_id", observed=True, as_index=False)["shift_date"].nunique(),
+            on="staff_id"
+        )
+        .merge(f["staff"][["staff_id", "max_hours_per_week"]], on="staff_id")
+    )),
+]
+
+
+def cleanse_all(paths, compact_frames):
+    compact.COMPACT_FRAMES = compact_frames
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {
+            table: concat_frames([cleanse_fn(read_file(path)) for path in paths[table]], ignore_index=True)
+            for table, cleanse_fn in CLEANSERS.items()
+        }
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory and merge time of the cleansed frames, plain vs the compact layout"
+    )
+    parser.add_argument("--scale", choices=list(SCALES), default="100x")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Rejected rows are counted by the cleansers but not written anywhere
+    set_reject_sink(RejectSink(flush_rows=None))
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        paths = write_dataset(generate(**SCALES[args.scale], seed=args.seed), data_dir)
+        plain = cleanse_all(paths, False)
+        packed = cleanse_all(paths, True)
+
+    print(f"{'table':<12} {'rows':>10} {'plain MB':>9} {'compact MB':>11} {'saved':>6}")
+    for table in CLEANSERS:
+        before = plain[table].memory_usage(deep=True).sum() / 2**20
+        after = packed[table].memory_usage(deep=True).sum() / 2**20
+        print(f"{table:<12} {len(plain[table]):>10,} {before:>9.2f} {after:>11.2f} {1 - after / before:>6.0%}")
+
+    print()
+    print(f"{'merge':<32} {'rows':>10} {'plain ms':>9} {'compact ms':>11} {'speedup':>8}")
+    for name, fn in MERGES:
+        rows = len(fn(plain))
+        if len(fn(packed)) != rows:
+            raise ValueError(f"{name}: compact frames give a different number of rows")
+        before = best_time(lambda: fn(plain), args.repeat) * 1000
+        after = best_time(lambda: fn(packed), args.repeat) * 1000
+        print(f"{name:<32} {rows:>10,} {before:>9.1f} {after:>11.1f} {before / after:>7.1f}x")
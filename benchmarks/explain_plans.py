@@ -0,0 +1,179 @@
+import argparse
+import os
+import re
+
+import pandas as pd
+
+import analytics.cache as cache
+import analytics.metrics as metrics
+from etl.data_upload import get_connection
+
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
+SCHEMA_FILE = os.path.join(BASE_DIR, 'schema.sql')
+INDEX_MIGRATION = os.path.join(BASE_DIR, 'migrations', '002_indexes_and_partitions.sql')
+
+METRIC_QUERIES = [
+    ("get_overtime_by_staff", metrics.get_overtime_by_staff),
+    ("get_patient_to_staff_ratio", metrics.get_patient_to_staff_ratio),
+    ("get_weekly_capacity_utilization", metrics.get_weekly_capacity_utilization),
+    ("get_cancellation_rate_by_unit", metrics.get_cancellation_rate_by_unit),
+    ("get_average_shift_duration", metrics.get_average_shift_duration),
+    ("get_total_days_worked", metrics.get_total_days_worked),
+    ("build_staff_risk_profile[sql]", lambda: metrics.build_staff_risk_profile(mode="sql", top_n=10)),
+]
+
+# Synthetic multi-year dataset generated server-side. Shift times are
+# 07-19 day / 19-07 night, ~5% of shifts Cancelled and ~5% open.
+SYNTHETIC_DATA = """
+INSERT INTO staff
+SELECT
+    'S' || i,
+    'First' || i,
+    'Last' || i,
+    (ARRAY['RN', 'LPN', 'CNA'])[1 + i %% 3],
+    (ARRAY['FT', 'PT', 'PERDIEM'])[1 + i %% 3],
+    'UNIT' || (i %% %(units)s),
+    (ARRAY[36, 24, 16])[1 + i %% 3],
+    DATE '2015-01-01' + (i %% 3000)
+FROM generate_series(1, %(staff)s) AS i;
+
+INSERT INTO census
+SELECT
+    'C' || row_number() OVER (),
+    'UNIT' || u,
+    d::date,
+    20 + (random() * 30)::int,
+    (random() * 8)::int,
+    (random() * 8)::int
+FROM generate_series(DATE '2026-02-28' - %(days)s + 1, DATE '2026-02-28', INTERVAL '1 day') AS d,
+     generate_series(0, %(units)s - 1) AS u;
+
+INSERT INTO shifts
+SELECT
+    'SH' || row_number() OVER (),
+    'S' || (1 + (random() * (%(staff)s - 1))::int),
+    'UNIT' || u,
+    d::date,
+    d + CASE WHEN k %% 2 = 0 THEN INTERVAL '7 hours' ELSE INTERVAL '19 hours' END,
+    d + CASE WHEN k %% 2 = 0 THEN INTERVAL '19 hours' ELSE INTERVAL '31 hours' END,
+    CASE WHEN k %% 2 = 0 THEN 'day' ELSE 'night' END,
+    (ARRAY['RN', 'LPN', 'CNA'])[1 + k %% 3],
+    CASE WHEN random() < 0.05 THEN 'Cancelled' WHEN random() < 0.05 THEN 'open' ELSE 'scheduled' END
+FROM generate_series(DATE '2026-02-28' - %(days)s + 1, DATE '2026-02-28', INTERVAL '1 day') AS d,
+     generate_series(0, %(units)s - 1) AS u,
+     generate_series(1, %(shifts_per_unit_day)s) AS k;
+
+INSERT INTO timekeeping
+SELECT
+    'TK' || row_number() OVER (),
+    'S' || i,
+    w::date,
+    20 + (random() * 30)::int,
+    (random() * 10)::int,
+    (random() * 8)::int,
+    (random() * 4)::int
+FROM generate_series(DATE '2026-02-23' - 7 * (%(days)s / 7), DATE '2026-02-23', INTERVAL '7 days') AS w,
+     generate_series(1, %(staff)s) AS i;
+
+ANALYZE staff;
+ANALYZE census;
+ANALYZE shifts;
+ANALYZE timekeeping;
+"""
+
+
+def build_schema(conn, schema, sizes, indexed):
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(f"SET search_path TO {schema}")
+    with open(SCHEMA_FILE) as f:
+        cursor.execute(f.read())
+    if indexed:
+        with open(INDEX_MIGRATION) as f:
+            cursor.execute(f.read())
+        cursor.execute(
+            "SELECT ensure_month_partitions(%s, DATE '2026-02-28' - %s, DATE '2026-02-28')",
+            ("shifts", sizes["days"] + 7)
+        )
+        cursor.execute(
+            "SELECT ensure_month_partitions(%s, DATE '2026-02-28' - %s, DATE '2026-02-28')",
+            ("timekeeping", sizes["days"] + 7)
+        )
+    cursor.execute(SYNTHETIC_DATA, sizes)
+    conn.commit()
+    cursor.close()
+
+
+def explain_metric_queries(conn, schema):
+    # Runs each metrics function with run_query swapped for EXPLAIN ANALYZE,
+    # so the plans are for exactly the SQL analytics/metrics.py issues
+    cursor = conn.cursor()
+    cursor.execute(f"SET search_path TO {schema}")
+    results = {}
+    original_run_query = metrics.run_query
+
+    def explain(query, params=None):
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query.strip().rstrip(";"), params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        timing = re.search(r"Execution Time: ([\d.]+) ms", plan)
+        results[current] = (float(timing.group(1)) if timing else None, plan)
+        return pd.DataFrame()
+
+    # Cached results would skip run_query
+    cache_enabled = cache.CACHE_ENABLED
+    cache.CACHE_ENABLED = False
+    metrics.run_query = explain
+    try:
+        for current, fn in METRIC_QUERIES:
+            fn()
+    finally:
+        metrics.run_query = original_run_query
+        cache.CACHE_ENABLED = cache_enabled
+        conn.rollback()
+        cursor.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE metrics queries before/after migrations/002")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--units", type=int, default=12)
+    parser.add_argument("--staff", type=int, default=3000)
+    parser.add_argument("--shifts-per-unit-day", type=int, default=30)
+    parser.add_argument("--show-plans", action="store_true")
+    args = parser.parse_args()
+
+    sizes = {
+        "days": args.years * 365,
+        "units": args.units,
+        "staff": args.staff,
+        "shifts_per_unit_day": args.shifts_per_unit_day,
+    }
+
+    conn = get_connection()
+    print("Building synthetic schemas...")
+    build_schema(conn, "bench_before", sizes, indexed=False)
+    build_schema(conn, "bench_after", sizes, indexed=True)
+
+    before = explain_metric_queries(conn, "bench_before")
+    after = explain_metric_queries(conn, "bench_after")
+
+    print(f"{'query':<34} {'before ms':>11} {'after ms':>11} {'speedup':>9}")
+    for name, _ in METRIC_QUERIES:
+        before_ms, after_ms = before[name][0], after[name][0]
+        speedup = f"{before_ms / after_ms:.1f}x" if before_ms and after_ms else "n/a"
+        print(f"{name:<34} {before_ms:>11.1f} {after_ms:>11.1f} {speedup:>9}")
+
+    if args.show_plans:
+        for name, _ in METRIC_QUERIES:
+            print(f"\n===== {name} (before) =====\n{before[name][1]}")
+            print(f"\n===== {name} (after) =====\n{after[name][1]}")
+
+    cursor = conn.cursor()
+    cursor.execute("DROP SCHEMA bench_before CASCADE")
+    cursor.execute("DROP SCHEMA bench_after CASCADE")
+    conn.commit()
+    cursor.close()
+    conn.close()
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import pandas as pd
+
+from etl.data_upload import get_connection, insert_rows, copy_rows, BATCH_SIZE
+
+
+def make_shifts(n_rows):
+    # Synthetic shift rows shaped like a cleansed shift_schedule frame
+    shift_start = pd.Timestamp("2026-01-05 07:00:00") + pd.to_timedelta(
+        (pd.RangeIndex(n_rows) % 365) * 24, unit="h"
+    )
+    return pd.DataFrame({
+        "shift_id": [f"SH{i:09d}" for i in range(n_rows)],
+        "staff_id": [f"S{1000 + i % 40}" for i in range(n_rows)],
+        "unit": "ICU",
+        "shift_date": shift_start.normalize(),
+        "shift_start": shift_start,
+        "shift_end": shift_start + pd.Timedelta(hours=12),
+        "shift_type": "day",
+        "role": "RN",
+        "status": "scheduled",
+    })
+
+
+def time_load(conn, df, bulk, batch_size):
+    # Loads into a temp copy of shifts so the real table is never touched
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_shifts")
+    cursor.execute("CREATE TEMP TABLE bench_shifts (LIKE shifts INCLUDING DEFAULTS)")
+    cursor.close()
+
+    start = time.perf_counter()
+    if bulk:
+        copy_rows(conn, df, "bench_shifts", columns=list(df.columns), batch_size=batch_size)
+    else:
+        insert_rows(conn, df, "bench_shifts", columns=list(df.columns))
+    conn.commit()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row-by-row INSERT vs COPY load benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    print(f"{'rows':>10} {'insert rows/s':>15} {'copy rows/s':>15} {'speedup':>9}")
+    for n_rows in args.rows:
+        df = make_shifts(n_rows)
+        insert_time = time_load(conn, df, bulk=False, batch_size=args.batch_size)
+        copy_time = time_load(conn, df, bulk=True, batch_size=args.batch_size)
+        print(
+            f"{n_rows:>10} {n_rows / insert_time:>15,.0f} {n_rows / copy_time:>15,.0f} "
+            f"{insert_time / copy_time:>8.1f}x"
+        )
+    conn.close()
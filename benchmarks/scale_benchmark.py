@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import analytics.cache as cache
+import analytics.metrics as metrics
+import etl.data_upload as data_upload
+from benchmarks.synthetic import generate, write_dataset
+from etl.data_cleanser import (
+    cleanse_census_data, cleanse_shift_schedule, cleanse_staff_master, cleanse_time_keeping, read_file
+)
+from etl.reject_sink import RejectSink, set_reject_sink
+
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
+SCHEMA_FILE = os.path.join(BASE_DIR, 'schema.sql')
+INDEX_MIGRATION = os.path.join(BASE_DIR, 'migrations', '002_indexes_and_partitions.sql')
+
+# Sizes relative to the sample week in data/ (40 staff, ~350 shifts)
+SCALES = {
+    "10x": {"facilities": 2, "units_per_facility": 10, "weeks": 5},
+    "100x": {"facilities": 5, "units_per_facility": 10, "weeks": 20},
+    "1000x": {"facilities": 20, "units_per_facility": 12, "weeks": 42},
+}
+
+RESULTS_FILE = os.path.join("logs", "benchmarks", "scale_benchmark.jsonl")
+
+# Throughput drop (or peak memory growth) against the previous run of the
+# same scale and component that is reported as a regression
+REGRESSION_TOLERANCE = 0.2
+
+# Peaks below this are noise and never reported as a memory regression
+MIN_PEAK_MB = 1.0
+
+CLEANSERS = {
+    "staff": cleanse_staff_master,
+    "shifts": cleanse_shift_schedule,
+    "census": cleanse_census_data,
+    "timekeeping": cleanse_time_keeping,
+}
+
+LOADERS = {
+    "staff": data_upload.load_staff,
+    "shifts": data_upload.load_shifts,
+    "census": data_upload.load_census,
+    "timekeeping": data_upload.load_timekeeping,
+}
+
+# (name, fn, tables read); throughput is over the rows of those tables
+METRICS = [
+    ("get_overtime_by_staff", metrics.get_overtime_by_staff, ["staff", "timekeeping"]),
+    ("get_patient_to_staff_ratio", metrics.get_patient_to_staff_ratio, ["census", "shifts"]),
+    ("get_weekly_capacity_utilization", metrics.get_weekly_capacity_utilization, ["staff", "timekeeping"]),
+    ("get_cancellation_rate_by_unit", metrics.get_cancellation_rate_by_unit, ["shifts"]),
+    ("get_average_shift_duration", metrics.get_average_shift_duration, ["shifts"]),
+    ("get_total_days_worked", metrics.get_total_days_worked, ["shifts"]),
+    ("get_shift_fatigue", metrics.get_shift_fatigue, ["shifts"]),
+    ("get_patient_to_staff_ratio_by_period", metrics.get_patient_to_staff_ratio_by_period, ["census", "shifts"]),
+    ("get_staffing_gaps", metrics.get_staffing_gaps, ["census", "shifts"]),
+    ("get_reassignment_plan", metrics.get_reassignment_plan, ["census", "shifts", "staff", "timekeeping"]),
+    ("build_staff_risk_profile[sql]", lambda: metrics.build_staff_risk_profile(mode="sql"),
+     ["staff", "shifts", "timekeeping"]),
+    ("build_staff_risk_profile[pandas]", lambda: metrics.build_staff_risk_profile(mode="pandas"),
+     ["staff", "shifts", "timekeeping"]),
+]
+
+
+def _proc_status(field):
+    # kB value of a /proc/self/status line (Linux only)
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM, the process's peak RSS, so the
+    # peak of each call can be read back. Returns the current RSS in kB, or
+    # None where this is not available.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status("VmRSS")
+    except OSError:
+        return None
+
+
+def measure(fn, trace_memory=False):
+    # (result, seconds, peak RSS growth MB, peak Python allocations MB). RSS
+    # also covers the Arrow and C buffers tracemalloc cannot see; tracemalloc
+    # slows allocation-heavy code, so it is opt-in. The functions' progress
+    # prints are swallowed so they stay out of the timing.
+    gc.collect()
+    rss_baseline = reset_peak_rss()
+    if trace_memory:
+        tracemalloc.reset_peak()
+        traced_baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    seconds = time.perf_counter() - start
+    peak_mb = max(_proc_status("VmHWM") - rss_baseline, 0) / 1024 if rss_baseline is not None else None
+    traced_mb = (tracemalloc.get_traced_memory()[1] - traced_baseline) / 2**20 if trace_memory else None
+    return result, seconds, peak_mb, traced_mb
+
+
+def setup_schema(conn, schema):
+    # A scratch schema with the production tables and indexes; the loaders
+    # create the monthly partitions they need
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(f"SET search_path TO {schema}")
+    with open(SCHEMA_FILE) as f:
+        cursor.execute(f.read())
+    with open(INDEX_MIGRATION) as f:
+        cursor.execute(f.read())
+    conn.commit()
+    cursor.close()
+
+
+@contextlib.contextmanager
+def schema_pool(schema):
+    # Points the shared pool (used by the loaders and metrics) at schema
+    data_upload.close_pool()
+    data_upload.DB_CONFIG["options"] = f"-c search_path={schema}"
+    data_upload.init_pool()
+    try:
+        yield
+    finally:
+        data_upload.close_pool()
+        del data_upload.DB_CONFIG["options"]
+
+
+def run_scale(scale, sizes, seed, dirty_rates, trace_memory, with_db, schema):
+    results = []
+
+    def record(component, rows, seconds, peak_mb, traced_mb):
+        results.append({
+            "scale": scale,
+            "component": component,
+            "rows": int(rows),
+            "seconds": round(seconds, 4),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+            "peak_mb": round(peak_mb, 1) if peak_mb is not None else None,
+            "peak_traced_mb": round(traced_mb, 1) if traced_mb is not None else None,
+        })
+        print(f"{scale:>6} {component:<34} {rows:>10,} {seconds:>9.3f} "
+              f"{rows / seconds if seconds > 0 else 0:>12,.0f} {peak_mb if peak_mb is not None else 0:>9.1f}")
+
+    frames = generate(**sizes, dirty_rates=dirty_rates, seed=seed)
+    cleansed = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        paths = write_dataset(frames, data_dir)
+        for table, cleanse_fn in CLEANSERS.items():
+            raw, *timing = measure(
+                lambda: pd.concat([read_file(path) for path in paths[table]], ignore_index=True), trace_memory
+            )
+            record(f"read:{table}", len(raw), *timing)
+            cleansed[table], *timing = measure(lambda: cleanse_fn(raw), trace_memory)
+            record(f"cleanse:{table}", len(raw), *timing)
+
+    if not with_db:
+        return results
+
+    conn = data_upload.get_connection()
+    setup_schema(conn, schema)
+    try:
+        with schema_pool(schema):
+            for table in ("staff", "shifts", "census", "timekeeping"):
+                _, *timing = measure(lambda: LOADERS[table](cleansed[table]), trace_memory)
+                record(f"load:{table}", len(cleansed[table]), *timing)
+            for name, fn, tables in METRICS:
+                _, *timing = measure(fn, trace_memory)
+                record(f"metric:{name}", sum(len(cleansed[table]) for table in tables), *timing)
+    finally:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        cursor.close()
+        conn.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_regressions(previous, results, tolerance=REGRESSION_TOLERANCE):
+    # Compares each result with the latest earlier run of the same scale and
+    # component: throughput down or peak memory up by more than tolerance
+    latest = {}
+    for row in previous:
+        latest[(row["scale"], row["component"])] = row
+    regressions = []
+    for row in results:
+        before = latest.get((row["scale"], row["component"]))
+        if before is None:
+            continue
+        if before["rows_per_sec"] and row["rows_per_sec"] is not None \
+                and row["rows_per_sec"] < before["rows_per_sec"] * (1 - tolerance):
+            regressions.append((row, before, "rows_per_sec"))
+        if before["peak_mb"] and row["peak_mb"] is not None and row["peak_mb"] >= MIN_PEAK_MB \
+                and row["peak_mb"] > before["peak_mb"] * (1 + tolerance):
+            regressions.append((row, before, "peak_mb"))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time every cleanser, loader and metrics function on synthetic data at 10x/100x/1000x"
+    )
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--missing-rate", type=float, default=0.01)
+    parser.add_argument("--negative-rate", type=float, default=0.005)
+    parser.add_argument("--bad-range-rate", type=float, default=0.005)
+    parser.add_argument("--no-db", action="store_true", help="Only time reading and cleansing")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record peak Python allocations with tracemalloc (slows the timings)")
+    parser.add_argument("--schema", default="bench_scale", help="Scratch schema the loaders and metrics use")
+    parser.add_argument("--results-file", default=RESULTS_FILE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Rejected rows are counted by the cleansers but not written anywhere
+    sink = set_reject_sink(RejectSink(flush_rows=None))
+    # Every metrics call should hit the database
+    cache.CACHE_ENABLED = False
+    trace_memory = args.trace_memory
+    if trace_memory:
+        tracemalloc.start()
+
+    dirty_rates = {"missing": args.missing_rate, "negative": args.negative_rate, "bad_range": args.bad_range_rate}
+    run = {"run_at": datetime.now().isoformat(timespec="seconds"), "git_rev": git_revision(), "seed": args.seed}
+    previous = read_results(args.results_file)
+    results = []
+
+    print(f"{'scale':>6} {'component':<34} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS MB':>9}")
+    for scale in args.scales:
+        results += run_scale(
+            scale, SCALES[scale], args.seed, dirty_rates, trace_memory, not args.no_db, args.schema
+        )
+        sink.drain()
+
+    os.makedirs(os.path.dirname(args.results_file) or ".", exist_ok=True)
+    with open(args.results_file, "a") as f:
+        for row in results:
+            f.write(json.dumps({**run, **row}) + "\n")
+    print(f"Results appended to {args.results_file}")
+
+    regressions = find_regressions(previous, results)
+    for row, before, field in regressions:
+        print(f"REGRESSION {row['scale']} {row['component']}: {field} {before[field]} -> {row[field]} "
+              f"(previous run {before['run_at']}, {before['git_rev']})")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+ENDPOINTS = [
+    "/risk-profile?top_n=10",
+    "/patient-to-staff-ratio",
+    "/cancellation-rates",
+    "/capacity-utilization",
+    "/dashboard?limit=10",
+]
+
+
+async def run_load(base_url, endpoints, concurrency, requests_per_endpoint):
+    # concurrency clients share the requests of every endpoint, interleaved,
+    # like several dashboards refreshing against one service process
+    queue = asyncio.Queue()
+    for _ in range(requests_per_endpoint):
+        for endpoint in endpoints:
+            queue.put_nowait(endpoint)
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+
+    async def client(session):
+        while not queue.empty():
+            endpoint = queue.get_nowait()
+            start = time.perf_counter()
+            async with session.get(base_url + endpoint) as response:
+                await response.read()
+                if response.status != 200:
+                    errors[endpoint] += 1
+            latencies[endpoint].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p50/p99 latency of the metrics service under concurrent load")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint per run")
+    args = parser.parse_args()
+    if aiohttp is None:
+        raise ImportError("aiohttp is required for the service load benchmark (pip install aiohttp)")
+
+    print(f"{'concurrency':>11} {'endpoint':<28} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in args.concurrency:
+        latencies, errors, elapsed = asyncio.run(run_load(args.url, ENDPOINTS, concurrency, args.requests))
+        for endpoint in ENDPOINTS:
+            values = np.array(latencies[endpoint]) * 1000
+            print(
+                f"{concurrency:>11} {endpoint:<28} {np.percentile(values, 50):>9.1f} "
+                f"{np.percentile(values, 99):>9.1f} {errors[endpoint]:>7}"
+            )
+        total = sum(len(values) for values in latencies.values())
+        print(f"{concurrency:>11} {'(all)':<28} {total / elapsed:>9,.0f} req/s")
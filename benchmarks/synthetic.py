@@ -0,0 +1,276 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Weeks are generated backwards from this Monday, so the last one ends on the
+# cleansers' AS_OF_DATE and nothing is rejected as a future date
+LAST_WEEK_START = "2026-02-23"
+
+STAFF_PER_UNIT = 15
+
+UNIT_NAMES = [
+    "ICU", "ER", "MedSurg", "Tele", "PCU", "OB", "Peds", "Onc",
+    "Ortho", "Neuro", "Rehab", "Psych", "NICU", "Cardio", "Burn", "StepDown",
+]
+FIRST_NAMES = ["Avery", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Quinn", "Reese", "Kendall", "Drew"]
+LAST_NAMES = ["Smith", "Johnson", "Brown", "Wilson", "Anderson", "Garcia", "Martinez", "Lee", "Clark", "Young"]
+
+# (value, probability) of the categorical columns
+ROLES = (["RN", "LPN", "CNA"], [0.5, 0.2, 0.3])
+EMPLOYMENT_TYPES = (["FT", "PT", "PerDiem"], [0.55, 0.25, 0.2])
+STATUSES = (["scheduled", "swapped", "open", "Cancelled"], [0.9, 0.04, 0.01, 0.05])
+
+# Contracted weekly hours and base 12h shifts per week of each employment type
+MAX_HOURS = {"FT": 36, "PT": 24, "PerDiem": 16}
+SHIFTS_PER_WEEK = {"FT": 3, "PT": 2, "PerDiem": 1}
+
+# Chance of a staff member picking up one extra shift in a week, and of a
+# shift being worked outside the home unit (same facility)
+EXTRA_SHIFT_RATE = 0.25
+FLOAT_RATE = 0.1
+
+# Default share of dirty rows in each generated feed:
+#   missing     a required field left blank ("Missing required fields")
+#   negative    a negative count or hours value
+#   bad_range   shift_end before shift_start (shifts only)
+# Only reject-rule defects are injected; anything a fatal check catches would
+# fail the whole file. The staff master stays clean, because a rejected staff
+# row would make every shift and timekeeping row referencing it fail its FK.
+DIRTY_RATES = {"missing": 0.01, "negative": 0.005, "bad_range": 0.005}
+
+
+def _unit_names(facilities, units_per_facility):
+    names = [
+        UNIT_NAMES[u % len(UNIT_NAMES)] + (str(u // len(UNIT_NAMES) + 1) if u >= len(UNIT_NAMES) else "")
+        for u in range(units_per_facility)
+    ]
+    if facilities == 1:
+        return np.array(names, dtype=object), np.zeros(len(names), dtype=int)
+    return (
+        np.array([f"F{f + 1:02d}-{name}" for f in range(facilities) for name in names], dtype=object),
+        np.repeat(np.arange(facilities), units_per_facility),
+    )
+
+
+def make_staff(rng, units, staff_per_unit=STAFF_PER_UNIT):
+    n = len(units) * staff_per_unit
+    employment_type = rng.choice(EMPLOYMENT_TYPES[0], n, p=EMPLOYMENT_TYPES[1])
+    return pd.DataFrame({
+        "staff_id": [f"S{1000 + i}" for i in range(n)],
+        "first_name": rng.choice(FIRST_NAMES, n),
+        "last_name": rng.choice(LAST_NAMES, n),
+        "role": rng.choice(ROLES[0], n, p=ROLES[1]),
+        "employment_type": employment_type,
+        "home_unit": np.repeat(units, staff_per_unit),
+        "max_hours_per_week": pd.Series(employment_type).map(MAX_HOURS).to_numpy(),
+        "hire_date": pd.Timestamp("2010-01-01") + pd.to_timedelta(rng.integers(0, 5800, n), unit="D"),
+    })
+
+
+def make_shifts(rng, staff, units, unit_facility, week_starts):
+    # Every staff member works their contracted shifts each week, sometimes
+    # one more, on random days; day shifts 07-19, night shifts 19-07
+    base = staff["employment_type"].map(SHIFTS_PER_WEEK).to_numpy()
+    per_week = np.repeat(base[None, :], len(week_starts), axis=0)
+    per_week = per_week + (rng.random(per_week.shape) < EXTRA_SHIFT_RATE)
+    counts = per_week.ravel()
+    staff_index = np.repeat(np.tile(np.arange(len(staff)), len(week_starts)), counts)
+    week_index = np.repeat(np.repeat(np.arange(len(week_starts)), len(staff)), counts)
+    n = len(staff_index)
+
+    shift_date = week_starts[week_index] + pd.to_timedelta(rng.integers(0, 7, n), unit="D")
+    night = rng.random(n) < 0.4
+    shift_start = shift_date + pd.to_timedelta(np.where(night, 19, 7), unit="h")
+
+    home_unit = staff["home_unit"].to_numpy()[staff_index]
+    unit_position = {unit: i for i, unit in enumerate(units)}
+    home_position = pd.Series(home_unit).map(unit_position).to_numpy()
+    floated = rng.random(n) < FLOAT_RATE
+    # A floated shift goes to another unit of the home unit's facility
+    units_per_facility = len(units) // (unit_facility.max() + 1)
+    offset = rng.integers(1, max(units_per_facility, 2), n) if units_per_facility > 1 else np.zeros(n, dtype=int)
+    facility_start = unit_facility[home_position] * units_per_facility
+    float_position = facility_start + (home_position - facility_start + offset) % units_per_facility
+    unit = np.where(floated, units[float_position], home_unit)
+
+    order = np.lexsort((staff_index, shift_start))
+    return pd.DataFrame({
+        "shift_id": [f"SH{i + 1:09d}" for i in range(n)],
+        "staff_id": staff["staff_id"].to_numpy()[staff_index][order],
+        "unit": unit[order],
+        "shift_date": shift_date[order],
+        "shift_start": shift_start[order],
+        "shift_end": (shift_start + pd.Timedelta(hours=12))[order],
+        "shift_type": np.where(night, "night", "day")[order],
+        "role": staff["role"].to_numpy()[staff_index][order],
+        "status": rng.choice(STATUSES[0], n, p=STATUSES[1])[order],
+    })
+
+
+def make_census(rng, units, week_starts):
+    dates = pd.DatetimeIndex([start + pd.Timedelta(days=d) for start in week_starts for d in range(7)])
+    baseline = rng.integers(10, 60, len(units))
+    total = np.maximum(
+        np.repeat(baseline[None, :], len(dates), axis=0) + rng.integers(-5, 6, (len(dates), len(units))), 1
+    ).ravel()
+    admissions = np.minimum(rng.poisson(total * 0.12), total)
+    discharges = np.minimum(rng.poisson(total * 0.12), total)
+    return pd.DataFrame({
+        "census_id": [f"C{i + 1:08d}" for i in range(len(total))],
+        "unit": np.tile(units, len(dates)),
+        "date": np.repeat(dates, len(units)),
+        "total_patients": total,
+        "admissions": admissions,
+        "discharges": discharges,
+    })
+
+
+def make_timekeeping(rng, staff, shifts):
+    # Hours follow the worked shifts; overtime is anything over the contract
+    worked = shifts[shifts["status"].isin(["scheduled", "swapped"])]
+    week_start = worked["shift_date"] - pd.to_timedelta(worked["shift_date"].dt.weekday, unit="D")
+    hours = worked.assign(week_start=week_start).groupby(["staff_id", "week_start"]).size().mul(12)
+    df = hours.rename("hours_worked").reset_index()
+    df = df.merge(staff[["staff_id", "max_hours_per_week"]], on="staff_id")
+    df = df.sort_values(["week_start", "staff_id"], ignore_index=True)
+    n = len(df)
+    return pd.DataFrame({
+        "record_id": [f"TK{i + 1:09d}" for i in range(n)],
+        "staff_id": df["staff_id"],
+        "week_start": df["week_start"],
+        "hours_worked": df["hours_worked"],
+        "overtime_hours": (df["hours_worked"] - df["max_hours_per_week"]).clip(lower=0),
+        "pto_hours": np.where(rng.random(n) < 0.1, 8, 0),
+        "sick_hours": np.where(rng.random(n) < 0.05, rng.choice([4, 8, 12], n), 0),
+    })
+
+
+# Columns each kind of defect is injected into, per feed
+DIRTY_COLUMNS = {
+    "shifts": {"missing": ["shift_start", "shift_end", "shift_date"], "negative": [], "bad_range": True},
+    "census": {"missing": ["total_patients", "admissions", "discharges"], "negative": ["admissions", "discharges"]},
+    "timekeeping": {"missing": ["hours_worked", "pto_hours", "sick_hours"], "negative": ["pto_hours", "sick_hours"]},
+}
+
+
+def add_dirty_rows(rng, df, table, rates):
+    # Defects go into disjoint random rows, so the rejected count is exact
+    columns = DIRTY_COLUMNS.get(table)
+    if columns is None or len(df) == 0:
+        return df
+    df = df.astype({col: object for col in df.columns if col not in ("shift_id", "census_id", "record_id")})
+    rows = rng.permutation(len(df))
+    taken = 0
+    for kind, rate in rates.items():
+        targets = columns.get(kind)
+        count = int(round(len(df) * rate))
+        if not targets or count == 0:
+            continue
+        picked = rows[taken:taken + count]
+        taken += count
+        if kind == "missing":
+            for col, positions in zip(targets, np.array_split(picked, len(targets))):
+                df.iloc[positions, df.columns.get_loc(col)] = np.nan
+        elif kind == "negative":
+            for col, positions in zip(targets, np.array_split(picked, len(targets))):
+                col_index = df.columns.get_loc(col)
+                df.iloc[positions, col_index] = -np.abs(df.iloc[positions, col_index].to_numpy(dtype=int)) - 1
+        elif kind == "bad_range":
+            start, end = df.columns.get_loc("shift_start"), df.columns.get_loc("shift_end")
+            swapped = df.iloc[picked, [end, start]].to_numpy()
+            df.iloc[picked, [start, end]] = swapped
+    return df
+
+
+def generate(facilities=1, units_per_facility=3, weeks=1, staff_per_unit=STAFF_PER_UNIT,
+             dirty_rates=None, seed=0, last_week_start=LAST_WEEK_START):
+    # Raw staff/shifts/census/timekeeping frames with the columns of the files
+    # in data/, for facilities x units_per_facility units over weeks weeks.
+    # The same arguments always give the same rows.
+    rng = np.random.default_rng(seed)
+    dirty_rates = DIRTY_RATES if dirty_rates is None else dirty_rates
+    units, unit_facility = _unit_names(facilities, units_per_facility)
+    week_starts = pd.DatetimeIndex(
+        pd.Timestamp(last_week_start) - pd.to_timedelta(7 * np.arange(weeks)[::-1], unit="D")
+    )
+
+    staff = make_staff(rng, units, staff_per_unit)
+    shifts = make_shifts(rng, staff, units, unit_facility, week_starts)
+    census = make_census(rng, units, week_starts)
+    timekeeping = make_timekeeping(rng, staff, shifts)
+    return {
+        "staff": staff,
+        "shifts": add_dirty_rows(rng, shifts, "shifts", dirty_rates),
+        "census": add_dirty_rows(rng, census, "census", dirty_rates),
+        "timekeeping": add_dirty_rows(rng, timekeeping, "timekeeping", dirty_rates),
+    }
+
+
+# Timestamp columns as they appear in the raw files
+DATE_FORMATS = {
+    "hire_date": "%Y-%m-%d",
+    "shift_date": "%Y-%m-%d",
+    "shift_start": "%Y-%m-%d %H:%M:%S",
+    "shift_end": "%Y-%m-%d %H:%M:%S",
+    "date": "%Y-%m-%d",
+    "week_start": "%Y-%m-%d",
+}
+
+# File layout of data/: (subdirectory, file name, per-week date column)
+FILE_LAYOUT = {
+    "staff": ("staff_master", "staff_master.csv", None),
+    "shifts": ("shift_schedule", "shift_schedule_week_{week:02d}.csv", "shift_date"),
+    "census": ("census_data", "census_daily_week_{week:02d}.csv", "date"),
+    "timekeeping": ("timekeeping", "timekeeping_week_{week:02d}.csv", "week_start"),
+}
+
+
+def write_dataset(frames, out_dir):
+    # One file per week per feed, in the same layout as data/, so
+    # build_file_index(out_dir) picks them up like the real drops.
+    # Returns {table: [paths]}.
+    paths = {}
+    for table, df in frames.items():
+        subdir, pattern, date_col = FILE_LAYOUT[table]
+        os.makedirs(os.path.join(out_dir, subdir), exist_ok=True)
+        paths[table] = []
+        df = df.assign(**{
+            col: pd.to_datetime(df[col]).dt.strftime(fmt) for col, fmt in DATE_FORMATS.items() if col in df.columns
+        })
+        if date_col is None:
+            groups = [(None, df)]
+        else:
+            # Dirty rows with a blank date go with the week of their neighbours
+            dates = pd.to_datetime(df[date_col]).ffill().bfill()
+            week = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).rank(method="dense").astype(int)
+            groups = df.groupby(week.to_numpy(), sort=True)
+        for week, group in groups:
+            path = os.path.join(out_dir, subdir, pattern.format(week=week or 0))
+            group.to_csv(path, index=False)
+            paths[table].append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic staffing dataset in the data/ layout")
+    parser.add_argument("out_dir")
+    parser.add_argument("--facilities", type=int, default=1)
+    parser.add_argument("--units", type=int, default=3, help="Units per facility")
+    parser.add_argument("--weeks", type=int, default=1)
+    parser.add_argument("--staff-per-unit", type=int, default=STAFF_PER_UNIT)
+    parser.add_argument("--missing-rate", type=float, default=DIRTY_RATES["missing"])
+    parser.add_argument("--negative-rate", type=float, default=DIRTY_RATES["negative"])
+    parser.add_argument("--bad-range-rate", type=float, default=DIRTY_RATES["bad_range"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = generate(
+        args.facilities, args.units, args.weeks, args.staff_per_unit,
+        {"missing": args.missing_rate, "negative": args.negative_rate, "bad_range": args.bad_range_rate},
+        args.seed,
+    )
+    for table, paths in write_dataset(frames, args.out_dir).items():
+        print(f"{table:<12} {len(frames[table]):>10,} rows in {len(paths)} file(s)")
@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Cleansers return the compact layout below instead of plain object/str and
+# float64 columns. The loaders and landing zone write it unchanged.
+COMPACT_FRAMES = True
+
+# column: vocabulary. Every column of a vocabulary is a categorical over the
+# same categories, in every frame and table, so merges and comparisons across
+# them run on the integer codes. For staff_id the codes are the integer
+# encoding of the IDs and the categories their lookup table. Unique row keys
+# (shift_id, record_id, census_id) stay strings: with one category per row,
+# a lookup table would only add the codes on top.
+VOCABULARY_COLUMNS = {
+    "staff_id": "staff_id",
+    "unit": "unit",
+    "home_unit": "unit",
+    "role": "role",
+    "status": "status",
+    "shift_type": "shift_type",
+    "employment_type": "employment_type",
+}
+
+# Smallest integer type numeric columns are downcast to; narrower ones
+# overflow too easily in arithmetic on the frame
+MIN_INT_DTYPE = np.dtype("int16")
+
+
+class Vocabulary:
+    # Append-only categories: a value keeps its code for the life of the
+    # process, so frames encoded earlier only need their categories extended
+
+    def __init__(self):
+        self.categories = pd.Index([], dtype=object)
+        self.lock = threading.Lock()
+
+    def extend(self, values):
+        values = pd.Index(pd.unique(values.dropna()))
+        with self.lock:
+            new = values.difference(self.categories, sort=False)
+            if len(new):
+                self.categories = self.categories.append(new.astype(object))
+            return pd.CategoricalDtype(self.categories)
+
+
+_vocabularies = {}
+_vocabularies_lock = threading.Lock()
+
+
+def get_vocabulary(name):
+    with _vocabularies_lock:
+        if name not in _vocabularies:
+            _vocabularies[name] = Vocabulary()
+        return _vocabularies[name]
+
+
+def lookup_table(df, column):
+    # (code, value) rows of an encoded column, e.g. staff_id
+    categories = df[column].cat.categories
+    return pd.DataFrame({"code": np.arange(len(categories)), column: categories})
+
+
+def _downcast(values):
+    # Integral float/int columns as the smallest integer type (float32 if
+    # they have NaNs, exact up to 2**24); anything with a fraction is left
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values
+    present = values.dropna()
+    if len(present) and not np.array_equal(present, np.round(present)):
+        return values
+    if values.isna().any():
+        return values if present.abs().max() > 2**24 else values.astype("float32")
+    small = pd.to_numeric(values, downcast="integer")
+    return small.astype(np.promote_types(small.dtype, MIN_INT_DTYPE))
+
+
+def compact(df):
+    # The frame with its vocabulary columns as shared categoricals and its
+    # numeric columns downcast
+    df = df.copy()
+    for column in df.columns:
+        name = VOCABULARY_COLUMNS.get(column)
+        if name is not None:
+            df[column] = df[column].astype(get_vocabulary(name).extend(df[column]))
+        elif not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = _downcast(df[column])
+    return df
+
+
+def unify(frames):
+    # frames with the categories of each vocabulary column made identical,
+    # e.g. frames cleansed in different worker processes; pd.concat and
+    # merge fall back to plain values when they differ
+    frames = list(frames)
+    for column, name in VOCABULARY_COLUMNS.items():
+        encoded = [df for df in frames if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)]
+        if not encoded:
+            continue
+        vocabulary = get_vocabulary(name)
+        for df in encoded:
+            dtype = vocabulary.extend(pd.Series(df[column].cat.categories))
+        frames = [
+            df.assign(**{column: df[column].cat.set_categories(dtype.categories)})
+            if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)
+            and not df[column].cat.categories.equals(dtype.categories) else df
+            for df in frames
+        ]
+    return frames
+
+
+def concat_frames(frames, **kwargs):
+    return pd.concat(unify(frames), **kwargs)
@@ -1,326 +1,331 @@
+import argparse
+import atexit
+import fnmatch
 import pandas as pd
 import os
-from data_upload import *
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+if not __package__:
+    # Run as etl/data_cleanser.py: make the etl package importable
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-def cleanse_census_data(df):
-    # Null Check
-    if len(df) == 0:
-        raise ValueError("Input dataframe is empty.")
-    
-    # Column Check
-    required_columns = ['census_id', 'unit', 'date', 'total_patients', 'admissions', 'discharges']
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
-
-    # Duplicates Check
-    if df["census_id"].duplicated().any():
-        raise ValueError("Duplicate census_id detected")
-    
-    # Data Type Converstions
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["total_patients"] = pd.to_numeric(df["total_patients"], errors="coerce")
-    df["admissions"] = pd.to_numeric(df["admissions"], errors="coerce")
-    df["discharges"] = pd.to_numeric(df["discharges"], errors="coerce")
-    df["unit"] = df["unit"].str.strip().str.upper()
-
-    # NAN checks
-    invalid_rows = df[df[["date", "total_patients", "admissions", "discharges"]].isna().any(axis=1)]
-    invalid_ratio = len(invalid_rows) / len(df)
-    if invalid_ratio > 0.2:
-        raise ValueError("More than 20% rows invalid. Failing job.")
-    if len(invalid_rows) > 0:
-        print(f"Dropping {len(invalid_rows)} rows due to NaN values.")
-    df = df.drop(invalid_rows.index)
-    df = df.reset_index(drop=True)
-    os.makedirs("logs", exist_ok=True)
-    invalid_rows.assign(error_reason="Missing required fields").to_csv(
-    "logs/census_rejected_rows.csv",
-    mode="a",
-    header=not os.path.exists("logs/census_rejected_rows.csv"),
-    index=False
-    )   
-
-    # Negative Values Check
-    invalid_neg = df[(df["total_patients"] < 0) | (df["admissions"] < 0) | (df["discharges"] < 0)]
-    if not invalid_neg.empty:
-        invalid_neg.assign(error_reason="Negative values").to_csv(
-        "logs/census_rejected_rows_negative.csv",
-        mode="a",
-        header=not os.path.exists("logs/census_rejected_rows_negative.csv"),
-        index=False
-        )
-        df = df.drop(invalid_neg.index)
-        df = df.reset_index(drop=True)
+from etl.data_upload import *
+from etl.landing_zone import read_landing, write_landing
+from etl.instrumentation import Recorder, get_recorder, set_recorder, stage
+from etl.pipeline import LOADERS, cleanse_task, concat_files, run_pipeline
+from etl.streaming import CHUNK_SIZE, stream_file
+from etl.reject_sink import RejectSink, get_reject_sink, set_reject_sink
+from etl.validation import apply_rules
 
 
-    # Admission-Discharge Consistency Check
-    invalid_mask = (
-        (df["discharges"] > df["total_patients"]) |
-        (df["admissions"] > df["total_patients"])
-    )
-    invalid_discharges_and_admissions = df[invalid_mask]
-    if not invalid_discharges_and_admissions.empty:
-        raise ValueError(f"Found invalid discharge or admission values: {invalid_discharges_and_admissions}")
-
-    # Date Range Check:
-    # today = pd.to_datetime.today().normalize()
-    today = pd.to_datetime("2026-03-01")
-    if (df["date"] > today).any():
-        raise ValueError("Future dates detected in census data.")
-    dup_check = df.duplicated(subset=["unit", "date"]).any()
-    if dup_check:
-        raise ValueError("Found duplicate unit-date combinations")
-    
-    return df
+# Date Range Check cutoff
+# AS_OF_DATE = pd.to_datetime.today().normalize()
+AS_OF_DATE = pd.to_datetime("2026-03-01")
 
 
+def to_datetime(col):
+    return pd.to_datetime(col, errors="coerce")
 
-def cleanse_shift_schedule(df):
-    # Null Check
-    if len(df) == 0:
-        raise ValueError("Input dataframe is empty.")
-    
-    # Column Check
-    required_columns = [
-        'shift_id', 'staff_id', 'unit',
-        'shift_date', 'shift_start', 'shift_end',
-        'shift_type', 'role', 'status'
-    ]
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
 
-    # Duplicate Primary Key Check
-    if df["shift_id"].duplicated().any():
-        raise ValueError("Duplicate shift_id detected")
-    
-    # Data Type Conversions
-    df["shift_date"] = pd.to_datetime(df["shift_date"], errors="coerce")
-    df["shift_start"] = pd.to_datetime(df["shift_start"], errors="coerce")
-    df["shift_end"] = pd.to_datetime(df["shift_end"], errors="coerce")
-
-    df["unit"] = df["unit"].str.strip().str.upper()
-    df["shift_type"] = df["shift_type"].str.strip().str.lower()
-    df["role"] = df["role"].str.strip().str.upper()
-    df["status"] = df["status"].str.strip().str.lower()
-
-
-    # NaN checks (critical timestamp + FK fields)
-    invalid_rows = df[df[
-        ["shift_date", "shift_start", "shift_end", "shift_id", "staff_id"]
-    ].isna().any(axis=1)]
-    invalid_ratio = len(invalid_rows) / len(df)
-    if invalid_ratio > 0.2:
-        raise ValueError("More than 20% rows invalid. Failing job.")
-    if len(invalid_rows) > 0:
-        print(f"Dropping {len(invalid_rows)} rows due to NaN values.")
-    df = df.drop(invalid_rows.index)
-    df = df.reset_index(drop=True)
-    os.makedirs("logs", exist_ok=True)
-    invalid_rows.assign(error_reason="Missing required fields").to_csv(
-        "logs/shift_rejected_rows.csv",
-        mode="a",
-        header=not os.path.exists("logs/shift_rejected_rows.csv"),
-        index=False
-    )
+def to_numeric(col):
+    return pd.to_numeric(col, errors="coerce")
 
-    # Logical Check
-    invalid_time = df[df["shift_end"] <= df["shift_start"]]
-    if not invalid_time.empty:
-        invalid_time.assign(error_reason="Invalid shift time range").to_csv(
-            "logs/shift_rejected_rows_time.csv",
-            mode="a",
-            header=not os.path.exists("logs/shift_rejected_rows_time.csv"),
-            index=False
-        )
-        df = df.drop(invalid_time.index)
-        df = df.reset_index(drop=True)
 
-    # Date Range Check (no future shift dates)
-    # today = pd.to_datetime.today().normalize()
-    today = pd.to_datetime("2026-03-01")
-    if (df["shift_date"] > today).any():
-        raise ValueError("Future shift dates detected.")
+def strip_upper(col):
+    return col.str.strip().str.upper()
 
-    return df
 
+def strip_lower(col):
+    return col.str.strip().str.lower()
 
 
-def cleanse_staff_master(df):
-    # Null Check
-    if len(df) == 0:
-        raise ValueError("Input dataframe is empty.")
-    
-    # Column Check
-    required_columns = [
-        'staff_id', 'first_name', 'last_name',
-        'role', 'employment_type',
-        'home_unit', 'max_hours_per_week', 'hire_date'
-    ]
-
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
-
-    # Duplicates Check
-    if df["staff_id"].duplicated().any():
-        raise ValueError("Duplicate staff_id detected")
+def strip_capitalize(col):
+    return col.str.strip().str.capitalize()
 
-    # Type Conversions
-    df["max_hours_per_week"] = pd.to_numeric(df["max_hours_per_week"], errors="coerce")
-    df["hire_date"] = pd.to_datetime(df["hire_date"], errors="coerce")
 
-    df["first_name"] = df["first_name"].str.strip().str.capitalize()
-    df["last_name"] = df["last_name"].str.strip().str.capitalize()
-    df["role"] = df["role"].str.strip().str.upper()
-    df["employment_type"] = df["employment_type"].str.strip().str.upper()
-    df["home_unit"] = df["home_unit"].str.strip().str.upper()
+def missing(columns):
+    return lambda df: df[columns].isna().any(axis=1)
 
-    # NaN Checks 
-    invalid_rows = df[df[
-        ["staff_id", "first_name", "last_name",
-         "role", "employment_type",
-         "max_hours_per_week", "hire_date"]
-    ].isna().any(axis=1)]
 
-    invalid_ratio = len(invalid_rows) / len(df)
+def negative(columns):
+    return lambda df: (df[columns] < 0).any(axis=1)
 
-    if invalid_ratio > 0.2:
-        raise ValueError("More than 20% rows invalid. Failing job.")
 
-    if len(invalid_rows) > 0:
-        print(f"Dropping {len(invalid_rows)} rows due to NaN values.")
+CENSUS_RULES = {
+    "name": "census",
+    "required_columns": ['census_id', 'unit', 'date', 'total_patients', 'admissions', 'discharges'],
+    "key": "census_id",
+    "conversions": {
+        "date": to_datetime,
+        "total_patients": to_numeric,
+        "admissions": to_numeric,
+        "discharges": to_numeric,
+        "unit": strip_upper,
+    },
+    "reject_rules": [
+        {
+            "reason": "Missing required fields",
+            "mask": missing(["date", "total_patients", "admissions", "discharges"]),
+            "ratio_check": True,
+        },
+        {
+            "reason": "Negative values",
+            "mask": negative(["total_patients", "admissions", "discharges"]),
+        },
+    ],
+    "fatal_checks": [
+        (
+            "Found invalid discharge or admission values: {rows}",
+            lambda df: (df["discharges"] > df["total_patients"]) | (df["admissions"] > df["total_patients"])
+        ),
+        ("Future dates detected in census data.", lambda df: df["date"] > AS_OF_DATE),
+        ("Found duplicate unit-date combinations", lambda df: df.duplicated(subset=["unit", "date"])),
+    ],
+}
 
-    df = df.drop(invalid_rows.index)
-    df = df.reset_index(drop=True)
+SHIFT_RULES = {
+    "name": "shifts",
+    "required_columns": [
+        'shift_id', 'staff_id', 'unit',
+        'shift_date', 'shift_start', 'shift_end',
+        'shift_type', 'role', 'status'
+    ],
+    "key": "shift_id",
+    "conversions": {
+        "shift_date": to_datetime,
+        "shift_start": to_datetime,
+        "shift_end": to_datetime,
+        "unit": strip_upper,
+        "shift_type": strip_lower,
+        "role": strip_upper,
+        "status": strip_lower,
+    },
+    "reject_rules": [
+        {
+            # Critical timestamp + FK fields
+            "reason": "Missing required fields",
+            "mask": missing(["shift_date", "shift_start", "shift_end", "shift_id", "staff_id"]),
+            "ratio_check": True,
+        },
+        {
+            "reason": "Invalid shift time range",
+            "mask": lambda df: df["shift_end"] <= df["shift_start"],
+        },
+    ],
+    "fatal_checks": [
+        ("Future shift dates detected.", lambda df: df["shift_date"] > AS_OF_DATE),
+    ],
+}
+
+STAFF_RULES = {
+    "name": "staff",
+    "required_columns": [
+        'staff_id', 'first_name', 'last_name',
+        'role', 'employment_type',
+        'home_unit', 'max_hours_per_week', 'hire_date'
+    ],
+    "key": "staff_id",
+    "conversions": {
+        "max_hours_per_week": to_numeric,
+        "hire_date": to_datetime,
+        "first_name": strip_capitalize,
+        "last_name": strip_capitalize,
+        "role": strip_upper,
+        "employment_type": strip_upper,
+        "home_unit": strip_upper,
+    },
+    "reject_rules": [
+        {
+            "reason": "Missing required fields",
+            "mask": missing([
+                "staff_id", "first_name", "last_name",
+                "role", "employment_type",
+                "max_hours_per_week", "hire_date"
+            ]),
+            "ratio_check": True,
+        },
+        {
+            "reason": "Negative max_hours_per_week",
+            "mask": lambda df: df["max_hours_per_week"] < 0,
+        },
+    ],
+    "fatal_checks": [
+        ("Future hire_date detected.", lambda df: df["hire_date"] > AS_OF_DATE),
+    ],
+}
+
+TIMEKEEPING_RULES = {
+    "name": "timekeeping",
+    "required_columns": [
+        'record_id', 'staff_id', 'week_start',
+        'hours_worked', 'overtime_hours',
+        'pto_hours', 'sick_hours'
+    ],
+    "key": "record_id",
+    "conversions": {
+        "week_start": to_datetime,
+        "hours_worked": to_numeric,
+        "overtime_hours": to_numeric,
+        "pto_hours": to_numeric,
+        "sick_hours": to_numeric,
+    },
+    "reject_rules": [
+        {
+            "reason": "Missing required fields",
+            "mask": missing([
+                "record_id", "staff_id", "week_start",
+                "hours_worked", "overtime_hours",
+                "pto_hours", "sick_hours"
+            ]),
+            "ratio_check": True,
+        },
+        {
+            "reason": "Negative hour values",
+            "mask": negative(["hours_worked", "overtime_hours", "pto_hours", "sick_hours"]),
+        },
+    ],
+    "fatal_checks": [
+        ("Overtime hours exceed total hours worked.", lambda df: df["overtime_hours"] > df["hours_worked"]),
+        ("Future week_start detected.", lambda df: df["week_start"] > AS_OF_DATE),
+    ],
+}
+
+
+def cleanse_census_data(df, max_invalid_ratio=0.2):
+    return apply_rules(df, CENSUS_RULES, max_invalid_ratio)
+
+
+def cleanse_shift_schedule(df, max_invalid_ratio=0.2):
+    return apply_rules(df, SHIFT_RULES, max_invalid_ratio)
+
+
+def cleanse_staff_master(df, max_invalid_ratio=0.2):
+    return apply_rules(df, STAFF_RULES, max_invalid_ratio)
+
+
+def cleanse_time_keeping(df, max_invalid_ratio=0.2):
+    return apply_rules(df, TIMEKEEPING_RULES, max_invalid_ratio)
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# {relative path: full path} of every file under DATA_DIR, built on first use
+FILE_INDEX = None
+
+
+def build_file_index(data_dir=DATA_DIR, refresh=False):
+    # One walk of the data tree, reused by every lookup until refreshed
+    global FILE_INDEX
+    if FILE_INDEX is None or refresh:
+        FILE_INDEX = {}
+        for root, dir, files in os.walk(data_dir):
+            for filename in sorted(files):
+                filepath = os.path.join(root, filename)
+                FILE_INDEX[os.path.relpath(filepath, data_dir)] = filepath
+    return FILE_INDEX
+
+
+def find_file(filename):
+    for relpath, filepath in build_file_index().items():
+        if os.path.basename(relpath) == filename:
+            return filepath
+
+    raise FileNotFoundError(f"File '{filename}' not found in {DATA_DIR} or its subdirectories")
+
+
+def find_files(pattern):
+    # A directory gives every supported file under it; anything else is a
+    # glob matched against both the file name and its path under DATA_DIR
+    if os.path.isdir(pattern):
+        return sorted(
+            os.path.join(root, filename)
+            for root, dir, files in os.walk(pattern)
+            for filename in files
+            if filename.endswith(SUPPORTED_EXTENSIONS)
+        )
 
-    os.makedirs("logs", exist_ok=True)
-    invalid_rows.assign(error_reason="Missing required fields").to_csv(
-        "logs/staff_rejected_rows.csv",
-        mode="a",
-        header=not os.path.exists("logs/staff_rejected_rows.csv"),
-        index=False
+    return sorted(
+        filepath for relpath, filepath in build_file_index().items()
+        if fnmatch.fnmatch(relpath, pattern) or fnmatch.fnmatch(os.path.basename(relpath), pattern)
     )
 
-    # Negative Values Check
-    invalid_hours = df[df["max_hours_per_week"] < 0]
 
-    if not invalid_hours.empty:
-        invalid_hours.assign(error_reason="Negative max_hours_per_week").to_csv(
-            "logs/staff_rejected_rows_hours.csv",
-            mode="a",
-            header=not os.path.exists("logs/staff_rejected_rows_hours.csv"),
-            index=False
-        )
-        df = df.drop(invalid_hours.index)
-        df = df.reset_index(drop=True)
+def read_file(filepath):
+    with stage("read", file=os.path.basename(filepath)) as s:
+        if filepath.endswith('.csv'):
+            df = pd.read_csv(filepath)
 
-    # Date Range Check
-    # today = pd.to_datetime.today().normalize()
-    today = pd.to_datetime("2026-03-01")
-    if (df["hire_date"] > today).any():
-        raise ValueError("Future hire_date detected.")
+        elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
+            df = pd.read_excel(filepath)
 
+        else:
+            raise ValueError(f"Unsupported file format for {os.path.basename(filepath)}")
+        s.rows_out = len(df)
     return df
 
 
+def choose_file(filename):
+    return read_file(find_file(filename))
 
-def cleanse_time_keeping(df):
-    # Null Check
-    if len(df) == 0:
-        raise ValueError("Input dataframe is empty.")
-    
-    # Column Check
-    required_columns = [
-        'record_id', 'staff_id', 'week_start',
-        'hours_worked', 'overtime_hours',
-        'pto_hours', 'sick_hours'
-    ]
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing required columns: {missing_cols}")
-
-    # Duplicates Check
-    if df["record_id"].duplicated().any():
-        raise ValueError("Duplicate record_id detected")
-
-    # Type Conversions
-    df["week_start"] = pd.to_datetime(df["week_start"], errors="coerce")
-    df["hours_worked"] = pd.to_numeric(df["hours_worked"], errors="coerce")
-    df["overtime_hours"] = pd.to_numeric(df["overtime_hours"], errors="coerce")
-    df["pto_hours"] = pd.to_numeric(df["pto_hours"], errors="coerce")
-    df["sick_hours"] = pd.to_numeric(df["sick_hours"], errors="coerce")
-
-    # NaN checks
-    invalid_rows = df[df[
-        ["record_id", "staff_id", "week_start",
-         "hours_worked", "overtime_hours",
-         "pto_hours", "sick_hours"]
-    ].isna().any(axis=1)]
-    invalid_ratio = len(invalid_rows) / len(df)
-    if invalid_ratio > 0.2:
-        raise ValueError("More than 20% rows invalid. Failing job.")
-    if len(invalid_rows) > 0:
-        print(f"Dropping {len(invalid_rows)} rows due to NaN values.")
-    df = df.drop(invalid_rows.index)
-    df = df.reset_index(drop=True)
-    os.makedirs("logs", exist_ok=True)
-    invalid_rows.assign(error_reason="Missing required fields").to_csv(
-        "logs/timekeeping_rejected_rows.csv",
-        mode="a",
-        header=not os.path.exists("logs/timekeeping_rejected_rows.csv"),
-        index=False
-    )
 
-    # Negative values check
-    invalid_neg = df[
-        (df["hours_worked"] < 0) |
-        (df["overtime_hours"] < 0) |
-        (df["pto_hours"] < 0) |
-        (df["sick_hours"] < 0)
-    ]
-    if not invalid_neg.empty:
-        invalid_neg.assign(error_reason="Negative hour values").to_csv(
-            "logs/timekeeping_rejected_rows_negative.csv",
-            mode="a",
-            header=not os.path.exists("logs/timekeeping_rejected_rows_negative.csv"),
-            index=False)
-        df = df.drop(invalid_neg.index)
-        df = df.reset_index(drop=True)
-
-    # Overtime Logic Check
-    invalid_overtime = df[df["overtime_hours"] > df["hours_worked"]]
-    if not invalid_overtime.empty:
-        raise ValueError("Overtime hours exceed total hours worked.")
-
-    # Date Range Check
-    # today = pd.to_datetime.today().normalize()
-    today = pd.to_datetime("2026-03-01")
-    if (df["week_start"] > today).any():
-        raise ValueError("Future week_start detected.")
+def ingest_file(filepath, table, cleanse_fn):
+    # Incremental mode: skip files whose content hash is already recorded
+    # for this table, otherwise cleanse and merge them with an upsert
+    filename = os.path.basename(filepath)
+    source_hash = file_hash(filepath)
+    if is_file_ingested(table, source_hash):
+        print(f"Skipping {filename}: already ingested into {table}.")
+        return None
 
+    get_reject_sink().source_file = filepath
+    df = cleanse_fn(read_file(filepath))
+    load_incremental(df, table, filepath, source_hash=source_hash)
     return df
 
 
-def choose_file(filename):
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-    
-    for root, dir, files in os.walk(data_dir):
-        if filename in files:
-            filepath = os.path.join(root, filename)
-            
-            if filepath.endswith('.csv'):
-                return pd.read_csv(filepath)
-            
-            elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
-                return pd.read_excel(filepath)
-            
-            else:
-                raise ValueError(f"Unsupported file format for {filename}")
-    
-    raise FileNotFoundError(f"File '{filename}' not found in {data_dir} or its subdirectories")
+def ingest_files(pattern, table, cleanse_fn, max_workers=4):
+    # Cleanse every file matching pattern in parallel worker processes and
+    # merge the results. A file that fails is reported and left out, so one
+    # bad week doesn't abort the batch; keys repeated across files fail the
+    # whole batch. Returns (merged frame, {path: error}).
+    filepaths = find_files(pattern)
+    if not filepaths:
+        raise FileNotFoundError(f"No files matching '{pattern}' in {DATA_DIR}")
+
+    frames = {}
+    failures = {}
+    sink = get_reject_sink()
+    recorder = get_recorder()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                cleanse_task, read_file, filepath, cleanse_fn, sink.run_id,
+                recorder is not None, recorder is not None and recorder.trace_memory
+            ): filepath
+            for filepath in filepaths
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            filepath = futures[future]
+            filename = os.path.basename(filepath)
+            try:
+                frames[filepath], elapsed, rejects, records = future.result()
+                sink.extend(rejects)
+                if recorder is not None:
+                    recorder.extend(records)
+                print(f"[{done}/{len(filepaths)}] {filename}: {len(frames[filepath])} rows in {elapsed:.2f}s")
+            except Exception as e:
+                failures[filepath] = str(e)
+                print(f"[{done}/{len(filepaths)}] {filename}: FAILED - {e}")
+
+    if not frames:
+        raise ValueError(f"Every file matching '{pattern}' failed to cleanse.")
+
+    # Keep file order stable regardless of which worker finished first
+    kept = [filepath for filepath in filepaths if filepath in frames]
+    df = concat_files([frames[filepath] for filepath in kept], table, [os.path.basename(path) for path in kept])
+    return df, failures
 
 
 
@@ -359,26 +364,141 @@ def validate_dataframe(df, pk_col=None, required_cols=None):
 
 
 if __name__ == "__main__":
-    df1 = choose_file('census_daily_week_01.csv')
-    df1 = cleanse_census_data(df1)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Upsert new files and skip ones already ingested instead of a full load"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Cleanse and load each file in chunks to keep memory bounded"
+    )
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--parallel", action="store_true",
+        help="Cleanse all sources concurrently and load them in dependency order"
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--landing", action="store_true",
+        help="Also write the cleansed frames to the Parquet landing zone"
+    )
+    parser.add_argument(
+        "--from-landing", action="store_true",
+        help="Load the tables from the Parquet landing zone instead of the raw files"
+    )
+    parser.add_argument(
+        "--rejects-to-table", action="store_true",
+        help="Write rejected rows to the rejected_rows table instead of logs/rejects/"
+    )
+    parser.add_argument(
+        "--instrument", action="store_true",
+        help="Record time, rows, DB round trips and memory per stage to logs/runs/<run id>.json"
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="With --instrument, also record each stage's peak Python allocations (slower)"
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        help="With --instrument, also write the stage totals in Prometheus text format to this file"
+    )
+    args = parser.parse_args()
+
+    # Rejects are buffered for the whole run and written once at exit
+    sink = set_reject_sink(RejectSink(to_table=args.rejects_to_table))
+    atexit.register(sink.close)
+    print(f"Run {sink.run_id}")
+
+    if args.instrument:
+        recorder = set_recorder(Recorder(run_id=sink.run_id, trace_memory=args.trace_memory))
+
+        def write_run():
+            recorder.print_summary()
+            print(f"Stage records written to {recorder.write()}")
+            if args.prometheus_file:
+                recorder.write_prometheus(args.prometheus_file)
+
+        atexit.register(write_run)
+
+    # Staff first: shifts and timekeeping reference staff_id. Each source is
+    # a glob, so every weekly file in data/ is picked up.
+    sources = [
+        ('staff_master*.csv', 'staff', cleanse_staff_master),
+        ('shift_schedule_week_*.csv', 'shifts', cleanse_shift_schedule),
+        ('census_daily_week_*.csv', 'census', cleanse_census_data),
+        ('timekeeping_week_*.csv', 'timekeeping', cleanse_time_keeping),
+    ]
+
+    if args.from_landing:
+        # Already validated and typed: no CSV parsing or cleansing
+        for _, table, _ in sources:
+            LOADERS[table](read_landing(table))
+        refresh_metric_views()
+        sys.exit(0)
+
+    if args.parallel:
+        run_pipeline(
+            [(filepath, table, cleanse_fn)
+             for pattern, table, cleanse_fn in sources
+             for filepath in find_files(pattern)],
+            read_file,
+            max_workers=args.workers
+        )
+        sys.exit(0)
+
+    if args.stream:
+        changed = []
+        for pattern, table, cleanse_fn in sources:
+            for filepath in find_files(pattern):
+                if args.incremental and is_file_ingested(table, file_hash(filepath)):
+                    print(f"Skipping {os.path.basename(filepath)}: already ingested into {table}.")
+                    continue
+                stream_file(filepath, table, cleanse_fn, chunksize=args.chunksize, incremental=args.incremental)
+                changed.append(table)
+        if changed:
+            refresh_metric_views(set(changed))
+        sys.exit(0)
+
+    if args.incremental:
+        changed = [table for pattern, table, cleanse_fn in sources
+                   for filepath in find_files(pattern)
+                   if ingest_file(filepath, table, cleanse_fn) is not None]
+        if changed:
+            refresh_metric_views(set(changed))
+        sys.exit(0)
+
+    df1, failures1 = ingest_files('census_daily_week_*.csv', 'census', cleanse_census_data, max_workers=args.workers)
     # print(df1)
     # print(df1.dtypes) 
     
-    df2 = choose_file('shift_schedule_week_01.csv')
-    df2 = cleanse_shift_schedule(df2)
+    df2, failures2 = ingest_files('shift_schedule_week_*.csv', 'shifts', cleanse_shift_schedule, max_workers=args.workers)
     # print(df2)
     # print(df2.dtypes)
 
-    df3 = choose_file('staff_master.csv')
-    df3 = cleanse_staff_master(df3)
+    df3, failures3 = ingest_files('staff_master*.csv', 'staff', cleanse_staff_master, max_workers=args.workers)
     # print(df3)
     # print(df3.dtypes)
 
-    df4 = choose_file('timekeeping_week_01.csv')
-    df4 = cleanse_time_keeping(df4)
+    df4, failures4 = ingest_files('timekeeping_week_*.csv', 'timekeeping', cleanse_time_keeping, max_workers=args.workers)
     # print(df4)
     # print(df4.dtypes)
 
+    # A file that failed fails the run before anything is loaded, as it
+    # does with --parallel
+    failures = {**failures1, **failures2, **failures3, **failures4}
+    if failures:
+        print(f"{len(failures)} file(s) failed to cleanse:")
+        for filepath, error in failures.items():
+            print(f"  {os.path.basename(filepath)}: {error}")
+        sys.exit(1)
+
+    if args.landing:
+        write_landing(df1, 'census')
+        write_landing(df2, 'shifts')
+        write_landing(df3, 'staff')
+        write_landing(df4, 'timekeeping')
+
     # validate_dataframe(df1, pk_col="census_id", required_cols=['census_id', 'unit', 'date', 'total_patients', 'admissions', 'discharges'])
     # validate_dataframe(df2, pk_col="shift_id", required_cols=['shift_id', 'staff_id', 'unit', 'shift_date', 'shift_start', 'shift_end', 'shift_type', 'role', 'status'])
     # validate_dataframe(df3, pk_col="staff_id", required_cols=['staff_id', 'first_name', 'last_name', 'role', 'employment_type', 'home_unit', 'max_hours_per_week', 'hire_date'])
@@ -394,4 +514,5 @@ if __name__ == "__main__":
     print("Load complete.") 
     print("About to load timekeeping...")
     load_timekeeping(df4)
-    print("Load complete.") 
+    print("Load complete.")
+    refresh_metric_views()
@@ -1,126 +1,565 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from etl.instrumentation import CountingCursor, stage
+from etl.trends import (
+    SHIFT_DAYS_QUERY, STAFF_QUERY, TIMEKEEPING_QUERY, TREND_COLUMNS, TREND_SOURCES, TRENDS_TABLE,
+    affected_weeks, rolling_trends, source_range, week_of, weekly_activity
+)
+
+
+# Rows per COPY batch for the bulk loaders
+BATCH_SIZE = 50000
+
+# Column order of each target table in schema.sql
+TABLE_COLUMNS = {
+    "staff": [
+        "staff_id", "first_name", "last_name", "role", "employment_type",
+        "home_unit", "max_hours_per_week", "hire_date"
+    ],
+    "shifts": [
+        "shift_id", "staff_id", "unit", "shift_date", "shift_start",
+        "shift_end", "shift_type", "role", "status"
+    ],
+    "census": [
+        "census_id", "unit", "date", "total_patients", "admissions", "discharges"
+    ],
+    "timekeeping": [
+        "record_id", "staff_id", "week_start", "hours_worked",
+        "overtime_hours", "pto_hours", "sick_hours"
+    ],
+}
+
+
+# Natural key and watermark date column of each target table. Once
+# migrations/002 partitions shifts/timekeeping, their primary keys also
+# include the date column, so upserts read the real key from the catalog.
+PRIMARY_KEYS = {
+    "staff": "staff_id",
+    "shifts": "shift_id",
+    "census": "census_id",
+    "timekeeping": "record_id",
+}
+
+DATE_COLUMNS = {
+    "staff": "hire_date",
+    "shifts": "shift_date",
+    "census": "date",
+    "timekeeping": "week_start",
+}
+
+# Materialized views from migrations/R__metric_views.sql and the tables
+# each one is computed from
+METRIC_VIEWS = {
+    "mv_overtime_by_staff": ["timekeeping"],
+    "mv_patient_to_staff_ratio": ["census", "shifts"],
+    "mv_weekly_capacity_utilization": ["timekeeping", "staff"],
+    "mv_cancellation_rate_by_unit": ["shifts"],
+    "mv_average_shift_duration": ["shifts"],
+    "mv_total_days_worked": ["shifts"],
+}
+
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5433,
+    "database": "staffing_db",
+    "user": "staffing_user",
+    "password": "staffing_pass",
+}
+
+# Default size of the shared connection pool
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_shared = threading.local()
+
+POOL_STATS = {
+    "checkouts": 0,
+    "in_use": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "checkout_seconds_total": 0.0,
+    "checkout_seconds_max": 0.0,
+}
 
 
 def get_connection():
     # Connecting to Postgresql Datatabse
-    return psycopg2.connect(
-        host="localhost",
-        port=5433, 
-        database="staffing_db",
-        user="staffing_user",
-        password="staffing_pass"
-    )
+    return psycopg2.connect(cursor_factory=CountingCursor, **DB_CONFIG)
 
 
-def load_staff(df):
+def init_pool(minconn=POOL_MIN_SIZE, maxconn=POOL_MAX_SIZE):
+    # Create the shared pool unless there already is one; close_pool() first
+    # to recreate it (e.g. with new DB_CONFIG), since a live pool may have
+    # connections borrowed by other threads. ThreadedConnectionPool raises
+    # instead of blocking when exhausted, so a semaphore makes callers wait
+    # for a slot.
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(minconn, maxconn, cursor_factory=CountingCursor, **DB_CONFIG)
+            _pool_slots = threading.BoundedSemaphore(maxconn)
+        return _pool
 
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    insert_query = """
-    INSERT INTO staff (
-        staff_id,
-        first_name,
-        last_name,
-        role,
-        employment_type,
-        home_unit,
-        max_hours_per_week,
-        hire_date
-    )
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-    """
+def _get_pool():
+    # (pool, slots), creating the pool on first use. init_pool checks again
+    # under the lock, so concurrent first callers share one pool.
+    while True:
+        with _pool_lock:
+            if _pool is not None:
+                return _pool, _pool_slots
+        init_pool()
 
-    for row in df.itertuples(index=False):
-        cursor.execute(insert_query, tuple(row))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+def close_pool():
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+        _pool_slots = None
 
-    print("Staff loaded successfully.")
 
+def get_pool_stats():
+    with _pool_lock:
+        stats = dict(POOL_STATS)
+    checkouts = stats["checkouts"]
+    stats["wait_seconds_avg"] = stats["wait_seconds_total"] / checkouts if checkouts else 0.0
+    stats["checkout_seconds_avg"] = stats["checkout_seconds_total"] / checkouts if checkouts else 0.0
+    return stats
 
-def load_shifts(df):
 
-    conn = get_connection()
+@contextmanager
+def pooled_connection():
+    # Borrow a connection from the shared pool, or reuse the one held by an
+    # enclosing shared_connection() block on this thread
+    if getattr(_shared, "conn", None) is not None:
+        yield _shared.conn
+        return
+
+    pool, slots = _get_pool()
+
+    requested = time.perf_counter()
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+    acquired = time.perf_counter()
+    wait = acquired - requested
+    with _pool_lock:
+        POOL_STATS["checkouts"] += 1
+        POOL_STATS["in_use"] += 1
+        POOL_STATS["wait_seconds_total"] += wait
+        POOL_STATS["wait_seconds_max"] = max(POOL_STATS["wait_seconds_max"], wait)
+
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        # Never hand the next borrower a connection mid-transaction
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        pool.putconn(conn, close=bool(conn.closed))
+        slots.release()
+        held = time.perf_counter() - acquired
+        with _pool_lock:
+            POOL_STATS["in_use"] -= 1
+            POOL_STATS["checkout_seconds_total"] += held
+            POOL_STATS["checkout_seconds_max"] = max(POOL_STATS["checkout_seconds_max"], held)
+
+
+@contextmanager
+def shared_connection():
+    # Run a whole report on one borrowed connection: every pooled_connection()
+    # inside this block on the same thread gets the same connection
+    if getattr(_shared, "conn", None) is not None:
+        yield _shared.conn
+        return
+
+    with pooled_connection() as conn:
+        _shared.conn = conn
+        try:
+            yield conn
+        finally:
+            _shared.conn = None
+
+
+def insert_rows(conn, df, table, columns=None):
+    # Row-by-row path: one INSERT (and one round trip) per row
+    columns = columns or TABLE_COLUMNS[table]
+    insert_query = f"""
+    INSERT INTO {table} ({", ".join(columns)})
+    VALUES ({",".join(["%s"] * len(columns))})
+    """
     cursor = conn.cursor()
+    for row in df[columns].itertuples(index=False):
+        cursor.execute(insert_query, tuple(row))
+    cursor.close()
+    return len(df)
 
-    insert_query = """
-    INSERT INTO shifts (
-        shift_id,
-        staff_id,
-        unit,
-        shift_date,
-        shift_start,
-        shift_end,
-        shift_type,
-        role,
-        status
+
+def copy_rows(conn, df, table, columns=None, batch_size=BATCH_SIZE, float_format="%.0f"):
+    # Bulk path: stream the frame through COPY FROM STDIN in batches.
+    # NaN/NaT are written as empty fields, which COPY csv reads as NULL.
+    # Integer columns come out of pd.to_numeric as float64, so floats are
+    # written without a fractional part to fit the INT columns in schema.sql
+    # (float_format=None keeps them exact, for real float columns).
+    columns = columns or TABLE_COLUMNS[table]
+    copy_query = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.cursor()
+    for start in range(0, len(df), batch_size):
+        buffer = io.StringIO()
+        df[columns].iloc[start:start + batch_size].to_csv(
+            buffer, header=False, index=False, float_format=float_format
+        )
+        buffer.seek(0)
+        cursor.copy_expert(copy_query, buffer)
+    cursor.close()
+    return len(df)
+
+
+def primary_key_columns(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a
+            ON a.attrelid = i.indrelid
+            AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s::regclass
+            AND i.indisprimary
+        """,
+        (table,)
     )
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """
+    keys = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return keys or [PRIMARY_KEYS[table]]
 
-    for row in df.itertuples(index=False):
-        cursor.execute(insert_query, tuple(row))
 
-    conn.commit()
+def ensure_partitions(conn, df, table):
+    # Create any monthly partitions the frame's dates need. No-op until
+    # migrations/002_indexes_and_partitions.sql has partitioned the table.
+    if table not in ("shifts", "timekeeping") or len(df) == 0:
+        return
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,)
+    )
+    if cursor.fetchone()[0]:
+        dates = df[DATE_COLUMNS[table]]
+        cursor.execute(
+            "SELECT ensure_month_partitions(%s, %s, %s)",
+            (table, pd.Timestamp(dates.min()).date(), pd.Timestamp(dates.max()).date())
+        )
     cursor.close()
-    conn.close()
 
-    print("Shifts loaded successfully.")
+
+def detach_partitions(table, before):
+    # Detach monthly partitions that end on or before `before`. The detached
+    # tables are kept, so old weeks can be archived or dropped separately.
+    before = pd.Timestamp(before)
+    detached = []
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            (table,)
+        )
+        for (partition,) in cursor.fetchall():
+            month_start = pd.to_datetime(partition[len(table) + 1:], format="%Y_%m", errors="coerce")
+            if pd.isna(month_start) or month_start + pd.DateOffset(months=1) > before:
+                continue
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+            detached.append(partition)
+        if detached:
+            bump_data_version(conn, table)
+        conn.commit()
+        cursor.close()
+    return detached
 
 
-def load_census(df):
+def upsert_rows(conn, df, table, batch_size=BATCH_SIZE):
+    # Stage the frame in a temp table, then merge it on the primary key.
+    # Rows whose values did not change are left untouched.
+    columns = TABLE_COLUMNS[table]
+    keys = primary_key_columns(conn, table)
+    stage = f"stage_{table}"
+    col_list = ", ".join(columns)
+    updates = [col for col in columns if col not in keys]
 
-    conn = get_connection()
+    ensure_partitions(conn, df, table)
     cursor = conn.cursor()
+    # Dropped first so several chunks can be merged in one transaction
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    copy_rows(conn, df, stage, columns=columns, batch_size=batch_size)
+    # Partitioned tables also key on the date, so a row whose date changed
+    # would not conflict and be inserted twice: its old row is deleted first
+    pk = PRIMARY_KEYS[table]
+    partition_keys = [col for col in keys if col != pk]
+    if pk in keys and partition_keys:
+        cursor.execute(f"""
+        DELETE FROM {table}
+        USING {stage}
+        WHERE {table}.{pk} = {stage}.{pk}
+            AND ({", ".join(f"{table}.{col}" for col in partition_keys)})
+                IS DISTINCT FROM ({", ".join(f"{stage}.{col}" for col in partition_keys)})
+        """)
+    cursor.execute(f"""
+    INSERT INTO {table} ({col_list})
+    SELECT {col_list} FROM {stage}
+    ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+        {", ".join(f"{col} = EXCLUDED.{col}" for col in updates)}
+    WHERE ({", ".join(f"{table}.{col}" for col in updates)})
+        IS DISTINCT FROM ({", ".join(f"EXCLUDED.{col}" for col in updates)})
+    """)
+    upserted = cursor.rowcount
+    cursor.close()
+    return upserted
+
+
+def file_hash(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def is_file_ingested(source, source_hash):
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM ingest_watermarks WHERE source = %s AND file_hash = %s",
+            (source, source_hash)
+        )
+        found = cursor.fetchone() is not None
+        cursor.close()
+    return found
+
+
+def get_watermark(source):
+    # Latest date ingested for a source, or None before the first load
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(max_date) FROM ingest_watermarks WHERE source = %s", (source,))
+        max_date = cursor.fetchone()[0]
+        cursor.close()
+    return max_date
+
 
-    insert_query = """
-    INSERT INTO census (
-        census_id,
-        unit,
-        date,
-        total_patients,
-        admissions,
-        discharges
+def frame_max_date(df, source):
+    max_date = df[DATE_COLUMNS[source]].max() if len(df) else None
+    return None if pd.isna(max_date) else pd.Timestamp(max_date).date()
+
+
+def record_watermark(conn, source, source_file, source_hash, max_date, row_count):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO ingest_watermarks (source, file_name, file_hash, max_date, row_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (source, file_hash) DO NOTHING
+        """,
+        (source, os.path.basename(source_file), source_hash, max_date, row_count)
     )
-    VALUES (%s,%s,%s,%s,%s,%s)
-    """
+    cursor.close()
 
-    for row in df.itertuples(index=False):
-        cursor.execute(insert_query, tuple(row))
 
-    conn.commit()
+def bump_data_version(conn, table):
+    # Part of the loading transaction, so readers see the new version exactly
+    # when they can see the new rows
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO data_versions (table_name, version)
+        VALUES (%s, 1)
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = NOW()
+        """,
+        (table,)
+    )
     cursor.close()
-    conn.close()
 
-    print("Census loaded successfully.")
 
+def get_data_versions():
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name, version FROM data_versions")
+        versions = dict(cursor.fetchall())
+        cursor.close()
+    return versions
 
-def load_timekeeping(df):
 
-    conn = get_connection()
-    cursor = conn.cursor()
+def load_incremental(df, table, source_file, source_hash=None, batch_size=BATCH_SIZE):
+    # Upsert a cleansed file and record its watermark in the same transaction,
+    # so a file is either fully merged and marked ingested or not at all
+    source_hash = source_hash or file_hash(source_file)
+    with stage("load", table=table, mode="upsert") as s, pooled_connection() as conn:
+        start = time.perf_counter()
+        upserted = upsert_rows(conn, df, table, batch_size=batch_size)
+        record_watermark(conn, table, source_file, source_hash, frame_max_date(df, table), len(df))
+        bump_data_version(conn, table)
+        if table in TREND_SOURCES:
+            refresh_staff_trends(conn, trend_weeks(df, table))
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        s.rows_in = len(df)
+        s.rows_out = upserted
 
-    insert_query = """
-    INSERT INTO timekeeping (
-        record_id,
-        staff_id,
-        week_start,
-        hours_worked,
-        overtime_hours,
-        pto_hours,
-        sick_hours
+    print(
+        f"Merged {len(df)} rows from {os.path.basename(source_file)} into {table} "
+        f"({upserted} inserted or updated) in {elapsed:.2f}s."
     )
-    VALUES (%s,%s,%s,%s,%s,%s,%s)
-    """
+    return upserted
 
-    for row in df.itertuples(index=False):
-        cursor.execute(insert_query, tuple(row))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+def trend_weeks(df, table):
+    # Weeks of a loaded frame whose trends need updating; None (all of them)
+    # for staff, whose contract hours feed every capacity window
+    if table == "shifts":
+        return sorted(week_of(df["shift_date"]).dropna().unique())
+    if table == "timekeeping":
+        return sorted(week_of(df["week_start"]).dropna().unique())
+    return None
+
+
+def refresh_staff_trends(conn, weeks=None):
+    # Recompute the staff_week_trends rows whose windows include any of
+    # weeks, from just the source rows those windows cover, so a new week
+    # updates max(WINDOWS) + 1 weeks of trends and leaves history alone.
+    # weeks=None rebuilds everything. Runs in the caller's loading
+    # transaction; the advisory lock serialises concurrent loads, so the
+    # last one to commit has seen every other's rows.
+    if weeks is not None and not len(weeks):
+        return 0
+    with stage("refresh_trends", weeks="all" if weeks is None else len(weeks)) as s:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (TRENDS_TABLE,))
+        if weeks is None:
+            params = {"start": None, "end": None}
+        else:
+            weeks = affected_weeks(weeks)
+            start, end = source_range(weeks)
+            params = {"start": start.date(), "end": end.date()}
+        weekly = weekly_activity(
+            pd.read_sql(STAFF_QUERY, conn),
+            pd.read_sql(TIMEKEEPING_QUERY, conn, params=params),
+            pd.read_sql(SHIFT_DAYS_QUERY, conn, params=params),
+        )
+        trends = rolling_trends(weekly, weeks=weeks)
+        if weeks is None:
+            cursor.execute(f"DELETE FROM {TRENDS_TABLE}")
+        else:
+            cursor.execute(
+                f"DELETE FROM {TRENDS_TABLE} WHERE week_start = ANY(%s)", ([week.date() for week in weeks],)
+            )
+        cursor.close()
+        rows = copy_rows(conn, trends, TRENDS_TABLE, columns=TREND_COLUMNS, float_format=None)
+        bump_data_version(conn, TRENDS_TABLE)
+        s.rows_in = len(weekly)
+        s.rows_out = rows
+    return rows
+
+
+def refresh_metric_views(tables=None):
+    # Refresh the views that depend on the loaded tables (all of them by
+    # default). CONCURRENTLY keeps dashboard reads unblocked while refreshing;
+    # views not created yet are skipped. The view's source tables get a new
+    # data version in the refresh's transaction: the load bumped them before
+    # the view changed, so a metric read from the view in between would be
+    # cached under the current versions.
+    tables = set(tables or TABLE_COLUMNS)
+    views = [view for view, sources in METRIC_VIEWS.items() if tables & set(sources)]
+    if not views:
+        return []
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT matviewname, ispopulated FROM pg_matviews WHERE matviewname = ANY(%s)",
+            (views,)
+        )
+        existing = dict(cursor.fetchall())
+        refreshed = []
+        for view in views:
+            if view not in existing:
+                continue
+            start = time.perf_counter()
+            concurrently = "CONCURRENTLY " if existing[view] else ""
+            with stage("refresh_view", view=view):
+                cursor.execute(f"REFRESH MATERIALIZED VIEW {concurrently}{view}")
+                for table in METRIC_VIEWS[view]:
+                    bump_data_version(conn, table)
+                conn.commit()
+            refreshed.append(view)
+            print(f"Refreshed {view} in {time.perf_counter() - start:.2f}s.")
+        cursor.close()
+    return refreshed
+
+
+def _load(df, table, bulk=True, batch_size=BATCH_SIZE):
+    with stage("load", table=table, mode="copy" if bulk else "insert") as s, pooled_connection() as conn:
+        start = time.perf_counter()
+        ensure_partitions(conn, df, table)
+        if bulk:
+            rows = copy_rows(conn, df, table, batch_size=batch_size)
+        else:
+            rows = insert_rows(conn, df, table)
+        bump_data_version(conn, table)
+        if table in TREND_SOURCES:
+            refresh_staff_trends(conn, trend_weeks(df, table))
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        s.rows_in = len(df)
+        s.rows_out = rows
+
+    rows_per_sec = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Loaded {rows} rows into {table} in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    return rows_per_sec
+
+
+def load_staff(df, bulk=True, batch_size=BATCH_SIZE):
+    _load(df, "staff", bulk=bulk, batch_size=batch_size)
+    print("Staff loaded successfully.")
+
+
+def load_shifts(df, bulk=True, batch_size=BATCH_SIZE):
+    _load(df, "shifts", bulk=bulk, batch_size=batch_size)
+    print("Shifts loaded successfully.")
+
+
+def load_census(df, bulk=True, batch_size=BATCH_SIZE):
+    _load(df, "census", bulk=bulk, batch_size=batch_size)
+    print("Census loaded successfully.")
+
 
+def load_timekeeping(df, bulk=True, batch_size=BATCH_SIZE):
+    _load(df, "timekeeping", bulk=bulk, batch_size=batch_size)
     print("Timekeeping loaded successfully.")
@@ -0,0 +1,301 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import psycopg2.extensions
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# One JSON record per run: logs/runs/<run_id>.json
+RUNS_DIR = "logs/runs"
+
+# Prefix of the Prometheus metric names
+METRIC_PREFIX = "staffing_stage"
+
+# Fields of a summary() row that are not labels
+SUMMARY_FIELDS = ("stage", "calls", "seconds", "rows_in", "rows_out", "rows_rejected", "db_round_trips")
+
+_local = threading.local()
+
+
+def round_trips():
+    # Statements this thread has sent to Postgres so far
+    return getattr(_local, "round_trips", 0)
+
+
+def _count_round_trip():
+    _local.round_trips = getattr(_local, "round_trips", 0) + 1
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    # cursor_factory for the pool: counts every statement (and every fetch
+    # of a named, server-side cursor) per thread, so a stage knows how many
+    # DB round trips it made without any change at the call sites
+
+    def execute(self, query, vars=None):
+        _count_round_trip()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _count_round_trip()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count_round_trip()
+        return super().copy_expert(sql, file, size)
+
+    def fetchmany(self, size=None):
+        if self.name:
+            _count_round_trip()
+        return super().fetchmany(size) if size is not None else super().fetchmany()
+
+    def fetchall(self):
+        if self.name:
+            _count_round_trip()
+        return super().fetchall()
+
+
+def _peak_rss_mb():
+    # Process high-water mark; ru_maxrss is in KB on Linux
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _rss_growth_mb(start_peak):
+    # How far the process high-water mark rose since start_peak: the memory
+    # a stage needed beyond what the process had already used. 0 when the
+    # stage fit under the earlier peak; threads running alongside share the
+    # process, so their growth lands in whichever stage is open.
+    if start_peak is None:
+        return None
+    return round(max(_peak_rss_mb() - start_peak, 0.0), 1)
+
+
+def _stack():
+    stack = getattr(_local, "stages", None)
+    if stack is None:
+        stack = _local.stages = []
+    return stack
+
+
+class Stage:
+    # One timed unit of work. Callers fill in rows_in/rows_out/rows_rejected
+    # inside the with block; the rest is measured on exit.
+
+    def __init__(self, recorder, name, labels):
+        self.recorder = recorder
+        self.name = name
+        self.labels = labels
+        self.rows_in = None
+        self.rows_out = None
+        self.rows_rejected = None
+        self.traced_peak = 0
+
+    def __enter__(self):
+        stack = _stack()
+        if self.recorder.trace_memory:
+            # reset_peak() would lose the enclosing stage's peak so far, so
+            # it is saved on the parent first
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.started_at = datetime.now()
+        self.start_round_trips = round_trips()
+        self.start_peak_rss = _peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        record = {
+            "stage": self.name,
+            **self.labels,
+            "parent": stack[-1].name if stack else None,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "seconds": round(seconds, 6),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_rejected": self.rows_rejected,
+            "db_round_trips": round_trips() - self.start_round_trips,
+            "peak_rss_growth_mb": _rss_growth_mb(self.start_peak_rss),
+            "status": "error" if exc_type else "ok",
+        }
+        if self.recorder.trace_memory:
+            self.traced_peak = max(self.traced_peak, tracemalloc.get_traced_memory()[1])
+            record["peak_traced_mb"] = round(self.traced_peak / 2**20, 1)
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, self.traced_peak)
+        self.recorder.add(record)
+        return False
+
+
+class _NullStage:
+    # Returned while instrumentation is off: entering, exiting and setting
+    # row counts on it does nothing
+
+    rows_in = rows_out = rows_rejected = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Recorder:
+    # Collects the stage records of one run. trace_memory adds a per-stage
+    # Python allocation peak from tracemalloc, which slows allocation-heavy
+    # code noticeably; peak_rss_growth_mb is always recorded and costs
+    # nothing.
+
+    def __init__(self, run_id=None, root=RUNS_DIR, trace_memory=False):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.root = root
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now()
+        self.records = []
+        self.lock = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def extend(self, records):
+        # Also used to take over the records of a worker process
+        with self.lock:
+            self.records.extend(records)
+
+    def drain(self):
+        with self.lock:
+            records, self.records = self.records, []
+        return records
+
+    def summary(self):
+        # Totals per stage and labels, slowest first: where the time goes
+        totals = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            key = _series_key(record)
+            total = totals.setdefault(key, {
+                "stage": record["stage"], **dict(key[1]), "calls": 0, "seconds": 0.0,
+                "rows_in": 0, "rows_out": 0, "rows_rejected": 0, "db_round_trips": 0,
+            })
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            total["db_round_trips"] += record["db_round_trips"]
+            for field in ("rows_in", "rows_out", "rows_rejected"):
+                total[field] += record[field] or 0
+        return sorted(totals.values(), key=lambda total: total["seconds"], reverse=True)
+
+    def print_summary(self, limit=15):
+        print(f"{'stage':<12} {'labels':<48} {'calls':>6} {'seconds':>9} {'rows out':>10} {'rejected':>9} {'db trips':>9}")
+        for total in self.summary()[:limit]:
+            labels = ",".join(str(value) for key, value in total.items() if key not in SUMMARY_FIELDS)
+            print(
+                f"{total['stage']:<12} {labels[:48]:<48} {total['calls']:>6} {total['seconds']:>9.3f} "
+                f"{total['rows_out']:>10} {total['rows_rejected']:>9} {total['db_round_trips']:>9}"
+            )
+
+    def write(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{self.run_id}.json")
+        with self.lock:
+            run = {
+                "run_id": self.run_id,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "stages": list(self.records),
+            }
+        with open(path, "w") as f:
+            json.dump(run, f, indent=1, default=str)
+        return path
+
+    def prometheus_text(self):
+        # Text exposition format, e.g. for node_exporter's textfile collector
+        counters = [
+            ("calls_total", "calls", "Stage executions"),
+            ("seconds_total", "seconds", "Wall time spent in the stage"),
+            ("rows_in_total", "rows_in", "Rows going into the stage"),
+            ("rows_out_total", "rows_out", "Rows coming out of the stage"),
+            ("rows_rejected_total", "rows_rejected", "Rows rejected by the stage"),
+            ("db_round_trips_total", "db_round_trips", "Statements sent to Postgres by the stage"),
+        ]
+        summary = self.summary()
+        lines = []
+        for suffix, field, help_text in counters:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for total in summary:
+                labels = {key: value for key, value in total.items() if key not in SUMMARY_FIELDS[1:]}
+                label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                lines.append(f"{name}{{{label_text}}} {total[field]}")
+        rss = _peak_rss_mb()
+        if rss is not None:
+            lines.append(f"# HELP {METRIC_PREFIX}_peak_rss_bytes Peak resident memory of the process")
+            lines.append(f"# TYPE {METRIC_PREFIX}_peak_rss_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}_peak_rss_bytes {int(rss * 2**20)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Written then renamed, so a scraper never reads half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+
+def _series_key(record):
+    labels = {
+        key: value for key, value in record.items()
+        if key not in ("stage", "parent", "started_at", "seconds", "rows_in", "rows_out", "rows_rejected",
+                       "db_round_trips", "peak_rss_growth_mb", "peak_traced_mb", "status")
+    }
+    return record["stage"], tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_recorder = None
+
+
+def get_recorder():
+    return _recorder
+
+
+def set_recorder(recorder):
+    global _recorder
+    _recorder = recorder
+    return recorder
+
+
+def stage(name, **labels):
+    # with stage("load", table="staff") as s: ...; s.rows_out = n
+    # Without a recorder this is one global lookup returning NULL_STAGE.
+    recorder = _recorder
+    if recorder is None:
+        return NULL_STAGE
+    return Stage(recorder, name, labels)
@@ -0,0 +1,153 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+# Cleansed, typed output of the cleansers as hive-partitioned Parquet:
+# landing/<table>/<partition>=<value>/.../<table>-N.parquet
+LANDING_DIR = os.path.join(os.path.dirname(__file__), '..', 'landing')
+
+# Partition columns per table. "week" is the Monday of the row's date
+# column and only exists in the file layout, not in the returned frames.
+PARTITION_COLUMNS = {
+    "staff": ["home_unit"],
+    "shifts": ["unit", "week"],
+    "census": ["unit", "week"],
+    "timekeeping": ["week"],
+}
+
+WEEK_SOURCE_COLUMNS = {
+    "shifts": "shift_date",
+    "census": "date",
+    "timekeeping": "week_start",
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the Parquet landing zone (pip install pyarrow)")
+
+
+def arrow_schema(table):
+    # Arrow types matching the column types in schema.sql
+    _require_pyarrow()
+    schemas = {
+        "staff": [
+            ("staff_id", pa.string()),
+            ("first_name", pa.string()),
+            ("last_name", pa.string()),
+            ("role", pa.string()),
+            ("employment_type", pa.string()),
+            ("home_unit", pa.string()),
+            ("max_hours_per_week", pa.int32()),
+            ("hire_date", pa.date32()),
+        ],
+        "shifts": [
+            ("shift_id", pa.string()),
+            ("staff_id", pa.string()),
+            ("unit", pa.string()),
+            ("shift_date", pa.date32()),
+            ("shift_start", pa.timestamp("us")),
+            ("shift_end", pa.timestamp("us")),
+            ("shift_type", pa.string()),
+            ("role", pa.string()),
+            ("status", pa.string()),
+        ],
+        "census": [
+            ("census_id", pa.string()),
+            ("unit", pa.string()),
+            ("date", pa.date32()),
+            ("total_patients", pa.int32()),
+            ("admissions", pa.int32()),
+            ("discharges", pa.int32()),
+        ],
+        "timekeeping": [
+            ("record_id", pa.string()),
+            ("staff_id", pa.string()),
+            ("week_start", pa.date32()),
+            ("hours_worked", pa.int32()),
+            ("overtime_hours", pa.int32()),
+            ("pto_hours", pa.int32()),
+            ("sick_hours", pa.int32()),
+        ],
+    }
+    return pa.schema(schemas[table])
+
+
+def _partitioning(table):
+    return ds.partitioning(
+        pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS[table]]),
+        flavor="hive"
+    )
+
+
+def to_arrow(df, table):
+    # A cleansed frame as an Arrow table with its schema.sql types
+    _require_pyarrow()
+    schema = arrow_schema(table)
+    df = df[schema.names].copy()
+    for field in schema:
+        if pa.types.is_integer(field.type):
+            # pd.to_numeric leaves float64; the cleansers already dropped NaNs
+            df[field.name] = df[field.name].round().astype("int64")
+        elif isinstance(df[field.name].dtype, pd.CategoricalDtype):
+            # Categoricals of the compact layout (compact.py) as plain strings
+            df[field.name] = df[field.name].astype(str)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_landing(df, table, root=LANDING_DIR):
+    # Write a cleansed frame with its schema.sql types. Partitions present in
+    # df are replaced, so re-running a week overwrites rather than duplicates.
+    arrow_table = to_arrow(df, table)
+    if table in WEEK_SOURCE_COLUMNS:
+        dates = pd.to_datetime(df[WEEK_SOURCE_COLUMNS[table]])
+        week = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+        arrow_table = arrow_table.append_column("week", pa.array(week, pa.string()))
+
+    ds.write_dataset(
+        arrow_table,
+        os.path.join(root, table),
+        format="parquet",
+        partitioning=_partitioning(table),
+        existing_data_behavior="delete_matching",
+        basename_template=f"{table}-{{i}}.parquet"
+    )
+    return len(df)
+
+
+def read_landing(table, columns=None, filters=None, root=LANDING_DIR, memory_map=True):
+    # Read a table back, only decoding the requested columns and only the
+    # partitions/row groups that pass the filters, e.g.
+    # read_landing("shifts", ["staff_id", "shift_date"], [("unit", "=", "ICU")])
+    _require_pyarrow()
+    schema = arrow_schema(table)
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No landing data for {table} in {root}")
+
+    columns = list(columns or schema.names)
+    arrow_table = pq.read_table(
+        path,
+        columns=columns,
+        filters=filters,
+        partitioning=_partitioning(table),
+        memory_map=memory_map
+    )
+    # Partition columns come back as strings; restore the schema types
+    arrow_table = arrow_table.cast(pa.schema([
+        schema.field(col) if col in schema.names else arrow_table.schema.field(col)
+        for col in arrow_table.column_names
+    ]))
+    df = arrow_table.to_pandas(date_as_object=False)
+    for field in schema:
+        if field.name in df.columns and pa.types.is_date(field.type):
+            df[field.name] = df[field.name].astype("datetime64[ns]")
+    return df
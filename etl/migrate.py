@@ -0,0 +1,68 @@
+import glob
+import os
+import sys
+
+if not __package__:
+    # Run as etl/migrate.py: make the etl package importable
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from etl.data_upload import get_connection
+
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
+SCHEMA_FILE = os.path.join(BASE_DIR, 'schema.sql')
+MIGRATIONS_DIR = os.path.join(BASE_DIR, 'migrations')
+
+
+def applied_migrations(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(255) PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT NOW()
+    )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    cursor.close()
+    return versions
+
+
+def migrate():
+    # Base tables from schema.sql, then every versioned migrations/NNN_*.sql
+    # not yet recorded in schema_migrations, in file name order, one
+    # transaction each. Repeatable migrations/R__*.sql files (views) must be
+    # idempotent and are re-applied on every run, since a versioned migration
+    # that rebuilds a table drops the views on it; they drop and recreate
+    # their objects so changed definitions are applied too.
+    conn = get_connection()
+    cursor = conn.cursor()
+    with open(SCHEMA_FILE) as f:
+        cursor.execute(f.read())
+    conn.commit()
+
+    done = applied_migrations(conn)
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '[0-9]*.sql'))):
+        version = os.path.basename(path)
+        if version in done:
+            continue
+
+        print(f"Applying migration {version}...")
+        with open(path) as f:
+            cursor.execute(f.read())
+        cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        conn.commit()
+
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'R__*.sql'))):
+        with open(path) as f:
+            cursor.execute(f.read())
+        conn.commit()
+
+    cursor.close()
+    conn.close()
+    print("Schema up to date.")
+
+
+if __name__ == "__main__":
+    migrate()
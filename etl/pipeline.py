@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from etl.compact import concat_frames
+from etl.data_upload import (
+    BATCH_SIZE, PRIMARY_KEYS, load_census, load_shifts, load_staff, load_timekeeping, refresh_metric_views
+)
+from etl.instrumentation import Recorder, get_recorder, set_recorder
+from etl.reject_sink import RejectSink, get_reject_sink, set_reject_sink
+from etl.streaming import UNIQUE_KEYS
+
+
+LOADERS = {
+    "staff": load_staff,
+    "shifts": load_shifts,
+    "census": load_census,
+    "timekeeping": load_timekeeping,
+}
+
+# Tables each load has to wait for (foreign keys in schema.sql)
+LOAD_DEPENDENCIES = {
+    "staff": [],
+    "shifts": ["staff"],
+    "census": [],
+    "timekeeping": ["staff"],
+}
+
+
+def concat_files(frames, table, names):
+    # Cleansed files of one table as one frame. Each file was checked for
+    # duplicate keys on its own, so the table's primary key and UNIQUE_KEYS
+    # are checked again across files here rather than failing halfway
+    # through the COPY.
+    df = concat_frames(frames, ignore_index=True)
+    sources = np.repeat(np.array(names, dtype=object), [len(frame) for frame in frames])
+    for key in [[PRIMARY_KEYS[table]]] + ([UNIQUE_KEYS[table]] if table in UNIQUE_KEYS else []):
+        duplicated = df.duplicated(subset=key, keep=False).to_numpy()
+        if duplicated.any():
+            raise ValueError(
+                f"Duplicate {'-'.join(key)} across files: {int(df.duplicated(subset=key).sum())} rows "
+                f"repeat a key, in {', '.join(sorted(set(sources[duplicated])))}"
+            )
+    return df
+
+
+def cleanse_task(read_fn, filepath, cleanse_fn, run_id=None, instrument=False, trace_memory=False):
+    # Runs in a worker process. Rejects and stage records are buffered in a
+    # fresh sink and recorder and sent back with the cleansed frame, for the
+    # parent's to write.
+    start = time.perf_counter()
+    sink = set_reject_sink(RejectSink(run_id=run_id, flush_rows=None))
+    sink.source_file = filepath
+    recorder = set_recorder(Recorder(run_id=run_id, trace_memory=trace_memory) if instrument else None)
+    df = cleanse_fn(read_fn(filepath))
+    return df, time.perf_counter() - start, sink.drain(), recorder.drain() if recorder else []
+
+
+def load_task(table, df, batch_size):
+    # Runs in a worker thread, on its own pooled connection
+    start = time.perf_counter()
+    LOADERS[table](df, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def run_pipeline(sources, read_fn, max_workers=4, batch_size=BATCH_SIZE):
+    # sources: [(filepath, table, cleanse_fn)], any number of files per
+    # table. Every file is cleansed concurrently in a process pool; a table
+    # is loaded on a thread once all of its files are cleansed and the loads
+    # it depends on have finished. Returns the wall time of each stage plus
+    # the end-to-end total.
+    start = time.perf_counter()
+    timings = {}
+    remaining = {}
+    cleansed = {}
+    loaded = set()
+    for _, table, _ in sources:
+        remaining[table] = remaining.get(table, 0) + 1
+        cleansed[table] = []
+    tables = list(remaining)
+
+    sink = get_reject_sink()
+    recorder = get_recorder()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as processes, \
+            ThreadPoolExecutor(max_workers=max_workers) as threads:
+        pending = {
+            processes.submit(
+                cleanse_task, read_fn, filepath, cleanse_fn, sink.run_id,
+                recorder is not None, recorder is not None and recorder.trace_memory
+            ): ("cleanse", table, filepath)
+            for filepath, table, cleanse_fn in sources
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, table, filepath = pending.pop(future)
+                if stage == "cleanse":
+                    df, elapsed, rejects, records = future.result()
+                    sink.extend(rejects)
+                    if recorder is not None:
+                        recorder.extend(records)
+                    cleansed[table].append((str(filepath), df))
+                    remaining[table] -= 1
+                    timings[f"cleanse:{table}"] = timings.get(f"cleanse:{table}", 0.0) + elapsed
+                else:
+                    timings[f"load:{table}"] = future.result()
+                    loaded.add(table)
+
+            for table in tables:
+                ready = (
+                    remaining[table] == 0
+                    and cleansed[table]
+                    and all(dep in loaded for dep in LOAD_DEPENDENCIES[table] if dep in tables)
+                )
+                if ready:
+                    names, frames = zip(*sorted(cleansed[table], key=lambda item: item[0]))
+                    cleansed[table] = []
+                    df = frames[0] if len(frames) == 1 else concat_files(list(frames), table, list(names))
+                    future = threads.submit(load_task, table, df, batch_size)
+                    pending[future] = ("load", table, None)
+
+    refresh_start = time.perf_counter()
+    refresh_metric_views(tables)
+    timings["refresh_views"] = time.perf_counter() - refresh_start
+    timings["total"] = time.perf_counter() - start
+
+    for stage, elapsed in timings.items():
+        print(f"{stage:<20} {elapsed:8.2f}s")
+    return timings
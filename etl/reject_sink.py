@@ -0,0 +1,199 @@
+import atexit
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from etl.data_upload import copy_rows, pooled_connection
+
+
+REJECTS_DIR = "logs/rejects"
+
+# Buffered rejected rows that trigger a flush
+FLUSH_ROWS = 100000
+
+# Run directories (and runs in summary.csv) kept under REJECTS_DIR; older
+# ones are deleted on close
+KEEP_RUNS = 30
+
+SUMMARY_FILE = "summary.csv"
+
+REJECT_COLUMNS = ["run_id", "dataset", "source_file", "error_reason", "row_data"]
+
+
+def new_run_id():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+class RejectSink:
+    # Collects rejected rows in memory and writes them in bulk, tagged with
+    # the run and source file: to one gzipped CSV per dataset under
+    # logs/rejects/run_id=<run>/, or to the rejected_rows table with COPY.
+    # Each flush also appends per-run/dataset/reason counts to summary.csv.
+
+    def __init__(self, run_id=None, root=REJECTS_DIR, to_table=False,
+                 flush_rows=FLUSH_ROWS, keep_runs=KEEP_RUNS):
+        self.run_id = run_id or new_run_id()
+        self.root = root
+        self.to_table = to_table
+        self.flush_rows = flush_rows
+        self.keep_runs = keep_runs
+        self.source_file = None
+        self.buffer = []
+        self.buffered_rows = 0
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def add(self, dataset, rows, source_file=None):
+        if rows.empty:
+            return
+        rows = rows.assign(
+            run_id=self.run_id,
+            dataset=dataset,
+            source_file=os.path.basename(source_file or self.source_file or "")
+        )
+        self.extend([rows])
+
+    def extend(self, frames):
+        # Also used to take over the rows buffered by a worker process
+        with self.lock:
+            for rows in frames:
+                self.buffer.append(rows)
+                self.buffered_rows += len(rows)
+                for (dataset, reason), n in rows.groupby(["dataset", "error_reason"]).size().items():
+                    self.counts[(dataset, reason)] = self.counts.get((dataset, reason), 0) + n
+            should_flush = self.flush_rows is not None and self.buffered_rows >= self.flush_rows
+        if should_flush:
+            self.flush()
+
+    def drain(self):
+        with self.lock:
+            frames, self.buffer, self.buffered_rows = self.buffer, [], 0
+        return frames
+
+    def flush(self):
+        frames = self.drain()
+        if not frames:
+            return
+        by_dataset = {}
+        for rows in frames:
+            by_dataset.setdefault(rows["dataset"].iloc[0], []).append(rows)
+
+        run_dir = os.path.join(self.root, f"run_id={self.run_id}")
+        os.makedirs(run_dir, exist_ok=True)
+        summary = []
+        for dataset, dataset_frames in by_dataset.items():
+            rows = pd.concat(dataset_frames, ignore_index=True)
+            if self.to_table:
+                self._copy_to_table(rows)
+            else:
+                # Appending another gzip member keeps the file readable as one CSV
+                path = os.path.join(run_dir, f"{dataset}.csv.gz")
+                rows.to_csv(path, mode="a", header=not os.path.exists(path), index=False, compression="gzip")
+            summary.append(rows.groupby(["run_id", "dataset", "error_reason"]).size().rename("rows").reset_index())
+
+        summary = pd.concat(summary, ignore_index=True).assign(flushed_at=datetime.now().isoformat(timespec="seconds"))
+        summary_path = os.path.join(self.root, SUMMARY_FILE)
+        summary.to_csv(summary_path, mode="a", header=not os.path.exists(summary_path), index=False)
+
+    def _copy_to_table(self, rows):
+        # The dataset's own columns go into row_data as one JSON object per row
+        data_columns = [col for col in rows.columns if col not in REJECT_COLUMNS]
+        row_data = rows[data_columns].to_json(orient="records", lines=True, date_format="iso").splitlines()
+        frame = rows[["run_id", "dataset", "source_file", "error_reason"]].assign(row_data=row_data)
+        with pooled_connection() as conn:
+            copy_rows(conn, frame, "rejected_rows", columns=REJECT_COLUMNS)
+            conn.commit()
+
+    def close(self):
+        self.flush()
+        self.rotate()
+
+    def rotate(self):
+        if not os.path.isdir(self.root):
+            return
+        runs = sorted(
+            (entry for entry in os.scandir(self.root) if entry.is_dir() and entry.name.startswith("run_id=")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in runs[:max(len(runs) - self.keep_runs, 0)]:
+            shutil.rmtree(entry.path)
+
+        # summary.csv is appended in run order: keep the last keep_runs runs
+        summary_path = os.path.join(self.root, SUMMARY_FILE)
+        if not os.path.exists(summary_path):
+            return
+        summary = pd.read_csv(summary_path)
+        run_ids = summary["run_id"].drop_duplicates()
+        if len(run_ids) > self.keep_runs:
+            tmp_path = f"{summary_path}.tmp"
+            summary[summary["run_id"].isin(run_ids.iloc[-self.keep_runs:])].to_csv(tmp_path, index=False)
+            os.replace(tmp_path, summary_path)
+
+
+_sink = None
+
+
+def get_reject_sink():
+    # The sink of this process, closed when it exits. A forked worker gets a
+    # fresh one for the same run and root rather than a copy of the parent's
+    # buffer, which the parent writes itself.
+    global _sink
+    if _sink is None:
+        _sink = RejectSink()
+        atexit.register(_sink.close)
+    elif _sink.pid != os.getpid():
+        _sink = RejectSink(
+            run_id=_sink.run_id, root=_sink.root, to_table=_sink.to_table,
+            flush_rows=_sink.flush_rows, keep_runs=_sink.keep_runs
+        )
+        atexit.register(_sink.close)
+    return _sink
+
+
+def flush_worker_rejects():
+    # atexit handlers don't run when a multiprocessing worker exits, so a
+    # worker writes its rejects as it goes. A sink with flush_rows=None is
+    # left alone: its owner drains it (cleanse_task hands the rows back to
+    # the parent).
+    if multiprocessing.parent_process() is None:
+        return
+    sink = get_reject_sink()
+    if sink.flush_rows is not None:
+        sink.flush()
+
+
+def set_reject_sink(sink):
+    global _sink
+    _sink = sink
+    return sink
+
+
+def reject_volumes(root=REJECTS_DIR, from_table=False):
+    # Rejected row counts per run, dataset and reason
+    if from_table:
+        with pooled_connection() as conn:
+            return pd.read_sql(
+                """
+                SELECT run_id, dataset, error_reason, COUNT(*) AS rows
+                FROM rejected_rows
+                GROUP BY run_id, dataset, error_reason
+                ORDER BY run_id, dataset, rows DESC
+                """,
+                conn
+            )
+
+    path = os.path.join(root, SUMMARY_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["run_id", "dataset", "error_reason", "rows"])
+    summary = pd.read_csv(path)
+    return (
+        summary.groupby(["run_id", "dataset", "error_reason"], as_index=False)["rows"].sum()
+        .sort_values(["run_id", "dataset", "rows"], ascending=[True, True, False])
+        .reset_index(drop=True)
+    )
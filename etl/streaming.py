@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl.data_upload import (
+    BATCH_SIZE, PRIMARY_KEYS, copy_rows, upsert_rows, ensure_partitions,
+    frame_max_date, record_watermark, file_hash, pooled_connection, bump_data_version,
+    refresh_staff_trends, trend_weeks
+)
+from etl.instrumentation import stage
+from etl.reject_sink import get_reject_sink
+from etl.trends import TREND_SOURCES
+
+
+# Rows per chunk read from the source file
+CHUNK_SIZE = 100000
+
+# Whole-file uniqueness checks on cleansed rows, besides the primary key
+UNIQUE_KEYS = {
+    "census": ["unit", "date"],
+}
+
+
+class KeySet:
+    # Keys seen across chunks, stored as a sorted array of 64-bit hashes
+    # (8 bytes per key) instead of the keys themselves. A hash collision can
+    # only cause a false duplicate error, never a missed duplicate.
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype="uint64")
+
+    def add(self, keys):
+        # Returns a mask of keys already seen in an earlier chunk or earlier
+        # in this one, then adds the chunk's keys to the set
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        seen = pd.Series(hashes).duplicated().to_numpy()
+        if len(self.hashes):
+            pos = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+            seen = seen | (self.hashes[pos] == hashes)
+        # Both halves are sorted, so the stable (merge) sort is linear here
+        self.hashes = np.sort(np.concatenate([self.hashes, np.unique(hashes)]), kind="stable")
+        return seen
+
+
+def stream_file(filepath, table, cleanse_fn, chunksize=CHUNK_SIZE, incremental=False,
+                max_invalid_ratio=0.2, batch_size=BATCH_SIZE):
+    # Read, cleanse and load a file chunk by chunk on one connection, so memory
+    # is bounded by the chunk size. Everything is loaded in one transaction:
+    # a whole-file check failing on a later chunk rolls back the earlier ones.
+    pk = PRIMARY_KEYS[table]
+    pk_seen = KeySet()
+    unique_key = UNIQUE_KEYS.get(table)
+    unique_seen = KeySet()
+    total_rows = loaded_rows = missing_rows = 0
+    max_date = None
+    weeks = set()
+
+    get_reject_sink().source_file = filepath
+
+    with stage("stream", table=table, file=os.path.basename(filepath)) as s, pooled_connection() as conn:
+        # Every column as str so a chunk that happens to be all-NaN in a text
+        # column keeps the same dtype; the cleansers convert the rest
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype=str):
+            total_rows += len(chunk)
+            if pk in chunk.columns and pk_seen.add(chunk[pk]).any():
+                raise ValueError(f"Duplicate {pk} detected")
+
+            # The per-chunk ratio check is off; the ratio is checked for the
+            # whole file below from the rows each chunk dropped
+            clean = cleanse_fn(chunk, max_invalid_ratio=None)
+            missing_rows += clean.attrs.get("rows_missing_fields", 0)
+            if len(clean) == 0:
+                continue
+            if unique_key and unique_seen.add(clean[unique_key]).any():
+                raise ValueError(f"Found duplicate {'-'.join(unique_key)} combinations")
+
+            with stage("load", table=table, mode="upsert" if incremental else "copy") as load:
+                ensure_partitions(conn, clean, table)
+                if incremental:
+                    upsert_rows(conn, clean, table, batch_size=batch_size)
+                else:
+                    copy_rows(conn, clean, table, batch_size=batch_size)
+                load.rows_in = load.rows_out = len(clean)
+            loaded_rows += len(clean)
+            chunk_max = frame_max_date(clean, table)
+            if chunk_max is not None and (max_date is None or chunk_max > max_date):
+                max_date = chunk_max
+            if table in TREND_SOURCES and weeks is not None:
+                chunk_weeks = trend_weeks(clean, table)
+                weeks = None if chunk_weeks is None else weeks | set(chunk_weeks)
+
+        if total_rows == 0:
+            raise ValueError("Input dataframe is empty.")
+        if max_invalid_ratio is not None and missing_rows / total_rows > max_invalid_ratio:
+            raise ValueError(f"More than {max_invalid_ratio:.0%} rows invalid. Failing job.")
+        if incremental:
+            record_watermark(conn, table, filepath, file_hash(filepath), max_date, loaded_rows)
+        bump_data_version(conn, table)
+        if table in TREND_SOURCES:
+            refresh_staff_trends(conn, None if weeks is None else sorted(weeks))
+        conn.commit()
+        s.rows_in = total_rows
+        s.rows_out = loaded_rows
+        s.rows_rejected = total_rows - loaded_rows
+
+    print(f"Streamed {total_rows} rows from {filepath}: {loaded_rows} loaded into {table}.")
+    return loaded_rows
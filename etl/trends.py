@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+# Rolling windows, in weeks, of the per-staff trend features
+WINDOWS = (2, 4, 8)
+
+TRENDS_TABLE = "staff_week_trends"
+
+# Features computed for every window; each also gets a week-over-week delta
+TREND_FEATURES = ["overtime_pct", "capacity_pct", "sick_hours", "consecutive_days"]
+
+TREND_COLUMNS = ["staff_id", "week_start"] + [
+    f"{feature}_{window}w{suffix}"
+    for window in WINDOWS
+    for feature in TREND_FEATURES
+    for suffix in ("", "_delta")
+]
+
+# Loaded tables that feed the trends
+TREND_SOURCES = ("staff", "shifts", "timekeeping")
+
+# Source rows for the weeks from %(start)s to %(end)s (everything when NULL).
+# Only scheduled shifts count as days worked, as in get_total_days_worked.
+STAFF_QUERY = "SELECT staff_id, max_hours_per_week FROM staff"
+
+TIMEKEEPING_QUERY = """
+    SELECT staff_id, week_start, hours_worked, overtime_hours, sick_hours
+    FROM timekeeping
+    WHERE (%(start)s IS NULL OR week_start >= %(start)s)
+        AND (%(end)s IS NULL OR week_start <= %(end)s)
+"""
+
+SHIFT_DAYS_QUERY = """
+    SELECT DISTINCT staff_id, shift_date
+    FROM shifts
+    WHERE status = 'scheduled'
+        AND (%(start)s IS NULL OR shift_date >= %(start)s)
+        AND (%(end)s IS NULL OR shift_date < %(end)s::date + 7)
+"""
+
+
+def week_of(dates):
+    dates = pd.to_datetime(dates)
+    return (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+
+
+def affected_weeks(weeks, windows=WINDOWS):
+    # Weeks whose windows or deltas include any of weeks: each week itself
+    # and the max(windows) weeks after it (the last one for its delta)
+    weeks = week_of(pd.Series(list(weeks))).drop_duplicates()
+    offsets = pd.to_timedelta(7 * np.arange(max(windows) + 1), unit="D")
+    return pd.DatetimeIndex(sorted({week + offset for week in weeks for offset in offsets}))
+
+
+def source_range(weeks, windows=WINDOWS):
+    # (start, end) week of the source rows needed to compute weeks: the
+    # longest window before the first one, plus a week for its delta
+    weeks = pd.DatetimeIndex(weeks)
+    return (weeks.min() - pd.Timedelta(weeks=max(windows)), weeks.max())
+
+
+def weekly_activity(staff, timekeeping, shift_days):
+    # One row per staff-week: hours, overtime and sick hours from
+    # timekeeping, the contract from staff, and days_mask, the days with a
+    # scheduled shift as bits (bit 0 = Monday)
+    hours = (
+        timekeeping.assign(week_start=week_of(timekeeping["week_start"]))
+        .groupby(["staff_id", "week_start"], as_index=False)[["hours_worked", "overtime_hours", "sick_hours"]]
+        .sum()
+    )
+    dates = pd.to_datetime(shift_days["shift_date"])
+    days = (
+        pd.DataFrame({
+            "staff_id": shift_days["staff_id"],
+            "week_start": week_of(dates),
+            "day_bit": np.left_shift(1, dates.dt.weekday.to_numpy()),
+        })
+        .drop_duplicates()
+        .groupby(["staff_id", "week_start"], as_index=False)["day_bit"].sum()
+        .rename(columns={"day_bit": "days_mask"})
+    )
+    df = hours.merge(days, on=["staff_id", "week_start"], how="outer")
+    df = df.merge(staff[["staff_id", "max_hours_per_week"]], on="staff_id", how="left")
+    df[["hours_worked", "overtime_hours", "sick_hours"]] = df[["hours_worked", "overtime_hours", "sick_hours"]].fillna(0)
+    df["days_mask"] = df["days_mask"].fillna(0).astype("int64")
+    return df
+
+
+def _window_sum(grid, window):
+    # Sum over the window weeks ending at each column, from one cumsum
+    csum = np.cumsum(grid, axis=1)
+    out = csum.copy()
+    out[:, window:] -= csum[:, :-window]
+    return out
+
+
+def _longest_run(bits):
+    # Longest run of consecutive 1 bits of each int64: x & (x << 1) shortens
+    # every run by one, so the run length is the number of steps to zero
+    bits = bits.copy()
+    length = np.zeros(bits.shape, dtype="int64")
+    while bits.any():
+        length += bits != 0
+        bits &= bits << 1
+    return length
+
+
+def rolling_trends(weekly, weeks=None, windows=WINDOWS):
+    # Rolling features per staff-week over a dense staff x week grid (weeks
+    # without rows count as nothing worked):
+    #   overtime_pct_Nw      overtime / hours worked in the window, %
+    #   capacity_pct_Nw      hours worked / (contract hours x N), %
+    #   sick_hours_Nw        sick hours in the window
+    #   consecutive_days_Nw  longest streak of days with a scheduled shift
+    # each with a _delta against the previous week. weeks limits the output
+    # to those weeks; weekly must then also cover the source_range rows.
+    # Only staff-weeks with activity in the longest window are returned.
+    if weekly.empty:
+        return pd.DataFrame(columns=TREND_COLUMNS)
+    staff_ids = np.sort(weekly["staff_id"].unique())
+    all_weeks = pd.date_range(weekly["week_start"].min(), weekly["week_start"].max(), freq="7D")
+    row = np.searchsorted(staff_ids, weekly["staff_id"].to_numpy())
+    col = ((weekly["week_start"] - all_weeks[0]).dt.days // 7).to_numpy()
+
+    def grid(column, dtype="float64"):
+        out = np.zeros((len(staff_ids), len(all_weeks)), dtype=dtype)
+        out[row, col] = weekly[column].to_numpy(dtype=dtype)
+        return out
+
+    hours, overtime, sick, masks = grid("hours_worked"), grid("overtime_hours"), grid("sick_hours"), grid("days_mask", "int64")
+    contract = weekly.groupby("staff_id")["max_hours_per_week"].max().reindex(staff_ids).to_numpy(dtype="float64")
+    active = (hours > 0) | (masks > 0)
+
+    features = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for window in windows:
+            hours_sum = _window_sum(hours, window)
+            features[f"overtime_pct_{window}w"] = np.where(hours_sum > 0, _window_sum(overtime, window) / hours_sum * 100, np.nan)
+            features[f"capacity_pct_{window}w"] = hours_sum / (contract[:, None] * window) * 100
+            features[f"sick_hours_{window}w"] = _window_sum(sick, window)
+            # Each week's 7 day bits above the previous week's, so a streak
+            # carries on across the Sunday/Monday boundary
+            combined = np.zeros_like(masks)
+            for age in range(window):
+                shifted = np.zeros_like(masks)
+                shifted[:, age:] = masks[:, :masks.shape[1] - age]
+                combined |= shifted << (7 * (window - 1 - age))
+            features[f"consecutive_days_{window}w"] = _longest_run(combined)
+    # No (or a zero) contract leaves capacity unknown rather than infinite
+    for window in windows:
+        capacity = features[f"capacity_pct_{window}w"]
+        capacity[~np.isfinite(capacity)] = np.nan
+
+    keep = _window_sum(active.astype("int64"), max(windows)) > 0
+    if weeks is not None:
+        keep &= np.isin(all_weeks.to_numpy(), pd.DatetimeIndex(weeks).to_numpy())[None, :]
+    rows, cols = np.nonzero(keep)
+    out = {"staff_id": staff_ids[rows], "week_start": all_weeks[cols]}
+    for window in windows:
+        for feature in TREND_FEATURES:
+            name = f"{feature}_{window}w"
+            values = features[name].astype("float64")
+            delta = np.full(values.shape, np.nan)
+            delta[:, 1:] = values[:, 1:] - values[:, :-1]
+            out[name] = values[rows, cols]
+            out[f"{name}_delta"] = delta[rows, cols]
+    df = pd.DataFrame(out)
+    for window in windows:
+        for feature in ("sick_hours", "consecutive_days"):
+            df[f"{feature}_{window}w"] = df[f"{feature}_{window}w"].astype("int64")
+    return df[TREND_COLUMNS]
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+import etl.compact as compact
+from etl.instrumentation import stage
+from etl.reject_sink import flush_worker_rejects, get_reject_sink
+
+
+# A dataset spec declares every check for one feed:
+#   name              dataset name the rejected rows are logged under
+#   required_columns  columns that must be present
+#   key               primary key column, must be unique in the raw file
+#   conversions       {column: fn(series) -> series}, applied in place
+#   reject_rules      [{"reason", "mask", "ratio_check"?}]: rows where
+#                     mask(df) is True are dropped and logged; a ratio_check
+#                     rule fails the job when more than max_invalid_ratio of
+#                     the rows break it
+#   fatal_checks      [(message, mask)] evaluated on the kept rows; any True
+#                     fails the job. "{rows}" in message is filled with them.
+# The kept rows are returned in the compact layout of compact.py.
+
+
+def check_columns(df, spec):
+    if len(df) == 0:
+        raise ValueError("Input dataframe is empty.")
+
+    missing_cols = [col for col in spec["required_columns"] if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    key = spec.get("key")
+    if key and df[key].duplicated().any():
+        raise ValueError(f"Duplicate {key} detected")
+
+
+def reject_reasons(masks, reasons):
+    # All failure reasons of each rejected row, "; "-joined, built one rule
+    # at a time over the rejected rows only
+    combined = pd.Series("", index=masks.index[masks.any(axis=1)], dtype=object)
+    for rule_mask, reason in zip(masks.loc[combined.index].T.to_numpy(), reasons):
+        combined[rule_mask] += reason + "; "
+    return combined.str[:-2]
+
+
+def apply_rules(df, spec, max_invalid_ratio=0.2):
+    # Column/key checks, conversions, then every reject rule evaluated into
+    # one (rows x rules) mask so the frame is filtered exactly once. Each
+    # rule and fatal check is its own instrumentation stage. In a worker
+    # process the rejects are written before returning, even on failure.
+    try:
+        with stage("cleanse", dataset=spec["name"]) as s:
+            rows_in = len(df)
+            df = _apply_rules(df, spec, max_invalid_ratio)
+            s.rows_in = rows_in
+            s.rows_out = len(df)
+            s.rows_rejected = rows_in - len(df)
+    finally:
+        flush_worker_rejects()
+    return df
+
+
+def _apply_rules(df, spec, max_invalid_ratio):
+    check_columns(df, spec)
+
+    with stage("convert", dataset=spec["name"]) as s:
+        for col, convert in spec.get("conversions", {}).items():
+            df[col] = convert(df[col])
+        s.rows_in = s.rows_out = len(df)
+
+    rules = spec.get("reject_rules", [])
+    columns = {}
+    for i, rule in enumerate(rules):
+        with stage("check", dataset=spec["name"], rule=rule["reason"]) as s:
+            columns[i] = rule["mask"](df).fillna(False).to_numpy(dtype=bool)
+            s.rows_in = len(df)
+            s.rows_rejected = int(columns[i].sum())
+    masks = pd.DataFrame(columns, index=df.index)
+    if rules:
+        rejected_mask = masks.any(axis=1).to_numpy()
+    else:
+        rejected_mask = np.zeros(len(df), dtype=bool)
+
+    missing_fields = 0
+    for i, rule in enumerate(rules):
+        if not rule.get("ratio_check"):
+            continue
+        failed = int(masks[i].sum())
+        missing_fields += failed
+        if max_invalid_ratio is not None and failed / len(df) > max_invalid_ratio:
+            raise ValueError(f"More than {max_invalid_ratio:.0%} rows invalid. Failing job.")
+        if failed > 0:
+            print(f"Dropping {failed} rows due to NaN values.")
+
+    if rejected_mask.any():
+        rejected = df[rejected_mask].assign(
+            error_reason=reject_reasons(masks, [rule["reason"] for rule in rules])
+        )
+        get_reject_sink().add(spec["name"], rejected)
+        df = df[~rejected_mask].reset_index(drop=True)
+
+    for message, mask in spec.get("fatal_checks", []):
+        with stage("check", dataset=spec["name"], rule=message.split(":")[0].rstrip(".")) as s:
+            failed = mask(df)
+            s.rows_in = len(df)
+            s.rows_rejected = int(failed.sum())
+        if failed.any():
+            raise ValueError(message.format(rows=df[failed]) if "{rows}" in message else message)
+
+    if compact.COMPACT_FRAMES:
+        with stage("compact", dataset=spec["name"]) as s:
+            df = compact.compact(df)
+            s.rows_in = s.rows_out = len(df)
+
+    df.attrs["rows_missing_fields"] = missing_fields
+    return df
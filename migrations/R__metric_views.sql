@@ -0,0 +1,121 @@
+-- Materialized views backing the queries in analytics/metrics.py.
+-- Each view has a unique index so it can be refreshed CONCURRENTLY.
+-- Repeatable: every run drops and recreates the views, so a changed
+-- definition is applied to databases that already have them. etl/migrate.py
+-- runs the file in one transaction, so readers never see a view missing.
+
+DROP MATERIALIZED VIEW IF EXISTS mv_overtime_by_staff;
+CREATE MATERIALIZED VIEW mv_overtime_by_staff AS
+SELECT
+    staff_id,
+    SUM(hours_worked) AS total_hours_worked,
+    SUM(overtime_hours) AS total_overtime_hours,
+    ROUND(
+        (SUM(overtime_hours)::numeric / NULLIF(SUM(hours_worked), 0)) * 100,
+        2
+    ) AS overtime_percentage
+FROM timekeeping
+GROUP BY staff_id;
+
+CREATE UNIQUE INDEX mv_overtime_by_staff_key
+    ON mv_overtime_by_staff (staff_id);
+
+
+DROP MATERIALIZED VIEW IF EXISTS mv_patient_to_staff_ratio;
+CREATE MATERIALIZED VIEW mv_patient_to_staff_ratio AS
+SELECT
+    c.unit,
+    c.date AS shift_date,
+    c.total_patients,
+    COUNT(DISTINCT s.staff_id) AS staff_count,
+    ROUND(
+        c.total_patients::numeric /
+        NULLIF(COUNT(DISTINCT s.staff_id), 0),
+        2
+    ) AS patient_to_staff_ratio
+FROM census c
+LEFT JOIN shifts s
+    ON c.unit = s.unit
+    AND c.date = s.shift_date
+    AND s.status = 'scheduled'
+GROUP BY
+    c.unit,
+    c.date,
+    c.total_patients;
+
+CREATE UNIQUE INDEX mv_patient_to_staff_ratio_key
+    ON mv_patient_to_staff_ratio (unit, shift_date, total_patients);
+
+
+DROP MATERIALIZED VIEW IF EXISTS mv_weekly_capacity_utilization;
+CREATE MATERIALIZED VIEW mv_weekly_capacity_utilization AS
+SELECT
+    t.staff_id,
+    s.first_name,
+    s.last_name,
+    t.week_start,
+    SUM(t.hours_worked) AS total_hours_worked,
+    s.max_hours_per_week,
+    ROUND(
+        (SUM(t.hours_worked)::numeric / NULLIF(s.max_hours_per_week, 0)) * 100,
+        2
+    ) AS percent_of_allowed_capacity
+FROM timekeeping t
+JOIN staff s
+    ON t.staff_id = s.staff_id
+GROUP BY
+    t.staff_id,
+    s.first_name,
+    s.last_name,
+    t.week_start,
+    s.max_hours_per_week;
+
+CREATE UNIQUE INDEX mv_weekly_capacity_utilization_key
+    ON mv_weekly_capacity_utilization (staff_id, week_start);
+
+
+DROP MATERIALIZED VIEW IF EXISTS mv_cancellation_rate_by_unit;
+CREATE MATERIALIZED VIEW mv_cancellation_rate_by_unit AS
+SELECT
+    unit,
+    COUNT(*) FILTER (WHERE status = 'Cancelled') AS cancelled_shifts,
+    COUNT(*) AS total_shifts,
+    ROUND(
+        COUNT(*) FILTER (WHERE status = 'Cancelled')::numeric
+        / NULLIF(COUNT(*), 0) * 100,
+        2
+    ) AS cancellation_rate_percent
+FROM shifts
+GROUP BY unit;
+
+CREATE UNIQUE INDEX mv_cancellation_rate_by_unit_key
+    ON mv_cancellation_rate_by_unit (unit);
+
+
+DROP MATERIALIZED VIEW IF EXISTS mv_average_shift_duration;
+CREATE MATERIALIZED VIEW mv_average_shift_duration AS
+SELECT
+    staff_id,
+    ROUND(
+        AVG(EXTRACT(EPOCH FROM (shift_end - shift_start)) / 3600),
+        2
+    ) AS avg_shift_duration_hours
+FROM shifts
+WHERE shift_end IS NOT NULL
+GROUP BY staff_id;
+
+CREATE UNIQUE INDEX mv_average_shift_duration_key
+    ON mv_average_shift_duration (staff_id);
+
+
+DROP MATERIALIZED VIEW IF EXISTS mv_total_days_worked;
+CREATE MATERIALIZED VIEW mv_total_days_worked AS
+SELECT
+    staff_id,
+    COUNT(DISTINCT shift_date) AS total_days_worked
+FROM shifts
+WHERE status = 'scheduled'
+GROUP BY staff_id;
+
+CREATE UNIQUE INDEX mv_total_days_worked_key
+    ON mv_total_days_worked (staff_id);
@@ -41,3 +41,64 @@ CREATE TABLE IF NOT EXISTS timekeeping (
     sick_hours INT,
     FOREIGN KEY (staff_id) REFERENCES staff(staff_id)
 );
+
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    source VARCHAR(20),
+    file_name VARCHAR(255),
+    file_hash CHAR(64),
+    max_date DATE,
+    row_count INT,
+    loaded_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (source, file_hash)
+);
+
+CREATE TABLE IF NOT EXISTS rejected_rows (
+    run_id VARCHAR(40),
+    dataset VARCHAR(20),
+    source_file VARCHAR(255),
+    error_reason TEXT,
+    row_data JSONB,
+    rejected_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS rejected_rows_run_idx ON rejected_rows (run_id, dataset);
+
+-- Bumped by the loaders in the same transaction as the rows they load;
+-- analytics/cache.py keys cached metrics on these
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name VARCHAR(20) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Rolling 2/4/8-week trend features per staff-week, maintained by
+-- data_upload.refresh_staff_trends as shifts and timekeeping are loaded
+CREATE TABLE IF NOT EXISTS staff_week_trends (
+    staff_id VARCHAR(20),
+    week_start DATE,
+    overtime_pct_2w DOUBLE PRECISION,
+    overtime_pct_2w_delta DOUBLE PRECISION,
+    capacity_pct_2w DOUBLE PRECISION,
+    capacity_pct_2w_delta DOUBLE PRECISION,
+    sick_hours_2w INT,
+    sick_hours_2w_delta DOUBLE PRECISION,
+    consecutive_days_2w INT,
+    consecutive_days_2w_delta DOUBLE PRECISION,
+    overtime_pct_4w DOUBLE PRECISION,
+    overtime_pct_4w_delta DOUBLE PRECISION,
+    capacity_pct_4w DOUBLE PRECISION,
+    capacity_pct_4w_delta DOUBLE PRECISION,
+    sick_hours_4w INT,
+    sick_hours_4w_delta DOUBLE PRECISION,
+    consecutive_days_4w INT,
+    consecutive_days_4w_delta DOUBLE PRECISION,
+    overtime_pct_8w DOUBLE PRECISION,
+    overtime_pct_8w_delta DOUBLE PRECISION,
+    capacity_pct_8w DOUBLE PRECISION,
+    capacity_pct_8w_delta DOUBLE PRECISION,
+    sick_hours_8w INT,
+    sick_hours_8w_delta DOUBLE PRECISION,
+    consecutive_days_8w INT,
+    consecutive_days_8w_delta DOUBLE PRECISION,
+    PRIMARY KEY (staff_id, week_start)
+);
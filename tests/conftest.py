@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+from etl.reject_sink import RejectSink, set_reject_sink
+
+
+@pytest.fixture(autouse=True)
+def reject_sink():
+    # Rejected rows stay in memory instead of going to logs/rejects
+    sink = set_reject_sink(RejectSink(flush_rows=None))
+    yield sink
+    set_reject_sink(None)
+
+
+@pytest.fixture(scope="session")
+def frames():
+    # The files in data/ through the cleansers
+    from benchmarks.backend_parity import cleansed_frames
+    set_reject_sink(RejectSink(flush_rows=None))
+    return cleansed_frames()
+
+
+@pytest.fixture(scope="session")
+def duckdb_backend(frames):
+    from analytics.backends import DuckDBBackend
+    backend = DuckDBBackend.from_frames(frames)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def use_backend():
+    # Sets the metrics backend for one test, back to the default after
+    from analytics.backends import set_backend
+    yield set_backend
+    set_backend(None)
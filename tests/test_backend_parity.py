@@ -0,0 +1,56 @@
+import os
+
+import psycopg2.extensions
+import pytest
+
+import analytics.metrics as metrics
+import etl.data_upload as data_upload
+import etl.landing_zone as landing_zone
+from analytics.backends import DuckDBBackend, PostgresBackend
+
+# libpq DSN of a Postgres database loaded with the data/ files, e.g.
+# "host=localhost port=5433 dbname=staffing_db user=staffing_user password=..."
+POSTGRES_DSN = os.environ.get("STAFFING_TEST_DSN")
+
+
+@pytest.fixture(scope="module")
+def landing_backend(frames, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("landing"))
+    for table, df in frames.items():
+        landing_zone.write_landing(df, table, root=root)
+    backend = DuckDBBackend.from_landing(root)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def postgres_backend(monkeypatch):
+    if not POSTGRES_DSN:
+        pytest.skip("STAFFING_TEST_DSN is not set")
+    config = psycopg2.extensions.parse_dsn(POSTGRES_DSN)
+    config["database"] = config.pop("dbname", data_upload.DB_CONFIG["database"])
+    data_upload.close_pool()
+    monkeypatch.setattr(data_upload, "DB_CONFIG", config)
+    yield PostgresBackend()
+    data_upload.close_pool()
+
+
+def test_frames_and_landing_zone_match(duckdb_backend, landing_backend):
+    diffs = metrics.check_backend_parity(landing_backend, duckdb_backend)
+    assert set(diffs) == {name for name, _, _ in metrics.PARITY_CASES}
+
+
+def test_duckdb_matches_postgres(duckdb_backend, postgres_backend):
+    diffs = metrics.check_backend_parity(duckdb_backend, postgres_backend)
+    assert set(diffs) == {name for name, _, _ in metrics.PARITY_CASES}
+
+
+def test_parity_check_reports_differences(frames, duckdb_backend):
+    # A backend missing some shifts must not pass
+    changed = dict(frames, shifts=frames["shifts"].iloc[5:])
+    backend = DuckDBBackend.from_frames(changed)
+    try:
+        with pytest.raises(ValueError, match="differs from"):
+            metrics.check_backend_parity(backend, duckdb_backend)
+    finally:
+        backend.close()
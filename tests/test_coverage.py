@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.coverage import coverage_timeline, day_grid, patient_to_staff_by_period, sweep_headcount
+
+
+def make_shifts(rows):
+    # rows: (unit, start, end)
+    df = pd.DataFrame(rows, columns=["unit", "shift_start", "shift_end"])
+    return df.assign(shift_start=pd.to_datetime(df["shift_start"]), shift_end=pd.to_datetime(df["shift_end"]))
+
+
+def brute_force(shifts, grid):
+    # On duty at t: shift_start <= t < shift_end, in the same unit
+    return np.array([
+        int(((shifts["unit"] == unit) & (shifts["shift_start"] <= time) & (time < shifts["shift_end"])).sum())
+        for unit, time in zip(grid["unit"], grid["time"])
+    ])
+
+
+SHIFTS = make_shifts([
+    # Handover at 19:00: one shift ends as the next starts
+    ("ICU", "2026-03-02 07:00", "2026-03-02 19:00"),
+    ("ICU", "2026-03-02 19:00", "2026-03-03 07:00"),
+    ("ICU", "2026-03-02 07:00", "2026-03-02 15:00"),
+    # Overnight into the next day, off the hour
+    ("ER", "2026-03-02 22:30", "2026-03-03 06:30"),
+    ("ER", "2026-03-03 06:00", "2026-03-03 18:00"),
+])
+
+
+@pytest.mark.parametrize("resolution", ["1h", "30min"])
+def test_headcount_matches_brute_force(resolution):
+    # NICU has census but no shifts at all
+    census = pd.DataFrame({
+        "unit": ["ICU", "ICU", "ER", "ER", "NICU"],
+        "date": pd.to_datetime(["2026-03-02", "2026-03-03", "2026-03-02", "2026-03-03", "2026-03-02"]),
+    })
+    grid = day_grid(census, resolution)
+    headcount = sweep_headcount(SHIFTS, grid)
+    np.testing.assert_array_equal(headcount, brute_force(SHIFTS, grid))
+    assert headcount[(grid["unit"] == "NICU").to_numpy()].sum() == 0
+
+
+def test_shift_boundaries():
+    timeline = coverage_timeline(SHIFTS).set_index(["unit", "time"])["staff_on_duty"]
+    # 19:00: the day shift is off and the night shift on
+    assert timeline[("ICU", pd.Timestamp("2026-03-02 18:00"))] == 1
+    assert timeline[("ICU", pd.Timestamp("2026-03-02 19:00"))] == 1
+    assert timeline[("ICU", pd.Timestamp("2026-03-02 07:00"))] == 2
+    assert timeline[("ICU", pd.Timestamp("2026-03-02 15:00"))] == 1
+    assert timeline[("ICU", pd.Timestamp("2026-03-03 07:00"))] == 0
+    # Past midnight the overnight shift is still on
+    assert timeline[("ER", pd.Timestamp("2026-03-03 00:00"))] == 1
+    assert timeline[("ER", pd.Timestamp("2026-03-03 06:00"))] == 2
+    np.testing.assert_array_equal(
+        timeline.to_numpy(), brute_force(SHIFTS, timeline.index.to_frame(index=False))
+    )
+
+
+def test_no_shifts():
+    census = pd.DataFrame({"unit": ["ICU"], "date": pd.to_datetime(["2026-03-02"]), "total_patients": [12]})
+    df = patient_to_staff_by_period(make_shifts([]), census)
+    assert len(df) == 24
+    assert (df["staff_on_duty"] == 0).all()
+    assert df["patient_to_staff_ratio"].isna().all()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.forecast import forecast_staffing_gaps, project_census
+
+
+def make_census(totals, net_flow, unit="ICU", start="2026-03-02"):
+    admissions = np.maximum(net_flow, 0) + 3
+    return pd.DataFrame({
+        "unit": unit,
+        "date": pd.date_range(start, periods=len(totals), freq="D"),
+        "total_patients": totals,
+        "admissions": admissions,
+        "discharges": admissions - np.asarray(net_flow),
+    })
+
+
+@pytest.mark.parametrize("model", ["ewm", "rolling"])
+def test_constant_census_stays_flat(model):
+    census = make_census([20] * 10, [0] * 10)
+    projection = project_census(census, horizon_days=5, model=model)
+    assert projection["date"].tolist() == list(pd.date_range("2026-03-12", periods=5, freq="D"))
+    np.testing.assert_allclose(projection["projected_patients"], 20)
+
+
+@pytest.mark.parametrize("model", ["ewm", "rolling"])
+def test_linear_census_continues_its_slope(model):
+    # Two more patients every day, in one unit; three fewer in another, down to zero
+    census = pd.concat([
+        make_census(20 + 2 * np.arange(10), [2] * 10, unit="ICU"),
+        make_census(30 - 3 * np.arange(10), [-3] * 10, unit="ER"),
+    ])
+    projection = project_census(census, horizon_days=4, model=model).set_index(["unit", "date"])
+    np.testing.assert_allclose(projection.loc["ICU", "projected_patients"], [40, 42, 44, 46])
+    np.testing.assert_allclose(projection.loc["ER", "projected_patients"], [0, 0, 0, 0])
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError, match="Unknown forecast model"):
+        project_census(make_census([20] * 3, [0] * 3), model="arima")
+
+
+def test_gaps_use_the_thinnest_step_of_the_day():
+    # 20 patients at 5 per staff member need 4 on duty: four day shifts and
+    # two night shifts leave the nights 2 short
+    census = make_census([20] * 7, [0] * 7)
+    days = pd.date_range("2026-03-09", periods=2, freq="D")
+    nights = pd.date_range("2026-03-08 19:00", periods=3, freq="D")
+    day_shifts = pd.DataFrame({
+        "unit": "ICU",
+        "shift_start": np.repeat(days + pd.Timedelta("7h"), 4),
+        "shift_end": np.repeat(days + pd.Timedelta("19h"), 4),
+    })
+    night_shifts = pd.DataFrame({
+        "unit": "ICU",
+        "shift_start": np.repeat(nights, 2),
+        "shift_end": np.repeat(nights + pd.Timedelta("12h"), 2),
+    })
+
+    gaps = forecast_staffing_gaps(census, pd.concat([day_shifts, night_shifts]), target_ratio=5.0, horizon_days=2)
+    assert gaps["date"].tolist() == list(days)
+    assert gaps["min_staff_on_duty"].tolist() == [2, 2]
+    assert gaps["staff_needed"].tolist() == [2, 2]
+    assert gaps["projected_ratio"].tolist() == [10.0, 10.0]
+
+    gaps = forecast_staffing_gaps(census, day_shifts, target_ratio={"ICU": 10.0}, horizon_days=2)
+    assert gaps["min_staff_on_duty"].tolist() == [0, 0]
+    assert gaps["staff_needed"].tolist() == [2, 2]
+    assert gaps["projected_ratio"].isna().all()
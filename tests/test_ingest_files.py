@@ -0,0 +1,24 @@
+import os
+import shutil
+
+import pytest
+
+from etl.data_cleanser import DATA_DIR, cleanse_census_data, ingest_files
+
+
+CENSUS_DIR = os.path.join(DATA_DIR, "census_data")
+
+
+def test_weekly_files_merge():
+    df, failures = ingest_files(CENSUS_DIR, "census", cleanse_census_data, max_workers=2)
+    assert not failures
+    assert df["census_id"].is_unique
+
+
+def test_key_repeated_across_files_fails_the_batch(tmp_path):
+    # The same week delivered twice: each file is fine on its own
+    first = sorted(os.listdir(CENSUS_DIR))[0]
+    shutil.copy(os.path.join(CENSUS_DIR, first), tmp_path / first)
+    shutil.copy(os.path.join(CENSUS_DIR, first), tmp_path / f"resent_{first}")
+    with pytest.raises(ValueError, match=f"Duplicate census_id across files: .* in {first}, resent_{first}"):
+        ingest_files(str(tmp_path), "census", cleanse_census_data, max_workers=2)
@@ -0,0 +1,119 @@
+import warnings
+
+import numpy as np
+import psycopg2.extensions
+import pytest
+
+import analytics.cache as cache
+import analytics.metrics as metrics
+import etl.data_upload as data_upload
+import etl.instrumentation as instrumentation
+from analytics.backends import PostgresBackend, to_duckdb
+from etl.instrumentation import Recorder, set_recorder, stage
+
+
+@pytest.mark.skipif(instrumentation.resource is None, reason="no getrusage on this platform")
+def test_peak_rss_is_per_stage():
+    # The first stage outgrows whatever the process peaked at before; the
+    # second one fits under the peak the first one left behind
+    size_mb = instrumentation._peak_rss_mb() + 32
+    recorder = set_recorder(Recorder(root=None))
+    try:
+        with stage("grow"):
+            big = np.ones(int(size_mb * 2**20) // 8)
+            del big
+        with stage("small"):
+            small = np.ones(2**20 // 8)
+            del small
+    finally:
+        set_recorder(None)
+    growth = {record["stage"]: record["peak_rss_growth_mb"] for record in recorder.records}
+    assert growth["grow"] >= 32
+    assert growth["small"] < 8
+
+
+class DuckDBCursor:
+    # Stands in for a pooled psycopg2 cursor: counts each statement like
+    # CountingCursor does, then runs it on DuckDB
+
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+
+    def execute(self, query, params=None):
+        instrumentation._count_round_trip()
+        self.cursor.execute(*to_duckdb(query, params))
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+class DuckDBConnection:
+    closed = False
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return DuckDBCursor(self.conn)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class DuckDBPool:
+    def __init__(self, minconn, maxconn, cursor_factory=None, **config):
+        self.cursor_factory = cursor_factory
+        self.conn = None
+
+    def getconn(self):
+        return DuckDBConnection(self.conn)
+
+    def putconn(self, conn, close=False):
+        pass
+
+    def closeall(self):
+        pass
+
+
+def test_metric_stage_counts_pooled_round_trips(duckdb_backend, use_backend, monkeypatch):
+    # analytics and etl share one instrumentation module: the metric stage
+    # sees the statements sent through the pool's cursors
+    pools = []
+
+    def make_pool(*args, **kwargs):
+        pool = DuckDBPool(*args, **kwargs)
+        pool.conn = duckdb_backend.conn
+        pools.append(pool)
+        return pool
+
+    data_upload.close_pool()
+    monkeypatch.setattr(data_upload, "ThreadedConnectionPool", make_pool)
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    use_backend(PostgresBackend())
+    recorder = set_recorder(Recorder(root=None))
+    try:
+        with warnings.catch_warnings():
+            # pandas only knows SQLAlchemy and sqlite3 connections
+            warnings.simplefilter("ignore", UserWarning)
+            metrics.get_total_days_worked()
+    finally:
+        set_recorder(None)
+        data_upload.close_pool()
+
+    assert metrics.stage is data_upload.stage
+    assert pools[0].cursor_factory is instrumentation.CountingCursor
+    metric = [record for record in recorder.records if record["stage"] == "metric"]
+    assert metric and metric[0]["db_round_trips"] > 0
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+import etl.data_upload as data_upload
+
+
+class ViewsConnection:
+    # Records statements with the transaction they were committed in; every
+    # view exists and is populated
+
+    closed = False
+
+    def __init__(self):
+        self.pending = []
+        self.transactions = []
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def execute(self, query, params=None):
+                conn.pending.append((" ".join(query.split()), params))
+
+            def fetchall(self):
+                return [(view, True) for view in data_upload.METRIC_VIEWS]
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+    def commit(self):
+        self.transactions.append(self.pending)
+        self.pending = []
+
+
+def test_refresh_bumps_source_versions_with_the_view(monkeypatch, capsys):
+    conn = ViewsConnection()
+
+    @contextmanager
+    def pooled_connection():
+        yield conn
+
+    monkeypatch.setattr(data_upload, "pooled_connection", pooled_connection)
+    refreshed = data_upload.refresh_metric_views(["shifts"])
+
+    assert refreshed
+    assert len(conn.transactions) == len(refreshed)
+    for view, statements in zip(refreshed, conn.transactions):
+        refreshes = [query for query, _ in statements if query.startswith("REFRESH")]
+        assert refreshes == [f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"]
+        bumped = [params[0] for query, params in statements if query.startswith("INSERT INTO data_versions")]
+        assert bumped == data_upload.METRIC_VIEWS[view]
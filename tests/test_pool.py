@@ -0,0 +1,60 @@
+import threading
+import time
+
+import etl.data_upload as data_upload
+
+
+class SlowPool:
+    # Stands in for ThreadedConnectionPool; slow to build, so concurrent
+    # first callers overlap in init
+
+    created = []
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        time.sleep(0.05)
+        self.closed = False
+        SlowPool.created.append(self)
+
+    def getconn(self):
+        return object()
+
+    def closeall(self):
+        self.closed = True
+
+
+def test_concurrent_first_callers_share_one_pool(monkeypatch):
+    monkeypatch.setattr(data_upload, "ThreadedConnectionPool", SlowPool)
+    monkeypatch.setattr(data_upload, "_pool", None)
+    monkeypatch.setattr(data_upload, "_pool_slots", None)
+    SlowPool.created = []
+
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def first_call():
+        barrier.wait()
+        pools.append(data_upload._get_pool()[0])
+
+    threads = [threading.Thread(target=first_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(SlowPool.created) == 1
+    assert all(pool is SlowPool.created[0] for pool in pools)
+
+
+def test_init_pool_keeps_a_live_pool(monkeypatch):
+    monkeypatch.setattr(data_upload, "ThreadedConnectionPool", SlowPool)
+    monkeypatch.setattr(data_upload, "_pool", None)
+    monkeypatch.setattr(data_upload, "_pool_slots", None)
+
+    pool = data_upload.init_pool()
+    assert data_upload.init_pool() is pool
+    assert not pool.closed
+
+    data_upload.close_pool()
+    assert pool.closed
+    assert data_upload.init_pool() is not pool
+    data_upload.close_pool()
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from analytics.reassignment import plan_reassignments, weekly_headroom
+
+
+STAFF = pd.DataFrame({
+    "staff_id": ["S1", "S2"],
+    "role": ["RN", "RN"],
+    "home_unit": ["ICU", "ICU"],
+    "max_hours_per_week": [40, 40],
+})
+
+NO_TIMEKEEPING = pd.DataFrame({"staff_id": [], "week_start": pd.to_datetime([]), "hours_worked": []})
+
+# S1 already has three 12-hour shifts in the week of 2026-03-09
+SHIFTS = pd.DataFrame({
+    "staff_id": ["S1", "S1", "S1"],
+    "shift_date": pd.to_datetime(["2026-03-09", "2026-03-10", "2026-03-11"]),
+    "shift_start": pd.to_datetime(["2026-03-09 07:00", "2026-03-10 07:00", "2026-03-11 07:00"]),
+    "shift_end": pd.to_datetime(["2026-03-09 19:00", "2026-03-10 19:00", "2026-03-11 19:00"]),
+    "status": ["scheduled"] * 3,
+})
+
+
+def test_headroom_counts_scheduled_shifts_in_future_weeks():
+    headroom = weekly_headroom(STAFF, NO_TIMEKEEPING, [pd.Timestamp("2026-03-09")], SHIFTS)
+    assert dict(zip(headroom["staff_id"], headroom["headroom"])) == {"S1": 4, "S2": 40}
+
+
+def test_headroom_does_not_double_count_worked_shifts():
+    timekeeping = pd.DataFrame({
+        "staff_id": ["S1"], "week_start": pd.to_datetime(["2026-03-09"]), "hours_worked": [36],
+    })
+    headroom = weekly_headroom(STAFF, timekeeping, [pd.Timestamp("2026-03-09")], SHIFTS)
+    assert headroom.set_index("staff_id").loc["S1", "headroom"] == 4
+
+
+def test_fully_scheduled_staff_are_not_planned():
+    gaps = pd.DataFrame({"unit": ["ICU"], "date": pd.to_datetime(["2026-03-13"]), "staff_needed": [2]})
+    plan, unfilled = plan_reassignments(gaps, STAFF, NO_TIMEKEEPING, SHIFTS)
+    assert plan["staff_id"].tolist() == ["S2"]
+    assert unfilled["staff_needed"].tolist() == [1]
+
+
+def test_headroom_runs_out_within_the_week():
+    # S2 has room for three 12-hour shifts (36 of 40 hours); the fourth day
+    # stays unfilled
+    gaps = pd.DataFrame({
+        "unit": ["ICU"] * 4,
+        "date": pd.date_range("2026-03-09", periods=4, freq="D"),
+        "staff_needed": [1] * 4,
+    })
+    plan, unfilled = plan_reassignments(gaps, STAFF[STAFF["staff_id"] == "S2"], NO_TIMEKEEPING)
+    assert plan["staff_id"].tolist() == ["S2"] * 3
+    assert plan["headroom_after"].tolist() == [28, 16, 4]
+    assert unfilled["date"].tolist() == [pd.Timestamp("2026-03-12")]
+
+
+def test_no_donor_staff():
+    gaps = pd.DataFrame({"unit": ["ER", "ICU"], "date": pd.to_datetime(["2026-03-13"] * 2), "staff_needed": [2, 1]})
+    # Nobody of the gap's role
+    plan, unfilled = plan_reassignments(gaps, STAFF, NO_TIMEKEEPING, role="LPN")
+    assert plan.empty
+    assert sorted(zip(unfilled["unit"], unfilled["staff_needed"])) == [("ER", 2), ("ICU", 1)]
+    # ER only takes floats from NICU
+    plan, unfilled = plan_reassignments(gaps, STAFF, NO_TIMEKEEPING, qualifying_home_units={"ER": ["NICU"]})
+    assert plan["unit"].tolist() == ["ICU"]
+    assert unfilled[["unit", "staff_needed"]].values.tolist() == [["ER", 2]]
+
+
+def test_scheduled_shifts_count_against_the_plan():
+    # Two scheduled shifts leave S1 16 hours: one more shift, and not on a
+    # day S1 is already working
+    shifts = SHIFTS.iloc[:2]
+    gaps = pd.DataFrame({
+        "unit": ["ICU"] * 3,
+        "date": pd.to_datetime(["2026-03-10", "2026-03-12", "2026-03-13"]),
+        "staff_needed": [2, 2, 2],
+    })
+    plan, unfilled = plan_reassignments(gaps, STAFF, NO_TIMEKEEPING, shifts)
+    s1 = plan[plan["staff_id"] == "S1"]
+    assert len(s1) == 1 and s1["headroom_after"].tolist() == [4]
+    assert pd.Timestamp("2026-03-10") not in s1["date"].tolist()
+    assert plan.groupby("staff_id")["headroom_after"].min().to_dict() == {"S1": 4, "S2": 4}
+    assert unfilled["staff_needed"].sum() == 6 - len(plan)
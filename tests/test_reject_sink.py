@@ -0,0 +1,52 @@
+import atexit
+import gzip
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import etl.reject_sink as reject_sink
+from etl.data_cleanser import DATA_DIR, cleanse_census_data
+from etl.reject_sink import RejectSink, get_reject_sink, set_reject_sink
+
+
+def census_with_missing(rows):
+    df = pd.read_csv(os.path.join(DATA_DIR, "census_data", "census_daily_week_01.csv"))
+    df.loc[df.index[:rows], "total_patients"] = None
+    return df
+
+
+def cleanse_rows(df):
+    return len(cleanse_census_data(df))
+
+
+def test_default_sink_is_closed_at_exit(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    set_reject_sink(None)
+    sink = get_reject_sink()
+    assert registered == [sink.close]
+
+
+def test_worker_writes_its_rejects(tmp_path):
+    # A pool worker running the cleansers directly, without cleanse_task,
+    # exits without running atexit: its rejects are written per call
+    sink = set_reject_sink(RejectSink(root=str(tmp_path)))
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+        assert executor.submit(cleanse_rows, census_with_missing(3)).result() > 0
+    assert sink.buffer == []
+    with gzip.open(tmp_path / f"run_id={sink.run_id}" / "census.csv.gz", "rt") as f:
+        rejects = pd.read_csv(f)
+    assert len(rejects) == 3
+    assert set(rejects["error_reason"]) == {"Missing required fields"}
+
+
+def test_summary_keeps_the_last_runs(tmp_path):
+    for run in range(4):
+        sink = RejectSink(run_id=f"run{run}", root=str(tmp_path), keep_runs=2)
+        sink.add("census", census_with_missing(2).head(2).assign(error_reason="Missing required fields"))
+        sink.close()
+    summary = pd.read_csv(tmp_path / reject_sink.SUMMARY_FILE)
+    assert list(summary["run_id"]) == ["run2", "run3"]
+    assert sorted(os.listdir(tmp_path)) == ["run_id=run2", "run_id=run3", reject_sink.SUMMARY_FILE]
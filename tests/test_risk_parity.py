@@ -0,0 +1,7 @@
+import analytics.metrics as metrics
+
+
+def test_sql_and_pandas_risk_profiles_match(duckdb_backend, use_backend):
+    use_backend(duckdb_backend)
+    assert metrics.check_risk_profile_parity(tolerance=1e-9) <= 1e-9
+
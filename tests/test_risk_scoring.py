@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics.metrics as metrics
+from analytics.risk_scoring import DEFAULT_WEIGHTS, TREND_WEIGHTS, score_risk
+
+TREND_FEATURES = ["recent_overtime_norm", "overtime_trend_norm", "sick_norm", "streak_norm"]
+
+
+def test_default_score_ignores_trends():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((20, len(TREND_WEIGHTS))), columns=list(TREND_WEIGHTS))
+    scored = score_risk(df)
+    expected = (0.35 * df["overtime_norm"] + 0.30 * df["capacity_norm"] + 0.10 * df["days_norm"]
+                + 0.05 * df["shift_norm"] + 0.20 * df["fatigue_norm"])
+    np.testing.assert_allclose(scored["risk_score"], expected)
+    np.testing.assert_allclose(score_risk(df.assign(**{f: 0.0 for f in TREND_FEATURES}))["risk_score"], expected)
+    assert not set(TREND_FEATURES) & set(DEFAULT_WEIGHTS)
+
+
+@pytest.mark.parametrize("mode", ["pandas", "sql"])
+@pytest.mark.parametrize("weights, moderate", [
+    (None, []),
+    (TREND_WEIGHTS, ["S1003", "S1012", "S1014", "S1032", "S1033"]),
+])
+def test_sample_data_levels(duckdb_backend, use_backend, mode, weights, moderate):
+    # Levels of the data/ staff: the trend features only count when asked for
+    use_backend(duckdb_backend)
+    profile = metrics.build_staff_risk_profile.__wrapped__(mode=mode, weights=weights)
+    assert len(profile) == 40
+    assert sorted(profile.loc[profile["risk_level"] == "Moderate", "staff_id"]) == moderate
+    assert set(profile["risk_level"]) <= {"High", "Moderate"}
@@ -0,0 +1,127 @@
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("asyncpg")
+pytest.importorskip("pytest_aiohttp")
+
+import pytest_asyncio
+
+import analytics.metrics as metrics
+from analytics.service import NEXT_PAGE_HEADER, PARAM_PATTERN, create_app, to_asyncpg
+
+
+class DuckDBPool:
+    # Stands in for an asyncpg pool: $n queries run on the DuckDB backend's
+    # connection, and every query with its arguments is kept
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, list(args))
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def get_size(self):
+        return 1
+
+    def get_idle_size(self):
+        return 1
+
+
+@pytest.fixture
+def pool(duckdb_backend):
+    return DuckDBPool(duckdb_backend.conn)
+
+
+@pytest_asyncio.fixture
+async def client(aiohttp_client, pool):
+    return await aiohttp_client(create_app(pool=pool))
+
+
+def test_to_asyncpg_numbers_each_name_once():
+    query, args = to_asyncpg(
+        "SELECT %(b)s, %(a)s, %(b)s WHERE x LIKE 'a%%' AND %(a)s IS NULL", {"a": 1, "b": 2, "c": 3}
+    )
+    assert query == "SELECT $1, $2, $1 WHERE x LIKE 'a%' AND $2 IS NULL"
+    assert args == [2, 1]
+
+
+def test_to_asyncpg_metric_query():
+    query, args = to_asyncpg(*metrics.metric_query("cancellation_rate_by_unit", 5, units=["ICU"]))
+    assert "%(" not in query
+    assert ["ICU"] in args and 5 in args
+    assert len(args) == len(set(PARAM_PATTERN.findall(metrics.metric_query("cancellation_rate_by_unit")[0])))
+
+
+@pytest.mark.asyncio
+async def test_filters(client):
+    response = await client.get("/cancellation-rates", params={"units": "ICU, ER"})
+    assert response.status == 200
+    assert {row["unit"] for row in await response.json()} == {"ICU", "ER"}
+
+    response = await client.get("/capacity-utilization", params={"start_date": "2026-02-23", "end_date": "2026-02-23"})
+    rows = await response.json()
+    assert rows and {row["week_start"] for row in rows} == {"2026-02-23"}
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_row_once(client):
+    everything = await (await client.get("/patient-to-staff-ratio")).json()
+    seen, params = [], {"limit": "7"}
+    while True:
+        response = await client.get("/patient-to-staff-ratio", params=params)
+        assert response.status == 200
+        seen += await response.json()
+        if NEXT_PAGE_HEADER not in response.headers:
+            break
+        params["after"] = response.headers[NEXT_PAGE_HEADER]
+    keys = [(row["unit"], row["shift_date"]) for row in seen]
+    assert len(keys) == len(set(keys))
+    assert seen == everything
+
+
+@pytest.mark.asyncio
+async def test_risk_profile_top_n(client):
+    response = await client.get("/risk-profile", params={"top_n": "3"})
+    assert response.status == 200
+    assert len(await response.json()) == 3
+
+
+@pytest.mark.asyncio
+async def test_dashboard_and_stats(client):
+    response = await client.get("/dashboard", params={"limit": "2"})
+    body = await response.json()
+    assert set(body) == {"risk_profile", "patient_to_staff_ratio", "cancellation_rates", "capacity_utilization"}
+    assert all(len(rows) <= 2 for rows in body.values())
+    stats = await (await client.get("/stats")).json()
+    assert stats["latency"]["/dashboard"]["requests"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, params", [
+    ("/capacity-utilization", {"limit": "ten"}),
+    ("/capacity-utilization", {"limit": "-1"}),
+    ("/risk-profile", {"top_n": "1.5"}),
+    ("/cancellation-rates", {"start_date": "23/02/2026"}),
+    ("/patient-to-staff-ratio", {"after": "not json"}),
+    ("/patient-to-staff-ratio", {"after": json.dumps([1.5, "ICU"])}),
+    ("/patient-to-staff-ratio", {"after": json.dumps([1.5, "ICU", "yesterday"])}),
+])
+async def test_bad_parameters(client, pool, path, params):
+    response = await client.get(path, params=params)
+    assert response.status == 400
+    assert pool.queries == []
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from analytics.shift_overlap import MIN_REST_HOURS, find_shift_conflicts, fatigue_by_staff, sweep_shift_gaps
+
+
+def make_shifts(rows):
+    # rows: (staff_id, shift_id, start, end), all scheduled
+    df = pd.DataFrame(rows, columns=["staff_id", "shift_id", "shift_start", "shift_end"])
+    df[["shift_start", "shift_end"]] = df[["shift_start", "shift_end"]].apply(pd.to_datetime)
+    return df.assign(status="scheduled")
+
+
+def conflicts(rows):
+    df = find_shift_conflicts(make_shifts(rows))
+    return {row.shift_id: (row.conflict_type, row.gap_hours) for row in df.itertuples()}
+
+
+def test_back_to_back_shifts_are_a_short_rest():
+    assert conflicts([
+        ("S1", "A", "2026-03-02 07:00", "2026-03-02 19:00"),
+        ("S1", "B", "2026-03-02 19:00", "2026-03-03 07:00"),
+    ]) == {"B": ("short_rest", 0.0)}
+
+
+def test_overnight_shifts_across_midnight():
+    assert conflicts([
+        ("S1", "A", "2026-03-02 19:00", "2026-03-03 07:00"),
+        ("S1", "B", "2026-03-03 19:00", "2026-03-04 07:00"),
+        ("S1", "C", "2026-03-04 06:00", "2026-03-04 10:00"),
+    ]) == {"C": ("overlap", -1.0)}
+
+
+def test_nested_shift_overlaps_and_keeps_the_outer_end():
+    # C starts after B ends, but still inside A
+    assert conflicts([
+        ("S1", "A", "2026-03-02 07:00", "2026-03-02 19:00"),
+        ("S1", "B", "2026-03-02 09:00", "2026-03-02 12:00"),
+        ("S1", "C", "2026-03-02 13:00", "2026-03-02 15:00"),
+        ("S1", "D", "2026-03-03 03:00", "2026-03-03 11:00"),
+    ]) == {"B": ("overlap", -10.0), "C": ("overlap", -6.0)}
+
+
+def test_exactly_the_minimum_rest_is_enough():
+    gap = pd.Timedelta(hours=MIN_REST_HOURS)
+    end = pd.Timestamp("2026-03-02 19:00")
+    assert conflicts([
+        ("S1", "A", "2026-03-02 07:00", end),
+        ("S1", "B", end + gap, end + gap + pd.Timedelta(hours=8)),
+        ("S1", "C", end + 2 * gap + pd.Timedelta(hours=8) - pd.Timedelta(minutes=1), "2026-03-04 12:00"),
+    ]) == {"C": ("short_rest", MIN_REST_HOURS - 1 / 60)}
+
+
+def test_staff_are_swept_separately():
+    # Each staff member's first shift has no previous one, even when it
+    # overlaps the other staff member's shifts
+    rows = [
+        ("S2", "B1", "2026-03-02 08:00", "2026-03-02 16:00"),
+        ("S1", "A1", "2026-03-02 07:00", "2026-03-02 19:00"),
+        ("S1", "A2", "2026-03-03 01:00", "2026-03-03 09:00"),
+        ("S2", "B2", "2026-03-02 15:00", "2026-03-02 23:00"),
+        ("S3", "C1", "2026-03-02 07:00", "2026-03-02 19:00"),
+    ]
+    assert conflicts(rows) == {"A2": ("short_rest", 6.0), "B2": ("overlap", -1.0)}
+
+    gaps = sweep_shift_gaps(make_shifts(rows))
+    first = gaps.groupby("staff_id").head(1)
+    assert first["gap_hours"].isna().all() and first["previous_shift_id"].isna().all()
+
+    fatigue = fatigue_by_staff(make_shifts(rows)).set_index("staff_id")
+    assert fatigue["overlapping_shifts"].to_dict() == {"S1": 0, "S2": 1, "S3": 0}
+    assert fatigue["short_rest_shifts"].to_dict() == {"S1": 1, "S2": 0, "S3": 0}
+    np.testing.assert_allclose(fatigue["fatigue_norm"], [0.5, 0.5, 0.0])
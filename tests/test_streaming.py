@@ -0,0 +1,141 @@
+import contextlib
+import io
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import etl.streaming as streaming
+from etl.data_cleanser import cleanse_census_data
+from etl.streaming import KeySet, stream_file
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+
+    def fetchone(self):
+        return (False,)
+
+    def copy_expert(self, query, buffer):
+        self.conn.copied += len(buffer.read().splitlines())
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    closed = False
+
+    def __init__(self):
+        self.statements = []
+        self.copied = 0
+        self.committed = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    # One connection for the whole file, rolled back on an error like
+    # data_upload.pooled_connection does
+    conn = RecordingConnection()
+
+    @contextmanager
+    def pooled_connection():
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
+    monkeypatch.setattr(streaming, "pooled_connection", pooled_connection)
+    return conn
+
+
+def census_file(tmp_path, rows=40, missing=(), census_ids=None):
+    # rows of census for four units over rows / 4 days; missing rows lose
+    # total_patients
+    df = pd.DataFrame({
+        "census_id": census_ids or [f"C{i:04d}" for i in range(rows)],
+        "unit": [["ICU", "ER", "MED", "SURG"][i % 4] for i in range(rows)],
+        "date": [str((pd.Timestamp("2026-02-01") + pd.Timedelta(days=i // 4)).date()) for i in range(rows)],
+        "total_patients": 20.0,
+        "admissions": 3,
+        "discharges": 2,
+    })
+    df.loc[list(missing), "total_patients"] = np.nan
+    path = tmp_path / "census.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def stream(path, chunksize=10):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return stream_file(path, "census", cleanse_census_data, chunksize=chunksize)
+
+
+def test_keyset_finds_repeats_within_and_across_chunks():
+    keys = KeySet()
+    assert keys.add(pd.Series(["a", "b", "a"])).tolist() == [False, False, True]
+    assert keys.add(pd.Series(["c", "b"])).tolist() == [False, True]
+    assert keys.add(pd.DataFrame({"unit": ["ICU", "ER"], "date": ["d1", "d1"]})).tolist() == [False, False]
+    assert keys.add(pd.DataFrame({"unit": ["ER"], "date": ["d1"]})).tolist() == [True]
+
+
+def test_whole_file_loads_in_one_transaction(conn, tmp_path):
+    assert stream(census_file(tmp_path)) == 40
+    assert conn.copied == 40
+    assert conn.committed and not conn.rolled_back
+
+
+def test_duplicate_key_in_a_later_chunk_rolls_back(conn, tmp_path):
+    ids = [f"C{i:04d}" for i in range(40)]
+    ids[35] = ids[2]
+    with pytest.raises(ValueError, match="Duplicate census_id"):
+        stream(census_file(tmp_path, census_ids=ids))
+    # The first three chunks were already copied, and are undone
+    assert conn.copied == 30
+    assert conn.rolled_back and not conn.committed
+
+
+def test_duplicate_unit_date_across_chunks(conn, tmp_path):
+    # Row 11 (chunk 2) takes row 8's unit and day (chunk 1)
+    path = census_file(tmp_path)
+    df = pd.read_csv(path)
+    df.loc[11, "date"] = df.loc[8, "date"]
+    df.loc[11, "unit"] = df.loc[8, "unit"]
+    df.to_csv(path, index=False)
+    with pytest.raises(ValueError, match="Found duplicate unit-date combinations"):
+        stream(path)
+    assert conn.rolled_back and not conn.committed
+
+
+def test_invalid_ratio_is_over_the_whole_file(conn, tmp_path):
+    # 5 of the first chunk's 10 rows are missing fields: 50% of the chunk,
+    # but 12.5% of the file
+    assert stream(census_file(tmp_path, missing=range(5))) == 35
+    assert conn.committed
+
+
+def test_invalid_ratio_over_the_limit_rolls_back(conn, tmp_path):
+    # 3 rows missing in each chunk: 30% of the file, caught after every
+    # chunk was loaded
+    missing = [i for chunk in range(4) for i in range(10 * chunk, 10 * chunk + 3)]
+    with pytest.raises(ValueError, match="More than 20% rows invalid"):
+        stream(census_file(tmp_path, missing=missing))
+    assert conn.copied == 28
+    assert conn.rolled_back and not conn.committed
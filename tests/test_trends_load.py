@@ -0,0 +1,146 @@
+import contextlib
+import io
+import re
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+import pytest
+
+import etl.data_upload as data_upload
+import etl.streaming as streaming
+from analytics.backends import to_duckdb
+from benchmarks.synthetic import generate, write_dataset
+from etl.data_cleanser import cleanse_shift_schedule, cleanse_staff_master, cleanse_time_keeping, read_file
+from etl.trends import TREND_COLUMNS, TRENDS_TABLE, affected_weeks, rolling_trends, weekly_activity
+
+
+COPY_TABLE = re.compile(r"COPY (\w+)")
+
+
+class RecordingCursor:
+    # Enough of a psycopg2 cursor for the loaders: statements are recorded,
+    # catalog lookups come back empty and COPY data is kept per table
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((query, params))
+
+    def fetchone(self):
+        # ensure_partitions: the table is not partitioned
+        return (False,)
+
+    def fetchall(self):
+        return []
+
+    def copy_expert(self, query, buffer):
+        table = COPY_TABLE.search(query).group(1)
+        self.conn.copied.setdefault(table, []).append(buffer.read())
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    closed = False
+
+    def __init__(self):
+        self.statements = []
+        self.copied = {}
+        self.committed = False
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    # Ten weeks of synthetic files, cleansed
+    out_dir = tmp_path_factory.mktemp("data")
+    paths = write_dataset(generate(facilities=1, units_per_facility=2, weeks=10, seed=7), str(out_dir))
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames = {
+            table: pd.concat([cleanse_fn(read_file(path)).astype({"staff_id": str}) for path in paths[table]],
+                             ignore_index=True)
+            for table, cleanse_fn in [
+                ("staff", cleanse_staff_master),
+                ("shifts", cleanse_shift_schedule),
+                ("timekeeping", cleanse_time_keeping),
+            ]
+        }
+    return paths, frames
+
+
+@pytest.fixture
+def database(dataset, monkeypatch):
+    # The loaders write to a RecordingConnection; the trend refresh reads
+    # the loaded tables (including the new week) from DuckDB
+    _, frames = dataset
+    db = duckdb.connect()
+    for table, df in frames.items():
+        db.register(f"_{table}", df)
+        db.execute(f"CREATE TABLE {table} AS SELECT * FROM _{table}")
+    conn = RecordingConnection()
+
+    @contextmanager
+    def pooled_connection():
+        yield conn
+
+    def read_sql(query, _conn, params=None):
+        return db.execute(*to_duckdb(query, params)).df()
+
+    monkeypatch.setattr(data_upload, "pooled_connection", pooled_connection)
+    monkeypatch.setattr(streaming, "pooled_connection", pooled_connection)
+    monkeypatch.setattr(data_upload.pd, "read_sql", read_sql)
+    return conn
+
+
+def copied_trends(conn):
+    df = pd.read_csv(io.StringIO("".join(conn.copied[TRENDS_TABLE])), names=TREND_COLUMNS)
+    df["week_start"] = pd.to_datetime(df["week_start"])
+    return df.sort_values(["staff_id", "week_start"]).reset_index(drop=True)
+
+
+def expected_trends(frames, weeks):
+    shift_days = frames["shifts"].loc[frames["shifts"]["status"] == "scheduled", ["staff_id", "shift_date"]]
+    trends = rolling_trends(weekly_activity(frames["staff"], frames["timekeeping"], shift_days.drop_duplicates()))
+    trends = trends[trends["week_start"].isin(weeks)]
+    return trends.sort_values(["staff_id", "week_start"]).reset_index(drop=True)
+
+
+LOADS = {
+    "copy": lambda path: data_upload.load_timekeeping(cleanse_time_keeping(read_file(path))),
+    "incremental": lambda path: data_upload.load_incremental(
+        cleanse_time_keeping(read_file(path)), "timekeeping", path
+    ),
+    "stream": lambda path: streaming.stream_file(path, "timekeeping", cleanse_time_keeping, incremental=True),
+}
+
+
+@pytest.mark.parametrize("mode", list(LOADS))
+def test_new_week_refreshes_only_its_windows(dataset, database, mode):
+    # Loading the latest timekeeping week rewrites the trends of the weeks
+    # whose windows include it, matching a full rebuild for those weeks
+    paths, frames = dataset
+    path = paths["timekeeping"][-1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        LOADS[mode](path)
+
+    new_week = pd.to_datetime(read_file(path)["week_start"]).min()
+    weeks = affected_weeks([new_week])
+    deletes = [params for query, params in database.statements if query.startswith(f"DELETE FROM {TRENDS_TABLE}")]
+    assert deletes == [([week.date() for week in weeks],)]
+    assert database.committed
+
+    actual = copied_trends(database)
+    assert not actual.empty
+    pd.testing.assert_frame_equal(actual, expected_trends(frames, weeks), check_dtype=False)
@@ -0,0 +1,111 @@
+import io
+
+import duckdb
+import pandas as pd
+import pytest
+
+from etl.data_upload import TABLE_COLUMNS, upsert_rows
+
+
+SHIFTS = pd.DataFrame({
+    "shift_id": ["SH1", "SH2"],
+    "staff_id": ["S1", "S2"],
+    "unit": ["ICU", "ER"],
+    "shift_date": pd.to_datetime(["2026-03-02", "2026-03-03"]),
+    "shift_start": ["07:00", "07:00"],
+    "shift_end": ["19:00", "19:00"],
+    "shift_type": ["day", "day"],
+    "role": ["RN", "RN"],
+    "status": ["scheduled", "scheduled"],
+})
+
+
+class DuckDBCursor:
+    # Enough of a psycopg2 cursor for upsert_rows, running the merge itself
+    # on DuckDB: catalog lookups return the configured primary key and the
+    # Postgres-only staging statements are translated
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.result = []
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+        if "pg_index" in query:
+            self.result = [(col,) for col in self.conn.keys]
+        elif "pg_partitioned_table" in query:
+            self.result = [(False,)]
+        elif query.startswith("CREATE TEMP TABLE"):
+            stage, table = query.split()[3], query.split()[5].lstrip("(")
+            self.conn.db.execute(f"CREATE TEMP TABLE {stage} AS SELECT * FROM {table} WHERE false")
+        else:
+            result = self.conn.db.execute(query).fetchall()
+            self.rowcount = result[0][0] if result else 0
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def copy_expert(self, query, buffer):
+        stage = query.split()[1]
+        rows = pd.read_csv(buffer, names=TABLE_COLUMNS["shifts"], dtype=str)
+        self.conn.db.execute(f"INSERT INTO {stage} SELECT * FROM rows")
+
+    def close(self):
+        pass
+
+
+class DuckDBConnection:
+    closed = False
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.statements = []
+        self.db = duckdb.connect()
+        self.db.execute(f"""
+        CREATE TABLE shifts (
+            shift_id VARCHAR, staff_id VARCHAR, unit VARCHAR, shift_date DATE,
+            shift_start VARCHAR, shift_end VARCHAR, shift_type VARCHAR, role VARCHAR,
+            status VARCHAR, PRIMARY KEY ({", ".join(keys)})
+        )
+        """)
+        self.db.register("existing", SHIFTS)
+        self.db.execute("INSERT INTO shifts SELECT * FROM existing")
+
+    def cursor(self):
+        return DuckDBCursor(self)
+
+    def shifts(self):
+        return self.db.execute("SELECT shift_id, shift_date, unit FROM shifts ORDER BY shift_id").fetchall()
+
+
+@pytest.mark.parametrize("keys", [["shift_id"], ["shift_id", "shift_date"]])
+def test_moved_shift_keeps_one_row(keys):
+    # Correcting a shift's date updates it in place, also once partitioning
+    # has made the date part of the primary key
+    conn = DuckDBConnection(keys)
+    moved = SHIFTS.iloc[[0]].assign(shift_date=pd.Timestamp("2026-03-09"), unit="MED")
+
+    upsert_rows(conn, moved, "shifts")
+
+    assert conn.shifts() == [
+        ("SH1", pd.Timestamp("2026-03-09").date(), "MED"),
+        ("SH2", pd.Timestamp("2026-03-03").date(), "ER"),
+    ]
+
+
+def test_delete_only_for_partitioned_tables():
+    unpartitioned = DuckDBConnection(["shift_id"])
+    upsert_rows(unpartitioned, SHIFTS, "shifts")
+    assert not any(query.strip().startswith("DELETE") for query in unpartitioned.statements)
+
+    partitioned = DuckDBConnection(["shift_id", "shift_date"])
+    upsert_rows(partitioned, SHIFTS, "shifts")
+    deletes = [query for query in partitioned.statements if query.strip().startswith("DELETE")]
+    assert len(deletes) == 1
+    assert "IS DISTINCT FROM (stage_shifts.shift_date)" in deletes[0]
+    # Unchanged rows are neither deleted nor duplicated
+    assert len(partitioned.shifts()) == 2
@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+import pytest
+
+import etl.compact as compact
+from etl.data_cleanser import DATA_DIR, cleanse_census_data
+from etl.validation import apply_rules
+
+
+@pytest.mark.parametrize("ratio, message", [(0.05, "More than 5% rows invalid"), (0.1, "More than 10% rows invalid")])
+def test_invalid_ratio_message_names_the_limit(ratio, message):
+    df = pd.read_csv(os.path.join(DATA_DIR, "census_data", "census_daily_week_01.csv"))
+    df.loc[df.index[:int(len(df) * 0.2)], "total_patients"] = None
+    with pytest.raises(ValueError, match=message):
+        cleanse_census_data(df, max_invalid_ratio=ratio)
+
+
+def census_rows():
+    return pd.DataFrame({
+        "census_id": ["C1", "C2", "C3", "C4"],
+        "unit": ["icu ", "ER", "MED", "SURG"],
+        "date": ["2026-02-23"] * 4,
+        "total_patients": [20, None, None, 15],
+        "admissions": [3, -1, 2, 4],
+        "discharges": [2, 1, 1, -2],
+    })
+
+
+def test_row_failing_several_rules_gets_every_reason(reject_sink):
+    df = cleanse_census_data(census_rows(), max_invalid_ratio=None)
+    assert df["census_id"].tolist() == ["C1"]
+    rejects = pd.concat(reject_sink.drain()).set_index("census_id")["error_reason"].to_dict()
+    assert rejects == {
+        "C2": "Missing required fields; Negative values",
+        "C3": "Missing required fields",
+        "C4": "Negative values",
+    }
+
+
+def test_fatal_checks_run_before_compaction(monkeypatch):
+    calls = []
+
+    def fatal(df):
+        # Still the converted, not yet compacted frame
+        calls.append(("fatal", str(df["unit"].dtype)))
+        return df["unit"] == "ICU"
+
+    monkeypatch.setattr(compact, "COMPACT_FRAMES", True)
+    monkeypatch.setattr(compact, "compact", lambda df: calls.append(("compact", None)) or df)
+    spec = {
+        "name": "census",
+        "required_columns": ["census_id", "unit"],
+        "conversions": {"unit": lambda col: col.str.strip().str.upper()},
+        "fatal_checks": [("ICU is not allowed here", fatal)],
+    }
+    with pytest.raises(ValueError, match="ICU is not allowed here"):
+        apply_rules(census_rows(), spec)
+    assert [name for name, _ in calls] == ["fatal"]
+    assert calls[0][1] != "category"
+
+    calls.clear()
+    apply_rules(census_rows().iloc[1:], spec)
+    assert [name for name, _ in calls] == ["fatal", "compact"]